@@ -0,0 +1 @@
+default_app_config = 'animesuki.core.apps.CoreConfig'
@@ -1,10 +1,13 @@
 """AnimeSuki Core Admin models"""
 
 from django.utils.translation import ugettext_lazy as _
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
 
-from .models import AnimeSukiUser, Option
+from animesuki.history.models import ChangeRequest
+
+from .models import AnimeSukiUser, Option, RevertJob
+from .moderation import moderate
 
 
 @admin.register(AnimeSukiUser)
@@ -39,3 +42,89 @@ class OptionAdmin(admin.ModelAdmin):
     def save_model(self, request, obj, form, change):
         obj.last_modified_by = request.user
         super().save_model(request, obj, form, change)
+
+
+@admin.register(RevertJob)
+class RevertJobAdmin(admin.ModelAdmin):
+    """Revert jobs are processed in the background by manage.py revert_jobs"""
+    fields = (
+        ('user', 'since'),
+        ('status', 'progress'),
+        ('total', 'reverted', 'denied'),
+        ('conflicts',),
+        ('errors',),
+        ('message',),
+        ('requested_by', 'date_created', 'date_modified'),
+    )
+    readonly_fields = ('status', 'progress', 'total', 'reverted', 'denied', 'conflicts', 'errors', 'message',
+                       'requested_by', 'date_created', 'date_modified')
+    list_display = ('pk', 'user', 'since', 'status', 'progress', 'requested_by', 'date_created')
+    list_filter = ('status',)
+    raw_id_fields = ('user',)
+    actions = ('retry',)
+
+    def get_readonly_fields(self, request, obj=None):
+        # Jobs can't be changed once created (only retried)
+        if obj is not None:
+            return self.readonly_fields + ('user', 'since')
+        return self.readonly_fields
+
+    def progress(self, obj):
+        return '{}% ({} of {})'.format(obj.progress, obj.processed, obj.total)
+
+    def retry(self, request, queryset):
+        """Restarts failed jobs: change requests that were already reverted stay reverted, failed ones are retried"""
+        count = queryset.filter(status=RevertJob.Status.FAILED)\
+            .update(status=RevertJob.Status.PENDING, errors=[], message='')
+        self.message_user(request, 'Restarted {} failed revert jobs'.format(count))
+
+    retry.short_description = 'Restart selected failed jobs'
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.requested_by = request.user
+        super().save_model(request, obj, form, change)
+
+
+def moderate_changerequests(modeladmin, request, queryset, action):
+    if not request.user.has_perm('history.mod_approve'):
+        modeladmin.message_user(request, 'You are not allowed to moderate change requests', messages.ERROR)
+        return
+    results = moderate(list(queryset.values_list('pk', flat=True)), action, request.user)
+    errors = ['#{}: {}'.format(pk, r['message']) for pk, r in results.items() if r['status'] == 'error']
+    modeladmin.message_user(request, '{} {} change requests'.format(
+        'Approved' if action == 'approve' else 'Denied', len(results) - len(errors)))
+    if errors:
+        modeladmin.message_user(request, 'Skipped {}'.format('; '.join(errors)), messages.WARNING)
+
+
+def approve_changerequests(modeladmin, request, queryset):
+    moderate_changerequests(modeladmin, request, queryset, 'approve')
+
+
+approve_changerequests.short_description = 'Approve selected pending change requests'
+
+
+def deny_changerequests(modeladmin, request, queryset):
+    moderate_changerequests(modeladmin, request, queryset, 'deny')
+
+
+deny_changerequests.short_description = 'Deny selected pending change requests'
+
+
+class ChangeRequestAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'object_str', 'request_type', 'status', 'user', 'date_created')
+    list_filter = ('status', 'request_type')
+    actions = (approve_changerequests, deny_changerequests)
+
+
+def add_moderation_actions(site=admin.site):
+    """
+    Adds the bulk moderation actions to the ChangeRequest admin. Called once all admin modules have been loaded,
+    so the history app gets the chance to register its own admin first.
+    """
+    if not site.is_registered(ChangeRequest):
+        site.register(ChangeRequest, ChangeRequestAdmin)
+        return
+    modeladmin = site._registry[ChangeRequest]
+    modeladmin.actions = list(modeladmin.actions or ()) + [approve_changerequests, deny_changerequests]
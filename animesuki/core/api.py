@@ -0,0 +1,99 @@
+"""AnimeSuki Core API utilities"""
+
+from django.conf import settings
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import BasePermission
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .moderation import ACTIONS, moderate
+
+
+def parse_field_list(value):
+    """Converts a comma separated list of field names (from a query parameter) into a set"""
+    if not value:
+        return set()
+    return set(f.strip() for f in value.split(',') if f.strip())
+
+
+def get_sparse_fields(request, fields):
+    """Returns the subset of fields selected by the "fields" and "exclude" query parameters"""
+    include = parse_field_list(request.GET.get('fields'))
+    exclude = parse_field_list(request.GET.get('exclude'))
+    return tuple(f for f in fields if (not include or f in include) and f not in exclude)
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    Limits serialized output to the fields requested through the "fields" and "exclude" query parameters.
+
+    Serializers can list the model fields each serializer field needs in "Meta.source_fields", which allows
+    SparseFieldsetViewMixin to only load those columns from the database.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is not None:
+            selected = get_sparse_fields(request, self.Meta.fields)
+            for name in [f for f in self.fields if f not in selected]:
+                self.fields.pop(name)
+
+
+class SparseFieldsetViewMixin:
+    """
+    Restricts the queryset to the columns needed by the fields selected through the "fields" and "exclude" query
+    parameters, so unused (large) columns are never read from the database.
+    """
+
+    def get_sparse_fields(self):
+        return get_sparse_fields(self.request, self.get_serializer_class().Meta.fields)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        source_fields = getattr(self.get_serializer_class().Meta, 'source_fields', None)
+        if source_fields is None:
+            return queryset
+        columns = set()
+        for field in self.get_sparse_fields():
+            columns.update(source_fields.get(field, (field,)))
+        return queryset.only('pk', *columns)
+
+
+class CanModerate(BasePermission):
+
+    def has_permission(self, request, view):
+        return request.user.has_perm('history.mod_approve')
+
+
+class ChangeRequestModerateAPIView(APIView):
+    """
+    Approves or denies pending change requests in bulk (in one transaction), e.g. POST /v1/changerequests/moderate
+    with {"action": "approve", "ids": [1, 2, 3]}
+
+    Returns a result for each id in the requested order; change requests that are not pending or fail to apply get
+    an "error" entry instead of failing the entire request.
+    """
+    permission_classes = (CanModerate,)
+
+    def get_ids(self):
+        ids = self.request.data.get('ids')
+        if not isinstance(ids, list) or not ids:
+            raise ValidationError({'ids': 'No ids specified'})
+        result = []
+        for pk in ids:
+            if not isinstance(pk, int) or isinstance(pk, bool):
+                raise ValidationError({'ids': 'Invalid id "{}"'.format(pk)})
+            if pk not in result:
+                result.append(pk)
+        if len(result) > settings.MODERATION_MAX_IDS:
+            raise ValidationError({'ids': 'No more than {} ids allowed'.format(settings.MODERATION_MAX_IDS)})
+        return result
+
+    def post(self, request, *args, **kwargs):
+        action = request.data.get('action')
+        if action not in ACTIONS:
+            raise ValidationError({'action': 'Invalid action "{}": use {}'.format(action, ' or '.join(ACTIONS))})
+        results = moderate(self.get_ids(), action, request.user)
+        return Response({'results': [dict(id=pk, **result) for pk, result in results.items()]})
@@ -2,4 +2,11 @@ from django.apps import AppConfig
 
 
 class CoreConfig(AppConfig):
-    name = 'core'
+    name = 'animesuki.core'
+    label = 'core'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        # Admin modules are loaded (by the admin app, which comes first in INSTALLED_APPS) before this point
+        from .admin import add_moderation_actions
+        add_moderation_actions()
@@ -1,7 +1,26 @@
 """AnimeSuki Core forms"""
 
 from django import forms
+from django.contrib.auth import get_user_model
+
+from .models import RevertJob
 
 
 class ArtworkActiveForm(forms.Form):
     active = forms.IntegerField(min_value=1)
+
+
+class RevertJobForm(forms.ModelForm):
+    username = forms.CharField(label='User', max_length=150)
+
+    def clean_username(self):
+        try:
+            self.instance.user = get_user_model().objects.get(username=self.cleaned_data['username'])
+        except get_user_model().DoesNotExist:
+            raise forms.ValidationError('User "{}" does not exist'.format(self.cleaned_data['username']))
+        return self.cleaned_data['username']
+
+    class Meta:
+        model = RevertJob
+        fields = ('username', 'since')
+        help_texts = {'since': 'All approved changes made by the user since this date and time are reverted'}
@@ -0,0 +1,41 @@
+"""Archives old, settled change requests"""
+
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from animesuki.core.models import ChangeRequestArchive
+from animesuki.history.models import ChangeRequest
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = ('Moves the data of approved, denied and withdrawn change requests older than HISTORY_ARCHIVE_DAYS into '
+            'the compressed archive table, in batches of one transaction each. Meant to be run periodically.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.HISTORY_ARCHIVE_DAYS,
+                            help='Archive change requests settled more than this many days ago')
+        parser.add_argument('--batch-size', type=int, default=500, help='Change requests per batch/transaction')
+        parser.add_argument('--max-batches', type=int, default=100, help='Stop after this many batches')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timezone.timedelta(days=options['days'])
+        statuses = [getattr(ChangeRequest.Status, name) for name in ChangeRequestArchive.ARCHIVE_STATUSES]
+        queryset = ChangeRequest.objects.filter(status__in=statuses, date_modified__lt=cutoff, archive__isnull=True)\
+            .exclude(data_changed__isnull=True, data_revert__isnull=True).order_by('pk')
+        total = 0
+        for batch in range(options['max_batches']):
+            with transaction.atomic():
+                # Skip rows locked by moderators acting on them right now
+                changerequests = list(queryset.select_for_update(skip_locked=True, of=('self',))
+                                      [:options['batch_size']])
+                if not changerequests:
+                    break
+                total += ChangeRequestArchive.archive(changerequests)
+            logger.info('Archive: archived {} change requests'.format(total))
+        self.stdout.write('Archived {} change requests'.format(total))
@@ -0,0 +1,48 @@
+"""Stores long texts in existing change requests as deltas"""
+
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from animesuki.core.textdiff import decode_data, encode_data
+from animesuki.history.models import ChangeRequest
+
+
+class Command(BaseCommand):
+    help = ('Replaces long texts in the "data_revert" of existing "modify" change requests by word level deltas '
+            'against "data_changed" (new change requests are stored that way when saved) and reports the storage '
+            'reduction. Use --dry-run to only measure.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report sizes, do not change anything')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Change requests per batch/transaction')
+
+    def handle(self, *args, **options):
+        queryset = ChangeRequest.objects.filter(request_type=ChangeRequest.Type.MODIFY, data_revert__isnull=False,
+                                                data_changed__isnull=False).order_by('pk')
+        count = changed = size = compact_size = 0
+        last_pk = 0
+        while True:
+            # values_list() returns the data as stored
+            rows = list(queryset.filter(pk__gt=last_pk).values_list('pk', 'data_revert', 'data_changed')
+                        [:options['batch_size']])
+            if not rows:
+                break
+            with transaction.atomic():
+                for pk, stored, data_changed in rows:
+                    data_revert = decode_data(stored, data_changed)
+                    encoded = encode_data(data_revert, data_changed, settings.HISTORY_TEXT_DELTA_MIN_LENGTH)
+                    count += 1
+                    size += len(json.dumps(data_revert)) + len(json.dumps(data_changed))
+                    compact_size += len(json.dumps(encoded)) + len(json.dumps(data_changed))
+                    if encoded != stored:
+                        changed += 1
+                        if not options['dry_run']:
+                            ChangeRequest.objects.filter(pk=pk).update(data_revert=encoded)
+            last_pk = rows[-1][0]
+        reduction = 100 - compact_size * 100 // size if size else 0
+        self.stdout.write('{} {} of {} change requests: {} bytes of data as full text, {} bytes with deltas '
+                          '({}% smaller)'.format('Would compact' if options['dry_run'] else 'Compacted', changed,
+                                                 count, size, compact_size, reduction))
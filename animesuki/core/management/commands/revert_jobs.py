@@ -0,0 +1,42 @@
+"""Processes pending mass revert jobs"""
+
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from animesuki.core.models import RevertJob
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = ('Processes pending (and resumes interrupted) revert jobs, in batches of one transaction each. Meant to be '
+            'run periodically, e.g. every minute. Jobs being processed by another process are skipped.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Change requests per batch/transaction')
+
+    def handle(self, *args, **options):
+        statuses = (RevertJob.Status.PENDING, RevertJob.Status.RUNNING)
+        finished = 0
+        for pk in RevertJob.objects.filter(status__in=statuses).order_by('date_created').values_list('pk', flat=True):
+            try:
+                while True:
+                    with transaction.atomic():
+                        # Lock the job for the duration of each batch so only one process works on it
+                        job = RevertJob.objects.select_for_update(skip_locked=True)\
+                            .filter(pk=pk, status__in=statuses).first()
+                        if job is None:
+                            break
+                        if job.status == RevertJob.Status.PENDING:
+                            job.start()
+                        elif not job.run_batch(options['batch_size']):
+                            job.finish()
+                            finished += 1
+                            logger.info('Revert job {}: reverted {} change requests'.format(pk, job.reverted))
+                            break
+            except Exception as e:
+                logger.exception('Revert job {} failed'.format(pk))
+                RevertJob.objects.filter(pk=pk).update(status=RevertJob.Status.FAILED, message=str(e)[:250])
+        self.stdout.write('Finished {} revert jobs'.format(finished))
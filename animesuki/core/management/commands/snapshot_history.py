@@ -0,0 +1,29 @@
+"""Creates history snapshots for objects with existing change requests"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from animesuki.core.models import HistoryEvent, HistorySnapshot
+
+
+class Command(BaseCommand):
+    help = ('Creates missing history snapshots (every HISTORY_SNAPSHOT_INTERVAL history events per object). New '
+            'snapshots are created as change requests are approved and reverted, so this is only needed once for '
+            'existing history.')
+
+    def handle(self, *args, **options):
+        interval = settings.HISTORY_SNAPSHOT_INTERVAL
+        objects = HistoryEvent.objects.order_by().values_list('object_type_id', 'object_id').distinct()
+        created = 0
+        for object_type_id, object_id in objects.iterator():
+            existing = set(HistorySnapshot.objects.filter(object_type_id=object_type_id, object_id=object_id)
+                           .values_list('event_id', flat=True))
+            state, count = None, 0
+            for event in HistorySnapshot.get_events(object_type_id, object_id).iterator():
+                state = HistorySnapshot.replay(state, [event])
+                count += 1
+                if count % interval == 0 and event.pk not in existing:
+                    HistorySnapshot.objects.create(object_type_id=object_type_id, object_id=object_id,
+                                                   event=event, date=event.date, data=state)
+                    created += 1
+        self.stdout.write('Created {} history snapshots'.format(created))
@@ -0,0 +1,30 @@
+"""Creates diff summaries for existing change requests"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from animesuki.core.models import ChangeRequestArchive, ChangeRequestSummary
+from animesuki.history.models import ChangeRequest
+
+
+class Command(BaseCommand):
+    help = ('Creates missing change request diff summaries, in batches of one transaction each. New change requests '
+            'are summarized when saved, so this is only needed once for existing history.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Change requests per batch/transaction')
+
+    def handle(self, *args, **options):
+        queryset = ChangeRequest.objects.filter(summary__isnull=True).select_related('archive').order_by('pk')
+        created = 0
+        last_pk = 0
+        while True:
+            changerequests = list(queryset.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not changerequests:
+                break
+            for cr in changerequests:
+                ChangeRequestArchive.restore(cr)
+            with transaction.atomic():
+                created += ChangeRequestSummary.create_missing(changerequests)
+            last_pk = changerequests[-1].pk
+        self.stdout.write('Created {} change request summaries'.format(created))
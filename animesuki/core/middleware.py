@@ -0,0 +1,52 @@
+"""AnimeSuki Core middleware"""
+
+import time
+
+from django.conf import settings
+
+from . import routers
+from .models import Option
+
+
+class ReplicaPinMiddleware:
+    """
+    Pins requests to the primary database (see PrimaryReplicaRouter) when they may write (unsafe HTTP methods) or
+    when the client wrote less than REPLICA_PIN_SECONDS ago, so users never see data older than their own changes.
+
+    The time of the last write is kept in a cookie: tampering with it can only cause more reads from the primary.
+    """
+    COOKIE_NAME = 'primary_until'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routers.reset()
+        if request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE'):
+            routers.pin_to_primary()
+        else:
+            try:
+                if float(request.COOKIES.get(self.COOKIE_NAME, 0)) > time.time():
+                    routers.pin_to_primary()
+            except ValueError:
+                pass
+        response = self.get_response(request)
+        if routers.has_written():
+            response.set_cookie(self.COOKIE_NAME, str(int(time.time() + settings.REPLICA_PIN_SECONDS)),
+                                max_age=settings.REPLICA_PIN_SECONDS, httponly=True)
+        routers.reset()
+        return response
+
+
+class OptionCacheMiddleware:
+    """Memoizes Option values for the duration of each request (see OptionsManager)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        Option.objects.start_request()
+        try:
+            return self.get_response(request)
+        finally:
+            Option.objects.end_request()
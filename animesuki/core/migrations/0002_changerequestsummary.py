@@ -0,0 +1,26 @@
+# Generated by Django 2.2.4 on 2026-10-19 12:00
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('history', '__first__'),
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeRequestSummary',
+            fields=[
+                ('changerequest', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='history.ChangeRequest')),
+                ('data', django.contrib.postgres.fields.jsonb.JSONField(default=dict)),
+            ],
+            options={
+                'db_table': 'core_changerequest_summary',
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 2.2.4 on 2026-10-19 12:00
+
+from django.db import migrations
+
+# ChangeRequest.Status values at the time of this migration (hardcoded so the migration doesn't depend on the
+# current state of the history app). Status changes require a new migration.
+STATUSES = (
+    (1, 'pending'),
+    (2, 'approved'),
+    (3, 'denied'),
+    (4, 'withdrawn'),
+    (5, 'reverted'),
+)
+
+# Indexes on the history app's ChangeRequest table, created without locking the table for writes (CONCURRENTLY).
+# Partial indexes per status serve the status filters of the history list; the composite serves per-object history.
+INDEXES = [
+    ('history_cr_{}_date_idx'.format(name), '("date_created")', 'WHERE "status" = {:d}'.format(status))
+    for status, name in STATUSES
+] + [
+    ('history_cr_object_date_idx', '("object_type_id", "object_id", "date_created")', ''),
+]
+
+
+def create_indexes(apps, schema_editor):
+    table = apps.get_model('history', 'ChangeRequest')._meta.db_table
+    for name, columns, condition in INDEXES:
+        schema_editor.execute('CREATE INDEX CONCURRENTLY IF NOT EXISTS "{}" ON "{}" {} {}'
+                              .format(name, table, columns, condition))
+
+
+def drop_indexes(apps, schema_editor):
+    for name, columns, condition in INDEXES:
+        schema_editor.execute('DROP INDEX CONCURRENTLY IF EXISTS "{}"'.format(name))
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('history', '__first__'),
+        ('core', '0002_changerequestsummary'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
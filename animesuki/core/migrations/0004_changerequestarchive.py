@@ -0,0 +1,26 @@
+# Generated by Django 2.2.4 on 2026-10-19 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('history', '__first__'),
+        ('core', '0003_changerequest_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeRequestArchive',
+            fields=[
+                ('changerequest', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='archive', serialize=False, to='history.ChangeRequest')),
+                ('data', models.BinaryField()),
+                ('date_archived', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'core_changerequest_archive',
+            },
+        ),
+    ]
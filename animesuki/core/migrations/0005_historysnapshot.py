@@ -0,0 +1,35 @@
+# Generated by Django 2.2.4 on 2026-10-19 12:00
+
+from django.db import migrations, models
+import django.contrib.postgres.fields.jsonb
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('history', '__first__'),
+        ('core', '0004_changerequestarchive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistorySnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('date', models.DateTimeField()),
+                ('data', django.contrib.postgres.fields.jsonb.JSONField(null=True)),
+                ('changerequest', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='snapshot', to='history.ChangeRequest')),
+                ('object_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.ContentType')),
+            ],
+            options={
+                'db_table': 'core_history_snapshot',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='historysnapshot',
+            index=models.Index(fields=['object_type', 'object_id', 'date'], name='core_history_snapshot_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 2.2.4 on 2026-10-19 12:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.contrib.postgres.fields.jsonb
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0005_historysnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevertJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('since', models.DateTimeField(verbose_name='since')),
+                ('status', models.PositiveSmallIntegerField(choices=[(1, 'Pending'), (2, 'Running'), (3, 'Finished'), (4, 'Failed')], default=1, verbose_name='status')),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('reverted', models.PositiveIntegerField(default=0)),
+                ('denied', models.PositiveIntegerField(default=0)),
+                ('conflicts', django.contrib.postgres.fields.jsonb.JSONField(default=list)),
+                ('errors', django.contrib.postgres.fields.jsonb.JSONField(default=list)),
+                ('message', models.CharField(blank=True, max_length=250)),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+                ('date_modified', models.DateTimeField(auto_now=True)),
+                ('requested_by', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='revertjob_user', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revertjob_target', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'core_revert_job',
+            },
+        ),
+    ]
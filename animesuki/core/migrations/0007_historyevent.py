@@ -0,0 +1,80 @@
+# Generated by Django 2.2.4 on 2026-10-19 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# ChangeRequest.Status values at the time of this migration (see 0003_changerequest_indexes)
+APPROVED = 2
+REVERTED = 5
+# HistoryEvent.Type values
+APPLY = 1
+REVERT = 2
+
+
+def create_events(apps, schema_editor):
+    """
+    Records events for existing change requests. Reverting overwrote the approval date of reverted change requests,
+    so they are taken to have been applied when they were created.
+    """
+    ChangeRequest = apps.get_model('history', 'ChangeRequest')
+    HistoryEvent = apps.get_model('core', 'HistoryEvent')
+    queryset = ChangeRequest.objects.filter(status__in=(APPROVED, REVERTED), object_id__isnull=False).order_by('pk')\
+        .values_list('pk', 'object_type_id', 'object_id', 'status', 'date_created', 'date_modified')
+    events = []
+    for pk, object_type_id, object_id, status, date_created, date_modified in queryset.iterator():
+        kwargs = {'object_type_id': object_type_id, 'object_id': object_id, 'changerequest_id': pk}
+        if status == APPROVED:
+            events.append(HistoryEvent(type=APPLY, date=date_modified or date_created, **kwargs))
+        else:
+            events.append(HistoryEvent(type=APPLY, date=date_created, **kwargs))
+            events.append(HistoryEvent(type=REVERT, date=date_modified or date_created, **kwargs))
+        if len(events) >= 5000:
+            HistoryEvent.objects.bulk_create(events)
+            events = []
+    HistoryEvent.objects.bulk_create(events)
+
+
+def delete_snapshots(apps, schema_editor):
+    # Snapshots now follow events: recreate them with manage.py snapshot_history
+    apps.get_model('core', 'HistorySnapshot').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('history', '__first__'),
+        ('core', '0006_revertjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoryEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('type', models.PositiveSmallIntegerField(choices=[(1, 'Apply'), (2, 'Revert')])),
+                ('date', models.DateTimeField()),
+                ('changerequest', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='history_events', to='history.ChangeRequest')),
+                ('object_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.ContentType')),
+            ],
+            options={
+                'db_table': 'core_history_event',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='historyevent',
+            index=models.Index(fields=['object_type', 'object_id', 'date'], name='core_history_event_idx'),
+        ),
+        migrations.RunPython(create_events, migrations.RunPython.noop),
+        migrations.RunPython(delete_snapshots, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='historysnapshot',
+            name='changerequest',
+        ),
+        migrations.AddField(
+            model_name='historysnapshot',
+            name='event',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='snapshot', to='core.HistoryEvent'),
+        ),
+    ]
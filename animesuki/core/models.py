@@ -1,20 +1,31 @@
 """AnimeSuki Core models"""
 
+import json
 import logging
 import subprocess
+import threading
+import zlib
 from hashlib import md5
 from pathlib import Path
 from urllib.parse import urlencode
 
-from django.db import models
+from django.apps import apps
+from django.db import models, transaction
+from django.db.models import Q, prefetch_related_objects
+from django.db.models.fields.files import FieldFile
 from django.conf import settings
 from django.core.mail import send_mail
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.functional import cached_property
 from django.utils.text import slugify
 from django.utils.translation import ugettext_lazy as _
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, UserManager
 from django.contrib.auth.validators import UnicodeUsernameValidator
-from django.contrib.postgres.fields import CICharField, CIEmailField
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.fields import CICharField, CIEmailField, JSONField
+
+from .textdiff import decode_data
 
 logger = logging.getLogger(__name__)
 
@@ -100,18 +111,49 @@ class AnimeSukiUser(AbstractBaseUser, PermissionsMixin):
         return url
 
 
+# Option values memoized for the current request, see OptionsManager.start_request()
+_request_options = threading.local()
+
+
 class OptionsManager(models.Manager):
+    """
+    Option values are memoized for the duration of a request (see OptionCacheMiddleware), so options checked for
+    every object saved in a request (e.g. emergency shutdown in the HistoryModel sanity checks, which run for each
+    form of a formset) are only read from the database once.
+    """
+
+    @staticmethod
+    def start_request():
+        _request_options.values = dict()
+
+    @staticmethod
+    def end_request():
+        _request_options.values = None
+
+    @staticmethod
+    def forget(code):
+        values = getattr(_request_options, 'values', None)
+        if values is not None:
+            values.pop(code, None)
+
+    def get_value(self, code):
+        values = getattr(_request_options, 'values', None)
+        if values is None:
+            return self.get(code=code).value
+        if code not in values:
+            values[code] = self.get(code=code).value
+        return values[code]
 
     def get_bool(self, code):
-        v = str(self.get(code=code).value).strip().lower()
+        v = str(self.get_value(code)).strip().lower()
         if len(v) > 0 and v[0] in ('1', 't', 'y'):
             return True
         return False
 
     def get_int(self, code):
         try:
-            return int(self.get(code=code).value)
-        except ValueError:
+            return int(self.get_value(code))
+        except (TypeError, ValueError):
             logger.warning('Options: failed to cast value of "{}" to int'.format(code))
         return 0
 
@@ -133,6 +175,11 @@ class Option(models.Model):
     def __str__(self):
         return self.code
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Changes take effect immediately, even within the request making them
+        Option.objects.forget(self.code)
+
     class Meta:
         permissions = (
             ('emergency_shutdown', 'Can enable Emergency Shutdown'),
@@ -145,7 +192,85 @@ def artwork_upload_location(instance, filename):
                     slugify(Path(filename).stem[:instance.ARTWORK_NAME_MAX_LENGTH]) +'').with_suffix('.jpg'))
 
 
-class ArtworkModel(models.Model):
+class LoadedValuesMixin:
+    """
+    Remembers the field values an instance was loaded from the database with (and updates them after each save), so
+    changed fields can be determined in memory without reading the row again. Deferred fields are remembered once they
+    are loaded; values are compared with "==", so mutable values must not be modified in place.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def get_loaded_values(self):
+        """Returns dictionary of loaded field values (by attname) or None for instances not loaded from the database"""
+        return getattr(self, '_loaded_values', None)
+
+    def get_changed_fields(self):
+        """Returns list of attnames of fields changed since the instance was loaded or None when that is unknown"""
+        loaded = self.get_loaded_values()
+        if loaded is None or self._state.adding:
+            return None
+        # Fields set while deferred have no loaded value to compare with, so count as changed
+        return [field.attname for field in self._meta.concrete_fields if field.attname in self.__dict__ and
+                (field.attname not in loaded or getattr(self, field.attname) != loaded[field.attname])]
+
+    def remember_loaded_values(self, attnames):
+        for attname in attnames:
+            value = getattr(self, attname)
+            # Keep file name rather than FieldFile object (which changes in place when a new file is saved)
+            self._loaded_values[attname] = value.name if isinstance(value, FieldFile) else value
+
+    def refresh_from_db(self, using=None, fields=None):
+        # Also called to load a deferred field when it is first accessed
+        super().refresh_from_db(using=using, fields=fields)
+        if self.get_loaded_values() is not None:
+            self.remember_loaded_values(field.attname for field in self._meta.concrete_fields
+                                        if field.attname in self.__dict__ and
+                                        (fields is None or field.name in fields or field.attname in fields))
+
+    def save_base(self, *args, **kwargs):
+        super().save_base(*args, **kwargs)
+        self._loaded_values = dict()
+        self.remember_loaded_values(field.attname for field in self._meta.concrete_fields
+                                    if field.attname in self.__dict__)
+
+
+class HistoryChecksMemoMixin:
+    """
+    HistoryModel mixin that shares the "self_approve" result between all objects of the same model the same user saves
+    in a request (e.g. the forms of a formset). It only depends on the user's permissions and account age, the type of
+    change request and the fields changed, none of which change within a request. Results are memoized on the request
+    user object, just like Django's permission cache, so they only last as long as the request.
+
+    The sanity checks are not memoized: they include the throttle count, which changes with every object saved. The
+    options they read are already memoized per request by OptionsManager and permissions by Django's ModelBackend.
+    """
+
+    def get_history_memo(self):
+        user = getattr(getattr(self, 'request', None), 'user', None)
+        if user is None:
+            return None
+        if not hasattr(user, '_history_memo'):
+            user._history_memo = dict()
+        return user._history_memo
+
+    @cached_property
+    def self_approve(self):
+        memo = self.get_history_memo()
+        changed = self._cr.data_changed
+        if memo is None or not (changed is None or isinstance(changed, dict)):
+            return super().self_approve
+        key = ('self_approve', self._meta.label, self._cr.request_type, None if changed is None else frozenset(changed))
+        if key not in memo:
+            memo[key] = super().self_approve
+        return memo[key]
+
+
+class ArtworkModel(LoadedValuesMixin, models.Model):
     image = models.ImageField(upload_to=artwork_upload_location)
 
     ARTWORK_FOLDER = 'artwork'
@@ -180,7 +305,12 @@ class ArtworkModel(models.Model):
         return result
 
     def save(self, *args, **kwargs):
+        changed = self.get_changed_fields()
+        if changed == []:
+            return
         super().save(*args, **kwargs)
+        if changed is not None and 'image' not in changed:
+            return
         # The following operations are applied to the image file -every time- the model is saved (so do it only once!)
         # ImageMagick is used here as Pillow uses way too much memory
         # Strip unnecessary meta data and resize uploaded image down where necessary
@@ -250,3 +380,473 @@ class Language(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class ChangeRequestSummary(models.Model):
+    """
+    Diff summary of a ChangeRequest: the changed fields, or the added/modified/deleted related items. Computed when
+    the change request is saved (see signals), so history pages don't diff "data_changed" against "data_revert" for
+    every row on every view.
+    """
+    changerequest = models.OneToOneField('history.ChangeRequest', on_delete=models.CASCADE, primary_key=True,
+                                         related_name='summary')
+    # Only non-empty lists are stored
+    data = JSONField(default=dict)
+
+    def __str__(self):
+        return 'Summary of change request #{}'.format(self.changerequest_id)
+
+    @property
+    def fields(self):
+        return self.data.get('fields', [])
+
+    @property
+    def added(self):
+        return self.data.get('added', [])
+
+    @property
+    def modified(self):
+        return self.data.get('modified', [])
+
+    @property
+    def deleted(self):
+        return self.data.get('deleted', [])
+
+    @staticmethod
+    def summarize(cr):
+        if cr.request_type == cr.Type.RELATED:
+            diff = cr.diff_related
+            data = {'added': list(diff.added_str), 'modified': list(diff.modified_str),
+                    'deleted': list(diff.deleted_str)}
+        elif cr.request_type != cr.Type.ADD:
+            data = {'fields': list(cr.diff)}
+        else:
+            data = dict()
+        return {k: v for k, v in data.items() if v}
+
+    @classmethod
+    def update_for(cls, cr):
+        cls.objects.update_or_create(changerequest=cr, defaults={'data': cls.summarize(cr)})
+
+    @classmethod
+    def attach(cls, changerequests):
+        """
+        Loads summaries for a list of change requests with a single query, making "cr.summary" available without
+        further queries. Summaries that don't exist yet (change requests from before they were introduced, see the
+        "summarize_history" command) are computed but not saved, so pages listing change requests don't write.
+        """
+        changerequests = list(changerequests)
+        summaries = cls.objects.in_bulk([cr.pk for cr in changerequests])
+        for cr in changerequests:
+            summary = summaries.get(cr.pk)
+            if summary is None:
+                summary = cls(changerequest_id=cr.pk, data=cls.summarize(cr))
+            cr.summary = summary
+        return changerequests
+
+    @classmethod
+    def create_missing(cls, changerequests):
+        """Saves summaries for change requests that don't have one yet, returns the number created"""
+        missing = [cr.summary for cr in cls.attach(changerequests) if cr.summary._state.adding]
+        cls.objects.bulk_create(missing, ignore_conflicts=True)
+        return len(missing)
+
+    class Meta:
+        db_table = 'core_changerequest_summary'
+
+
+def prefetch_changerequests(changerequests):
+    """
+    Loads everything history pages show for a list of change requests with a small, constant number of queries:
+    users (one query, skipped when already loaded with select_related), target objects (one query per content type)
+    and diff summaries (one query). Returns the change requests as a list.
+
+    Note that GenericForeignKey doesn't cache misses: accessing "cr.object" for a deleted object still queries.
+    """
+    changerequests = list(changerequests)
+    if not changerequests:
+        return changerequests
+    prefetch_related_objects(changerequests, 'user')
+    # Group object ids by content type, then fetch each type with a single query
+    ids = dict()
+    for cr in changerequests:
+        if cr.object_id is not None:
+            ids.setdefault(cr.object_type_id, set()).add(cr.object_id)
+    objects = dict()
+    for object_type_id, object_ids in ids.items():
+        model = ContentType.objects.get_for_id(object_type_id).model_class()
+        if model is not None:
+            objects[object_type_id] = model._default_manager.in_bulk(object_ids)
+    field = changerequests[0]._meta.get_field('object')
+    for cr in changerequests:
+        obj = objects.get(cr.object_type_id, {}).get(cr.object_id) if cr.object_id is not None else None
+        field.set_cached_value(cr, obj)
+    return ChangeRequestSummary.attach(changerequests)
+
+
+class ChangeRequestArchive(models.Model):
+    """
+    Compressed copy of the "data_changed" and "data_revert" JSON of a settled ChangeRequest.
+
+    Archiving (see the "archive_history" command) moves the data here and clears it on the change request itself,
+    which keeps the hot table small; the change request row remains as a slim summary for listings (which only need
+    ChangeRequestSummary). The data is archived as stored (i.e. with text deltas, see textdiff). Pages that show the
+    changes restore it on the change request (see prepare_changerequest()); reverting moves it back to the row (see
+    prepare_revert()).
+    """
+    changerequest = models.OneToOneField('history.ChangeRequest', on_delete=models.CASCADE, primary_key=True,
+                                         related_name='archive')
+    data = models.BinaryField()
+    date_archived = models.DateTimeField(auto_now_add=True)
+
+    # Change requests that can no longer change status (except for reverting, which moves the data back first)
+    ARCHIVE_STATUSES = ('APPROVED', 'DENIED', 'WITHDRAWN')
+
+    def __str__(self):
+        return 'Archive of change request #{}'.format(self.changerequest_id)
+
+    @staticmethod
+    def compress(cr):
+        data = {'data_changed': cr.data_changed, 'data_revert': cr.data_revert}
+        return zlib.compress(json.dumps(data, separators=(',', ':')).encode('utf-8'), 9)
+
+    def decompress(self):
+        return json.loads(zlib.decompress(bytes(self.data)).decode('utf-8'))
+
+    @classmethod
+    def archive(cls, changerequests):
+        """Archives a list of change requests (should be called in a transaction); returns the number archived"""
+        changerequests = [cr for cr in changerequests if cr.data_changed is not None or cr.data_revert is not None]
+        if not changerequests:
+            return 0
+        # Listings read the summary, so make sure it exists before the data is gone
+        ChangeRequestSummary.create_missing(changerequests)
+        cls.objects.bulk_create([cls(changerequest_id=cr.pk, data=cls.compress(cr)) for cr in changerequests])
+        # Queryset update: no signals, the change requests themselves don't change
+        type(changerequests[0]).objects.filter(pk__in=[cr.pk for cr in changerequests])\
+            .update(data_changed=None, data_revert=None)
+        return len(changerequests)
+
+    @classmethod
+    def restore(cls, cr):
+        """Puts archived data back on the change request instance (without saving); returns True if it was archived"""
+        # Archived change requests have neither on the row (None "data_revert" alone means "add")
+        if cr.data_changed is not None or cr.data_revert is not None:
+            return False
+        try:
+            archive = cr.archive
+        except cls.DoesNotExist:
+            return False
+        data = archive.decompress()
+        cr.data_changed, cr.data_revert = data['data_changed'], data['data_revert']
+        return True
+
+    @classmethod
+    def unarchive(cls, cr):
+        """Moves archived data back to the change request and its row; returns True if it was archived"""
+        if not cls.restore(cr):
+            return False
+        type(cr).objects.filter(pk=cr.pk).update(data_changed=cr.data_changed, data_revert=cr.data_revert)
+        cls.objects.filter(changerequest_id=cr.pk).delete()
+        return True
+
+    class Meta:
+        db_table = 'core_changerequest_archive'
+
+
+def get_data_revert(cr):
+    """
+    Returns the "data_revert" of a change request with texts stored as deltas (see core.signals and textdiff) rebuilt
+    from "data_changed". Change requests loaded from the database hold the data as stored.
+    """
+    if cr.data_revert and cr.data_changed:
+        return decode_data(cr.data_revert, cr.data_changed)
+    return cr.data_revert
+
+
+def prepare_changerequest(cr):
+    """
+    Puts archived data and the full "data_revert" texts on a change request (without saving), for pages that show its
+    changes
+    """
+    ChangeRequestArchive.restore(cr)
+    cr.data_revert = get_data_revert(cr)
+    return cr
+
+
+def prepare_revert(cr):
+    """
+    Puts archived data and the full "data_revert" texts on a change request that is about to be reverted and on its
+    row, as ChangeRequest.revert() (in the history app) uses the values as they are. Archived data is moved rather
+    than copied, so it is only stored once. Saving the change request when it is reverted stores the texts as deltas
+    again. Should be called in the transaction that reverts the change request.
+    """
+    ChangeRequestArchive.unarchive(cr)
+    data_revert = get_data_revert(cr)
+    if data_revert != cr.data_revert:
+        type(cr).objects.filter(pk=cr.pk).update(data_revert=data_revert)
+        cr.data_revert = data_revert
+    return cr
+
+
+class HistoryEvent(models.Model):
+    """
+    A ChangeRequest applied to (approved) or reverted from an object, at the time it happened. Replaying the events
+    of an object in order gives its state at any date (see HistorySnapshot), including the time between the approval
+    and the revert of a change request that was reverted later. Recorded when change requests are saved (see signals).
+    """
+    class Type:
+        APPLY = 1
+        REVERT = 2
+        choices = (
+            (APPLY, 'Apply'),
+            (REVERT, 'Revert'),
+        )
+
+    object_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    changerequest = models.ForeignKey('history.ChangeRequest', on_delete=models.CASCADE, related_name='history_events')
+    type = models.PositiveSmallIntegerField(choices=Type.choices)
+    date = models.DateTimeField()
+
+    def __str__(self):
+        return '{} change request #{} at {}'.format(self.get_type_display(), self.changerequest_id, self.date)
+
+    @classmethod
+    def record(cls, cr, previous_status):
+        """Records the event for a change request that was saved with a new status, returns it or None"""
+        if cr.object_id is None or cr.status == previous_status:
+            return None
+        if cr.status == cr.Status.APPROVED:
+            event_type = cls.Type.APPLY
+        elif previous_status == cr.Status.APPROVED and cr.status == cr.Status.REVERTED:
+            event_type = cls.Type.REVERT
+        else:
+            return None
+        return cls.objects.create(object_type_id=cr.object_type_id, object_id=cr.object_id, changerequest=cr,
+                                  type=event_type, date=cr.date_modified or timezone.now())
+
+    class Meta:
+        db_table = 'core_history_event'
+        indexes = [
+            models.Index(fields=['object_type', 'object_id', 'date'], name='core_history_event_idx'),
+        ]
+
+
+class HistorySnapshot(models.Model):
+    """
+    Full state of an object (its "data_changed" fields) after a HistoryEvent, stored every HISTORY_SNAPSHOT_INTERVAL
+    events per object. Any historical state can then be reconstructed from the nearest snapshot plus a replay of at
+    most that many events (see get_state()). Events are never changed once recorded, so snapshots stay valid.
+    """
+    object_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    event = models.OneToOneField(HistoryEvent, on_delete=models.CASCADE, related_name='snapshot')
+    date = models.DateTimeField()
+    # None when the object was deleted
+    data = JSONField(null=True)
+
+    def __str__(self):
+        return 'Snapshot of {} #{} at {}'.format(self.object_type, self.object_id, self.date)
+
+    @classmethod
+    def get_events(cls, object_type, object_id, after=None):
+        """Returns events of an object in order, optionally after a snapshot"""
+        queryset = HistoryEvent.objects.filter(object_type=object_type, object_id=object_id)\
+            .select_related('changerequest__archive').order_by('date', 'pk')
+        if after is not None:
+            queryset = queryset.filter(Q(date__gt=after.date) | Q(date=after.date, pk__gt=after.event_id))
+        return queryset
+
+    @staticmethod
+    def replay(state, events):
+        for event in events:
+            cr = event.changerequest
+            ChangeRequestArchive.restore(cr)
+            if event.type == HistoryEvent.Type.REVERT:
+                # Puts back the values from before the change request
+                if cr.request_type == cr.Type.ADD:
+                    state = None
+                elif cr.request_type == cr.Type.MODIFY:
+                    state = dict(state or {}, **(get_data_revert(cr) or {}))
+                elif cr.request_type == cr.Type.DELETE:
+                    state = dict(cr.data_revert or {})
+            elif cr.request_type == cr.Type.ADD:
+                state = dict(cr.data_changed or {})
+            elif cr.request_type == cr.Type.MODIFY:
+                state = dict(state or {}, **(cr.data_changed or {}))
+            elif cr.request_type == cr.Type.DELETE:
+                state = None
+        return state
+
+    @classmethod
+    def get_state(cls, object_type, object_id, date=None):
+        """Returns the state (dictionary of fields) of an object at the given date (default: now) or None"""
+        snapshots = cls.objects.filter(object_type=object_type, object_id=object_id)
+        if date is not None:
+            snapshots = snapshots.filter(date__lte=date)
+        snapshot = snapshots.order_by('-date', '-event_id').first()
+        events = cls.get_events(object_type, object_id, after=snapshot)
+        if date is not None:
+            events = events.filter(date__lte=date)
+        return cls.replay(snapshot.data if snapshot is not None else None, events)
+
+    @classmethod
+    def update_for(cls, event):
+        """Stores a snapshot after an event when HISTORY_SNAPSHOT_INTERVAL events have passed since the last one"""
+        snapshot = cls.objects.filter(object_type_id=event.object_type_id, object_id=event.object_id)\
+            .order_by('-date', '-event_id').first()
+        events = cls.get_events(event.object_type_id, event.object_id, after=snapshot)\
+            .filter(Q(date__lt=event.date) | Q(date=event.date, pk__lte=event.pk))
+        if events.count() < settings.HISTORY_SNAPSHOT_INTERVAL:
+            return None
+        events = list(events)
+        data = cls.replay(snapshot.data if snapshot is not None else None, events)
+        return cls.objects.get_or_create(event=events[-1], defaults={
+            'object_type_id': event.object_type_id, 'object_id': event.object_id, 'date': events[-1].date,
+            'data': data})[0]
+
+    class Meta:
+        db_table = 'core_history_snapshot'
+        indexes = [
+            models.Index(fields=['object_type', 'object_id', 'date'], name='core_history_snapshot_idx'),
+        ]
+
+
+class RevertJob(models.Model):
+    """
+    Reverts all approved change requests a user made since a date (e.g. after vandalism or a broken bot). Jobs are
+    created through the admin or the history pages and processed in the background by manage.py revert_jobs, in
+    batches of one transaction each, so progress can be followed while the job runs.
+
+    Change requests are reverted newest first, so later changes (e.g. artwork added to a new object) are undone before
+    the changes they depend on. Objects that other users changed after the first change by this user are skipped and
+    reported as conflicts, as reverting would undo their changes as well. Pending change requests are denied.
+    """
+    class Status:
+        PENDING = 1
+        RUNNING = 2
+        FINISHED = 3
+        FAILED = 4
+        choices = (
+            (PENDING, 'Pending'),
+            (RUNNING, 'Running'),
+            (FINISHED, 'Finished'),
+            (FAILED, 'Failed'),
+        )
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='revertjob_target', on_delete=models.CASCADE)
+    since = models.DateTimeField('since')
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='revertjob_user',
+                                     on_delete=models.PROTECT)
+    status = models.PositiveSmallIntegerField('status', choices=Status.choices, default=Status.PENDING)
+    total = models.PositiveIntegerField(default=0)
+    reverted = models.PositiveIntegerField(default=0)
+    denied = models.PositiveIntegerField(default=0)
+    # Objects skipped because others changed them: {"object_type", "object_id", "object_str", "changerequests"}
+    conflicts = JSONField(default=list)
+    # Change requests that failed to revert: {"changerequest", "object_str", "message"}
+    errors = JSONField(default=list)
+    message = models.CharField(max_length=250, blank=True)
+    date_created = models.DateTimeField(auto_now_add=True)
+    date_modified = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return 'Revert changes by {} since {}'.format(self.user, self.since)
+
+    def get_absolute_url(self):
+        return reverse('revertjob-detail', args=[self.pk])
+
+    @staticmethod
+    def get_changerequest_model():
+        return apps.get_model('history', 'ChangeRequest')
+
+    def get_changerequests(self, status=None):
+        model = self.get_changerequest_model()
+        if status is None:
+            status = model.Status.APPROVED
+        return model.objects.filter(user=self.user, status=status, date_created__gte=self.since,
+                                    object_id__isnull=False).order_by('-date_created', '-pk')
+
+    def get_skipped(self):
+        skipped = {e['changerequest'] for e in self.errors}
+        for conflict in self.conflicts:
+            skipped.update(conflict['changerequests'])
+        return skipped
+
+    @property
+    def processed(self):
+        return self.reverted + len(self.get_skipped())
+
+    @property
+    def progress(self):
+        """Returns percentage of change requests processed"""
+        if self.status == self.Status.FINISHED:
+            return 100
+        return min(100, self.processed * 100 // self.total) if self.total else 0
+
+    def find_conflicts(self, changerequests):
+        """Returns list of conflicts for objects that users other than this user changed after this user did"""
+        model = self.get_changerequest_model()
+        objects = dict()
+        for cr in changerequests:
+            key = (cr.object_type_id, cr.object_id)
+            if key not in objects or cr.date_created < objects[key]['date']:
+                objects[key] = {'date': cr.date_created, 'object_str': cr.object_str}
+            objects[key].setdefault('changerequests', []).append(cr.pk)
+        if not objects:
+            return []
+        q = Q(pk__in=[])
+        for (object_type_id, object_id), values in objects.items():
+            q |= Q(object_type_id=object_type_id, object_id=object_id, date_modified__gt=values['date'])
+        changed = set(model.objects.filter(q, status=model.Status.APPROVED).exclude(user=self.user)
+                      .values_list('object_type_id', 'object_id').distinct())
+        return [{'object_type': key[0], 'object_id': key[1], 'object_str': values['object_str'],
+                 'changerequests': values['changerequests']} for key, values in objects.items() if key in changed]
+
+    def start(self):
+        changerequests = list(self.get_changerequests()
+                              .only('pk', 'object_type', 'object_id', 'object_str', 'date_created'))
+        # Change requests reverted before the job was restarted are no longer approved
+        self.total = self.reverted + len(changerequests)
+        self.conflicts = self.find_conflicts(changerequests)
+        self.status = self.Status.RUNNING
+        self.save()
+
+    def run_batch(self, batch_size):
+        """Reverts the next batch of change requests, returns False when there is nothing left to revert"""
+        # Archived data is moved back to the change request before it is reverted (see prepare_revert())
+        changerequests = list(self.get_changerequests().exclude(pk__in=self.get_skipped())
+                              .select_related('archive')[:batch_size])
+        if not changerequests:
+            return False
+        for cr in changerequests:
+            try:
+                with transaction.atomic():
+                    prepare_revert(cr)
+                    cr.mod = self.requested_by
+                    cr.revert()
+                    # Raised inside the transaction, so whatever revert() did write is rolled back
+                    if cr.status != cr.Status.REVERTED:
+                        raise ValueError('Change request was not reverted')
+            except Exception as e:
+                # Report any failure for this change request without aborting the rest of the job
+                logger.warning('Revert job {}: reverting change request {} failed: {}'.format(self.pk, cr.pk, e))
+                self.errors.append({'changerequest': cr.pk, 'object_str': cr.object_str,
+                                    'message': str(e) or e.__class__.__name__})
+            else:
+                self.reverted += 1
+        self.save()
+        return True
+
+    def finish(self):
+        # Imported here as the history models (imported by moderation) depend on this module
+        from .moderation import moderate
+        pending = self.get_changerequests(status=self.get_changerequest_model().Status.PENDING)
+        results = moderate(list(pending.values_list('pk', flat=True)), 'deny', self.requested_by)
+        self.denied = sum(r['status'] == 'denied' for r in results.values())
+        self.status = self.Status.FINISHED
+        self.save()
+
+    class Meta:
+        db_table = 'core_revert_job'
@@ -0,0 +1,83 @@
+"""AnimeSuki Core bulk moderation of change requests"""
+
+import logging
+from collections import OrderedDict
+
+from django.dispatch import Signal
+from django.db import transaction
+from django.utils import timezone
+
+from animesuki.history.models import ChangeRequest
+
+logger = logging.getLogger(__name__)
+
+# Sent (inside the transaction) after pending change requests have been denied in bulk with a single UPDATE, which
+# does not send the regular model signals. "changerequests" is the list of denied change requests.
+changerequests_denied = Signal(providing_args=['changerequests'])
+
+ACTIONS = ('approve', 'deny')
+
+
+def moderate(ids, action, user):
+    """
+    Approves or denies the given pending change requests in a single transaction.
+
+    Change requests are locked and grouped by the object they change, so each object is handled in one go and its
+    change requests are applied in the order they were made. Denying only changes the status of the change requests,
+    so all of them are denied with a single UPDATE. Approving applies the changes through ChangeRequest.approve(),
+    each in its own savepoint so a change request that fails doesn't affect the others.
+
+    Returns an ordered dictionary of id: result in the order of "ids", where result is a dictionary with a "status"
+    ("approved", "denied" or "error") and, for errors, a "message".
+    """
+    if action not in ACTIONS:
+        raise ValueError('Unknown action "{}"'.format(action))
+    results = OrderedDict((pk, {'status': 'error', 'message': 'Change request not found'}) for pk in ids)
+    with transaction.atomic():
+        # Lock in a consistent order (per object) to avoid deadlocks with concurrent moderation
+        changerequests = list(ChangeRequest.objects.select_for_update(of=('self',)).filter(pk__in=results.keys())
+                              .order_by('object_type_id', 'object_id', 'date_created', 'pk'))
+        pending = []
+        for cr in changerequests:
+            if cr.status != ChangeRequest.Status.PENDING:
+                results[cr.pk] = {'status': 'error', 'message': 'Change request is {}, not pending'
+                                  .format(cr.get_status_display().lower())}
+            else:
+                pending.append(cr)
+        if action == 'deny':
+            deny(pending, user, results)
+        else:
+            approve(pending, user, results)
+    logger.info('Moderation: {} {} of {} change requests by {}'.format(
+        action, sum(r['status'] != 'error' for r in results.values()), len(results), user))
+    return results
+
+
+def deny(changerequests, user, results):
+    if not changerequests:
+        return
+    now = timezone.now()
+    ChangeRequest.objects.filter(pk__in=[cr.pk for cr in changerequests])\
+        .update(status=ChangeRequest.Status.DENIED, mod=user, date_modified=now)
+    for cr in changerequests:
+        cr.status, cr.mod, cr.date_modified = ChangeRequest.Status.DENIED, user, now
+        results[cr.pk] = {'status': 'denied'}
+    changerequests_denied.send(sender=ChangeRequest, changerequests=changerequests)
+
+
+def approve(changerequests, user, results):
+    groups = OrderedDict()
+    for cr in changerequests:
+        groups.setdefault((cr.object_type_id, cr.object_id), []).append(cr)
+    for group in groups.values():
+        for cr in group:
+            try:
+                with transaction.atomic():
+                    cr.mod = user
+                    cr.approve()
+            except Exception as e:
+                # Report any failure for this change request without aborting the rest of the batch
+                logger.warning('Moderation: approving change request {} failed: {}'.format(cr.pk, e))
+                results[cr.pk] = {'status': 'error', 'message': str(e) or e.__class__.__name__}
+            else:
+                results[cr.pk] = {'status': 'approved'}
@@ -0,0 +1,159 @@
+"""AnimeSuki Core paginators"""
+
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, InvalidPage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+def estimate_count(queryset):
+    """Returns the number of rows the PostgreSQL planner expects the queryset to return (from table statistics)"""
+    query = queryset.query.clone()
+    query.clear_ordering(force_empty=True)
+    sql, params = query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPage(Sequence):
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<KeysetPage of {} objects>'.format(len(self.object_list))
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginates an ordered queryset by the values of its ordering fields instead of by OFFSET ("keyset pagination").
+
+    Pages are addressed by an opaque cursor holding the ordering values of the first or last row on the adjacent page,
+    so every page costs the same single (index backed) query no matter how deep it is. Only "next" and "previous"
+    navigation is possible. The ordering must be unique (the primary key is appended when it is not part of it) and
+    may only contain (nullable) fields of the model itself; NULL values sort the way PostgreSQL sorts them by default.
+
+    The total count is exact for small results and taken from planner statistics otherwise (see "approximate").
+    """
+    # Planner estimates below this number are replaced by an exact count
+    EXACT_COUNT_THRESHOLD = 10000
+
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True):
+        if orphans:
+            # The size of the last page is not known while paging by cursor
+            raise ValueError('KeysetPaginator does not support orphans')
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.allow_empty_first_page = allow_empty_first_page
+        ordering = list(object_list.query.order_by or object_list.model._meta.ordering)
+        if not {'pk', '-pk', object_list.model._meta.pk.name, '-' + object_list.model._meta.pk.name} & set(ordering):
+            ordering.append('pk')
+        self.ordering = [(o.lstrip('-'), o.startswith('-')) for o in ordering]
+
+    @cached_property
+    def estimate(self):
+        return estimate_count(self.object_list)
+
+    @property
+    def approximate(self):
+        return self.estimate >= self.EXACT_COUNT_THRESHOLD
+
+    @cached_property
+    def count(self):
+        if self.approximate:
+            return self.estimate
+        return self.object_list.count()
+
+    def get_field(self, name):
+        if name == 'pk':
+            return self.object_list.model._meta.pk
+        return self.object_list.model._meta.get_field(name)
+
+    def encode_cursor(self, obj, direction):
+        values = [getattr(obj, name) for name, descending in self.ordering]
+        data = json.dumps(values, cls=DjangoJSONEncoder, separators=(',', ':')).encode('utf-8')
+        return direction + base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Returns (direction, values) tuple for a cursor, raises InvalidPage when it is malformed"""
+        try:
+            direction, data = cursor[0], cursor[1:]
+            values = json.loads(base64.urlsafe_b64decode(data + '=' * (-len(data) % 4)).decode('utf-8'))
+            if direction not in ('n', 'p') or len(values) != len(self.ordering):
+                raise ValueError
+            return direction, [self.get_field(name).to_python(value) if value is not None else None
+                               for (name, descending), value in zip(self.ordering, values)]
+        except (IndexError, TypeError, ValueError, binascii.Error, ValidationError):
+            raise InvalidPage('Invalid cursor')
+
+    @staticmethod
+    def get_after_q(ordering, values):
+        """Returns Q object matching rows that come after the given values in the given ordering"""
+        q = Q(pk__in=[])
+        equal = Q()
+        for (name, descending), value in zip(ordering, values):
+            # PostgreSQL sorts NULL values last in ascending order and first in descending order
+            if value is None:
+                after = Q(**{name + '__isnull': False}) if descending else None
+            elif descending:
+                after = Q(**{name + '__lt': value})
+            else:
+                after = Q(**{name + '__gt': value}) | Q(**{name + '__isnull': True})
+            if after is not None:
+                q |= equal & after
+            equal &= Q(**{name + '__isnull': True}) if value is None else Q(**{name: value})
+        return q
+
+    def page(self, cursor=None):
+        queryset = self.object_list
+        direction, values = self.decode_cursor(cursor) if cursor else ('n', None)
+        ordering = self.ordering
+        if direction == 'p':
+            # Walk backwards from the cursor using the inverse ordering (NULL placement is inverted as well)
+            ordering = [(name, not descending) for name, descending in ordering]
+        if values is not None:
+            queryset = queryset.filter(self.get_after_q(ordering, values))
+        queryset = queryset.order_by(*[('-' if descending else '') + name for name, descending in ordering])
+        object_list = list(queryset[:self.per_page + 1])
+        more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        if not object_list and values is None and not self.allow_empty_first_page:
+            raise EmptyPage('That page contains no results')
+        if direction == 'p':
+            object_list.reverse()
+            has_next, has_previous = True, more
+        else:
+            has_next, has_previous = more, values is not None
+        return KeysetPage(object_list, self,
+                          next_cursor=self.encode_cursor(object_list[-1], 'n') if has_next and object_list else None,
+                          previous_cursor=self.encode_cursor(object_list[0], 'p')
+                          if has_previous and object_list else None)
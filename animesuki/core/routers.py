@@ -0,0 +1,68 @@
+"""AnimeSuki database routers"""
+
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_state = threading.local()
+
+
+def pin_to_primary():
+    """Sends all following reads in this thread (i.e. the current request) to the primary database"""
+    _state.pinned = True
+
+
+def is_pinned():
+    return getattr(_state, 'pinned', False)
+
+
+def has_written():
+    return getattr(_state, 'written', False)
+
+
+def get_replica():
+    """Returns the replica for this thread (i.e. the current request), so all its reads see the same replication lag"""
+    replica = getattr(_state, 'replica', None)
+    if replica not in settings.DATABASE_REPLICAS:
+        replica = _state.replica = random.choice(settings.DATABASE_REPLICAS)
+    return replica
+
+
+def reset():
+    _state.pinned = False
+    _state.written = False
+    _state.replica = None
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends writes to the primary ("default") database and reads to one of the DATABASE_REPLICAS, chosen at random
+    once per request (see ReplicaPinMiddleware, which calls reset() for every request).
+
+    Reads go to the primary as well when there are no replicas, inside a transaction (so a transaction always sees
+    its own writes), and once the current thread has been pinned to the primary. Any write pins the thread, and
+    ReplicaPinMiddleware keeps a user's requests pinned for REPLICA_PIN_SECONDS after a write ("read your writes").
+    """
+
+    def db_for_read(self, model, **hints):
+        if not settings.DATABASE_REPLICAS or is_pinned() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return get_replica()
+
+    def db_for_write(self, model, **hints):
+        _state.written = True
+        pin_to_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas contain the same data as the primary
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Replicas get their schema through replication
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,65 @@
+"""AnimeSuki Core signals"""
+
+from django.conf import settings
+from django.db.models.signals import pre_save, post_save, post_init
+from django.dispatch import receiver
+
+from animesuki.history.models import ChangeRequest
+
+from .moderation import changerequests_denied
+from .models import ChangeRequestSummary, HistoryEvent, HistorySnapshot
+from .textdiff import encode_data
+
+
+def compact_changerequest(cr):
+    """Replaces long texts in "data_revert" by deltas against the new texts in "data_changed" (see textdiff)"""
+    if cr.request_type == ChangeRequest.Type.MODIFY and cr.data_revert and cr.data_changed:
+        cr.data_revert = encode_data(cr.data_revert, cr.data_changed, settings.HISTORY_TEXT_DELTA_MIN_LENGTH)
+
+
+# Fields of which receivers need the previous values when a change request is saved (see "_previous_values")
+CHANGEREQUEST_TRACKED_FIELDS = ('object_type_id', 'object_id', 'status')
+
+
+def get_tracked_values(cr):
+    """Returns tuple of CHANGEREQUEST_TRACKED_FIELDS values of a stored change request or None when not available"""
+    if cr.pk is None or any(f not in cr.__dict__ for f in CHANGEREQUEST_TRACKED_FIELDS):
+        return None
+    return tuple(getattr(cr, f) for f in CHANGEREQUEST_TRACKED_FIELDS)
+
+
+@receiver(post_init, sender=ChangeRequest)
+def changerequest_loaded(sender, instance, **kwargs):
+    # Deltas are kept as stored: pages that show "data_revert" rebuild them (see prepare_changerequest())
+    instance._tracked_values = get_tracked_values(instance)
+
+
+@receiver(pre_save, sender=ChangeRequest)
+def changerequest_saving(sender, instance, **kwargs):
+    # Written with deltas, the instance keeps the values it was saved with (see changerequest_saved)
+    instance._data_revert_saving = instance.data_revert
+    compact_changerequest(instance)
+    # Values as loaded (or last saved), so receivers can tell what changed without reading the row again
+    instance._previous_values = getattr(instance, '_tracked_values', None)
+    if instance._previous_values is None and instance.pk is not None:
+        instance._previous_values = ChangeRequest.objects.filter(pk=instance.pk)\
+            .values_list(*CHANGEREQUEST_TRACKED_FIELDS).first()
+
+
+@receiver(post_save, sender=ChangeRequest)
+def changerequest_saved(sender, instance, **kwargs):
+    instance.data_revert = instance.__dict__.pop('_data_revert_saving', instance.data_revert)
+    instance._tracked_values = get_tracked_values(instance)
+    # Diff changes when the change request is created and when it is approved or reverted ("data_revert" is set)
+    ChangeRequestSummary.update_for(instance)
+    previous = instance._previous_values
+    event = HistoryEvent.record(instance, previous[2] if previous is not None else None)
+    if event is not None:
+        HistorySnapshot.update_for(event)
+
+
+@receiver(changerequests_denied, sender=ChangeRequest)
+def changerequests_denied_in_bulk(sender, changerequests, **kwargs):
+    # Status changed with a queryset update: keep the values to compare with on the next save up to date
+    for cr in changerequests:
+        cr._tracked_values = get_tracked_values(cr)
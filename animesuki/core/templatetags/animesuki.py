@@ -1,9 +1,13 @@
 """AnimeSuki Template Tags & Filters"""
 
 from django import template
+from django.urls import reverse
+from django.utils.http import urlencode
 
 register = template.Library()
 
+from ..models import HistorySnapshot, prefetch_changerequests, prepare_changerequest
+from ..textdiff import inline_diff
 from ..utils import DatePrecision
 
 
@@ -80,3 +84,38 @@ def call_method(obj, func, *args, **kwargs):
 @register.filter
 def date_precision(value, precision):
     return DatePrecision.get_precision(value, precision)
+
+
+@register.simple_tag
+def history_prefetch(changerequests):
+    """Returns change requests as a list with users, target objects and diff summaries (as "cr.summary") loaded"""
+    return prefetch_changerequests(changerequests)
+
+
+@register.simple_tag
+def history_prepare(changerequest):
+    """Prepares a change request for showing its changes (see prepare_changerequest()), outputs nothing"""
+    prepare_changerequest(changerequest)
+    return ''
+
+
+@register.simple_tag
+def history_state(changerequest):
+    """Returns the full state of the changed object right after an (approved) change request"""
+    return HistorySnapshot.get_state(changerequest.object_type_id, changerequest.object_id,
+                                     changerequest.date_modified)
+
+
+@register.simple_tag
+def revert_job_url(changerequest):
+    """Returns URL of the form for reverting all changes by the user of a change request since that change request"""
+    return reverse('revertjob-create') + '?' + urlencode({'user': changerequest.user.username,
+                                                          'since': changerequest.date_created.isoformat()})
+
+
+@register.simple_tag
+def text_diff(old, new, min_length=100):
+    """Returns old and new text as one text with changes marked (or None for short or non-text values)"""
+    if not isinstance(old, str) or not isinstance(new, str) or max(len(old), len(new)) < min_length:
+        return None
+    return inline_diff(old, new)
@@ -0,0 +1,244 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.db import connection
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from animesuki.history.models import ChangeRequest
+from animesuki.media.models import Media
+
+from ..models import ChangeRequestArchive, ChangeRequestSummary, HistoryEvent, HistorySnapshot, prepare_revert
+from ..textdiff import DELTA_KEY
+
+
+class ChangeRequestSummaryTest(TestCase):
+
+    def setUp(self):
+        self.media = Media.objects.bulk_create([Media(title='New Title')])[0]
+        self.user = get_user_model().objects.create_user(username='test_user', email='test@example.com')
+
+    def create_changerequest(self, **kwargs):
+        return ChangeRequest.objects.create(object_type=ContentType.objects.get_for_model(Media),
+                                            object_id=self.media.pk, object_str=str(self.media),
+                                            request_type=ChangeRequest.Type.MODIFY, user=self.user,
+                                            data_changed={'title': 'New Title', 'episodes': 12},
+                                            data_revert={'title': 'Old Title', 'episodes': 12}, **kwargs)
+
+    def test_changerequest_summary(self):
+        cr = self.create_changerequest()
+        summary = ChangeRequestSummary.objects.get(changerequest=cr)
+        self.assertEqual(summary.fields, list(cr.diff))
+        self.assertEqual(summary.added, [])
+        # Summary should follow changes to the change request
+        cr.data_revert = None
+        cr.request_type = ChangeRequest.Type.ADD
+        cr.save()
+        self.assertEqual(ChangeRequestSummary.objects.get(changerequest=cr).data, {})
+
+    def test_changerequest_summary_attach(self):
+        crs = [self.create_changerequest() for i in range(5)]
+        # Change requests from before summaries existed are summarized when listed, without saving
+        ChangeRequestSummary.objects.filter(changerequest=crs[0]).delete()
+        changerequests = list(ChangeRequest.objects.order_by('pk'))
+        with self.assertNumQueries(1):
+            ChangeRequestSummary.attach(changerequests)
+        self.assertEqual(changerequests[0].summary.fields, list(crs[0].diff))
+        self.assertFalse(ChangeRequestSummary.objects.filter(changerequest=crs[0]).exists())
+        out = StringIO()
+        call_command('summarize_history', stdout=out)
+        self.assertIn('Created 1 change request summaries', out.getvalue())
+        self.assertTrue(ChangeRequestSummary.objects.filter(changerequest=crs[0]).exists())
+        changerequests = list(ChangeRequest.objects.all())
+        # Single query for any number of change requests, and no diffing while rendering
+        with self.assertNumQueries(1):
+            ChangeRequestSummary.attach(changerequests)
+        # Users, media and summaries
+        template = Template('{% load animesuki %}{% history_prefetch crs as items %}'
+                            '{% for cr in items %}{{ cr.summary.fields|join:"," }};{% endfor %}')
+        with self.assertNumQueries(3):
+            output = template.render(Context({'crs': changerequests}))
+        self.assertEqual(output, ';'.join([','.join(crs[0].diff)] * 5) + ';')
+
+
+class PrefetchChangeRequestsTest(TestCase):
+
+    def setUp(self):
+        media = Media.objects.bulk_create([Media(title='Test {}'.format(i)) for i in range(5)])
+        users = [get_user_model().objects.create_user(username='user{}'.format(i), email='user{}@example.com'.format(i))
+                 for i in range(3)]
+        # Change requests on two different content types, by different users
+        for i, obj in enumerate(media + users):
+            ChangeRequest.objects.create(object_type=ContentType.objects.get_for_model(obj), object_id=obj.pk,
+                                         object_str=str(obj), request_type=ChangeRequest.Type.MODIFY,
+                                         user=users[i % len(users)], data_changed={'title': 'New'},
+                                         data_revert={'title': 'Old'})
+        ContentType.objects.clear_cache()
+
+    def render(self, count):
+        template = Template('{% load animesuki %}{% history_prefetch crs as items %}{% for cr in items %}'
+                            '{{ cr.object }} {{ cr.object.get_absolute_url }} {{ cr.user.username }} '
+                            '{{ cr.summary.fields|join:"," }};{% endfor %}')
+        return template.render(Context({'crs': ChangeRequest.objects.order_by('pk')[:count]}))
+
+    def test_prefetch_changerequests(self):
+        # Warm up content type cache
+        self.render(8)
+        # Change requests, users, one query per content type and summaries
+        with self.assertNumQueries(5):
+            output = self.render(8)
+        self.assertEqual(output.count(';'), 8)
+        self.assertIn(Media.objects.get(title='Test 0').get_absolute_url(), output)
+        self.assertIn('user2', output)
+        # Number of queries doesn't depend on the number of rows
+        with self.assertNumQueries(4):
+            self.render(3)
+
+
+class ChangeRequestIndexTest(TestCase):
+
+    def test_changerequest_indexes(self):
+        # Disable sequential scans so the plan doesn't depend on the (tiny) size of the test table
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        # History list filtered on status, newest first
+        for status, name in ChangeRequest.Status.choices:
+            plan = ChangeRequest.objects.filter(status=status).order_by('-date_created')[:50].explain()
+            self.assertIn('history_cr_{}_date_idx'.format(name.lower()), plan)
+        # History of a single object
+        plan = ChangeRequest.objects.filter(object_type=ContentType.objects.get_for_model(Media), object_id=1)\
+            .order_by('-date_created')[:50].explain()
+        self.assertIn('history_cr_object_date_idx', plan)
+
+
+class ChangeRequestArchiveTest(TestCase):
+    data_revert = {'title': 'Old', 'synopsis': 'Long text ' * 99 + 'Old text'}
+
+    def setUp(self):
+        self.media = Media.objects.bulk_create([Media(title='Test')])[0]
+        self.user = get_user_model().objects.create_user(username='test_user', email='test@example.com')
+        self.crs = dict()
+        for status in (ChangeRequest.Status.APPROVED, ChangeRequest.Status.DENIED, ChangeRequest.Status.PENDING):
+            self.crs[status] = ChangeRequest.objects.create(
+                object_type=ContentType.objects.get_for_model(Media), object_id=self.media.pk, object_str='Test',
+                request_type=ChangeRequest.Type.MODIFY, status=status, user=self.user,
+                data_changed={'title': 'New', 'synopsis': 'Long text ' * 100}, data_revert=self.data_revert)
+        ChangeRequest.objects.update(date_modified=timezone.now() - timezone.timedelta(days=400))
+
+    def test_archive_history(self):
+        summary = ChangeRequestSummary.objects.get(changerequest=self.crs[ChangeRequest.Status.APPROVED]).data
+        out = StringIO()
+        call_command('archive_history', days=365, batch_size=1, stdout=out)
+        self.assertIn('Archived 2 change requests', out.getvalue())
+        # Pending change requests are never archived
+        pending = ChangeRequest.objects.get(pk=self.crs[ChangeRequest.Status.PENDING].pk)
+        self.assertIsNotNone(pending.data_changed)
+        self.assertFalse(ChangeRequestArchive.restore(pending))
+        cr = ChangeRequest.objects.get(pk=self.crs[ChangeRequest.Status.APPROVED].pk)
+        self.assertEqual(ChangeRequest.objects.filter(pk=cr.pk).values_list('data_changed', 'data_revert').get(),
+                         (None, None))
+        archive = ChangeRequestArchive.objects.get(changerequest=cr)
+        self.assertLess(len(archive.data), len('Long text ' * 100))
+        # Summary is unaffected, data is restored as stored where the changes are shown
+        self.assertEqual(ChangeRequestSummary.objects.get(changerequest=cr).data, summary)
+        # Archived as stored (with text deltas)
+        self.assertEqual(archive.decompress(),
+                         ChangeRequest.objects.values('data_changed', 'data_revert').get(pk=pending.pk))
+        self.assertIn(DELTA_KEY, archive.decompress()['data_revert']['synopsis'])
+        self.assertIsNone(cr.data_changed)
+        template = Template('{% load animesuki %}{% history_prepare cr %}{{ cr.data_changed.title }} '
+                            '{{ cr.data_revert.title }}')
+        self.assertEqual(template.render(Context({'cr': cr})), 'New Old')
+        self.assertTrue(ChangeRequestArchive.objects.filter(changerequest=cr).exists())
+        # Reverting moves the data back to the change request
+        cr = prepare_revert(ChangeRequest.objects.get(pk=cr.pk))
+        self.assertEqual(cr.data_revert, self.data_revert)
+        self.assertFalse(ChangeRequestArchive.objects.filter(changerequest=cr).exists())
+        self.assertEqual(ChangeRequest.objects.get(pk=cr.pk).data_revert, self.data_revert)
+        cr.status = ChangeRequest.Status.REVERTED
+        cr.save()
+        # Nothing left to archive
+        out = StringIO()
+        call_command('archive_history', days=365, stdout=out)
+        self.assertIn('Archived 0 change requests', out.getvalue())
+
+    def test_archive_history_recent(self):
+        ChangeRequest.objects.update(date_modified=timezone.now())
+        out = StringIO()
+        call_command('archive_history', days=365, stdout=out)
+        self.assertIn('Archived 0 change requests', out.getvalue())
+
+
+@override_settings(HISTORY_SNAPSHOT_INTERVAL=10)
+class HistorySnapshotTest(TestCase):
+
+    def setUp(self):
+        self.media = Media.objects.bulk_create([Media(title='Episode 0')])[0]
+        self.user = get_user_model().objects.create_user(username='test_user', email='test@example.com')
+        self.object_type = ContentType.objects.get_for_model(Media)
+        self.crs = [self.create_changerequest(ChangeRequest.Type.ADD, {'title': 'Episode 0', 'episodes': 0})]
+        for i in range(1, 60):
+            self.crs.append(self.create_changerequest(ChangeRequest.Type.MODIFY, {'episodes': i}))
+        # Denied change requests are not part of the history
+        self.create_changerequest(ChangeRequest.Type.MODIFY, {'title': 'Denied'}, status=ChangeRequest.Status.DENIED)
+
+    def create_changerequest(self, request_type, data, status=ChangeRequest.Status.APPROVED):
+        return ChangeRequest.objects.create(object_type=self.object_type, object_id=self.media.pk,
+                                            object_str=str(self.media), request_type=request_type, status=status,
+                                            user=self.user, data_changed=data, data_revert={})
+
+    def test_history_snapshot(self):
+        self.assertEqual(HistorySnapshot.objects.filter(object_id=self.media.pk).count(), 6)
+        for i in (0, 9, 10, 33, 59):
+            cr = ChangeRequest.objects.get(pk=self.crs[i].pk)
+            state = HistorySnapshot.get_state(self.object_type, self.media.pk, cr.date_modified)
+            self.assertEqual(state, {'title': 'Episode 0', 'episodes': i})
+            # Same result as a full replay
+            self.assertEqual(state, HistorySnapshot.replay(None, HistorySnapshot.get_events(
+                self.object_type, self.media.pk).filter(date__lte=cr.date_modified)))
+        self.assertIsNone(HistorySnapshot.get_state(self.object_type, self.media.pk,
+                                                    timezone.now() - timezone.timedelta(days=1)))
+
+    def test_history_snapshot_revert(self):
+        dates = [ChangeRequest.objects.get(pk=self.crs[i].pk).date_modified for i in (9, 24, 25, 33, 59)]
+        cr = ChangeRequest.objects.get(pk=self.crs[25].pk)
+        cr.data_revert = {'episodes': 24}
+        cr.status = ChangeRequest.Status.REVERTED
+        cr.save()
+        # The revert is an event of its own: snapshots and the state before it stay as they were
+        self.assertEqual(HistorySnapshot.objects.filter(object_id=self.media.pk).count(), 6)
+        self.assertEqual(HistoryEvent.objects.filter(changerequest=cr).count(), 2)
+        for i, date in zip((9, 24, 25, 33, 59), dates):
+            self.assertEqual(HistorySnapshot.get_state(self.object_type, self.media.pk, date),
+                             {'title': 'Episode 0', 'episodes': i})
+        # Same result as a full replay
+        state = HistorySnapshot.get_state(self.object_type, self.media.pk)
+        self.assertEqual(state, {'title': 'Episode 0', 'episodes': 24})
+        self.assertEqual(state, HistorySnapshot.replay(None, HistorySnapshot.get_events(self.object_type,
+                                                                                        self.media.pk)))
+
+    def test_history_snapshot_bounded_replay(self):
+        # Snapshot lookup plus change requests since the snapshot (never more than the interval)
+        with self.assertNumQueries(2):
+            state = HistorySnapshot.get_state(self.object_type, self.media.pk)
+        self.assertEqual(state['episodes'], 59)
+        self.create_changerequest(ChangeRequest.Type.DELETE, {})
+        self.assertIsNone(HistorySnapshot.get_state(self.object_type, self.media.pk))
+
+    def test_snapshot_history_command(self):
+        HistorySnapshot.objects.filter(pk__in=HistorySnapshot.objects.order_by('date')[3:].values('pk')).delete()
+        out = StringIO()
+        call_command('snapshot_history', stdout=out)
+        self.assertIn('Created 3 history snapshots', out.getvalue())
+        self.assertEqual(HistorySnapshot.get_state(self.object_type, self.media.pk)['episodes'], 59)
+
+    def test_history_state_api(self):
+        date = ChangeRequest.objects.get(pk=self.crs[25].pk).date_modified
+        response = self.client.get('/v1/media/{}/state'.format(self.media.pk), {'date': date.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data'], {'title': 'Episode 0', 'episodes': 25})
+        response = self.client.get('/v1/media/{}/state'.format(self.media.pk), {'date': '2000-01-01'})
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,66 @@
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+
+from animesuki.history.models import ChangeRequest
+from animesuki.media.models import Media, MediaCounter
+
+from ..moderation import moderate
+from ..utils import user_add_permission
+
+
+class ModerationTest(TestCase):
+
+    def setUp(self):
+        self.media = Media.objects.bulk_create([Media(title='Test 1'), Media(title='Test 2')])
+        self.user = get_user_model().objects.create_user(username='test_user', email='test@example.com')
+        self.mod = user_add_permission(ChangeRequest, 'mod_approve', get_user_model().objects.create_user(
+            username='test_mod', email='mod@example.com'))
+        self.crs = []
+        for i in range(6):
+            media = self.media[i % 2]
+            self.crs.append(ChangeRequest.objects.create(
+                object_type=ContentType.objects.get_for_model(Media), object_id=media.pk, object_str=str(media),
+                request_type=ChangeRequest.Type.MODIFY, user=self.user, data_changed={'episodes': i},
+                data_revert={'episodes': None}))
+
+    def test_moderate_deny(self):
+        self.assertEqual(MediaCounter.objects.get(media=self.media[0]).changerequests_pending, 3)
+        ChangeRequest.objects.filter(pk=self.crs[0].pk).update(status=ChangeRequest.Status.APPROVED)
+        ids = [cr.pk for cr in self.crs] + [0]
+        # Lock, UPDATE, counter updates (one per media)
+        with self.assertNumQueries(6):
+            results = moderate(ids, 'deny', self.mod)
+        self.assertEqual(list(results.keys()), ids)
+        self.assertEqual(results[self.crs[0].pk]['status'], 'error')
+        self.assertEqual(results[0], {'status': 'error', 'message': 'Change request not found'})
+        self.assertEqual([results[cr.pk]['status'] for cr in self.crs[1:]], ['denied'] * 5)
+        self.assertEqual(ChangeRequest.objects.filter(status=ChangeRequest.Status.DENIED, mod=self.mod).count(), 5)
+        for media in self.media:
+            counter = MediaCounter.objects.get(media=media)
+            self.assertEqual(counter.changerequests_pending, 0)
+            self.assertEqual(counter.changerequests, 3)
+
+    def test_moderate_approve(self):
+        results = moderate([cr.pk for cr in self.crs[:4]], 'approve', self.mod)
+        self.assertEqual([r['status'] for r in results.values()], ['approved'] * 4)
+        self.assertEqual(ChangeRequest.objects.filter(status=ChangeRequest.Status.APPROVED, mod=self.mod).count(), 4)
+        # Approving again reports an error for each change request
+        results = moderate([cr.pk for cr in self.crs[:4]], 'approve', self.mod)
+        self.assertEqual([r['status'] for r in results.values()], ['error'] * 4)
+        with self.assertRaises(ValueError):
+            moderate([self.crs[4].pk], 'delete', self.mod)
+
+    def test_moderate_api(self):
+        data = {'action': 'deny', 'ids': [self.crs[1].pk, self.crs[0].pk]}
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.post('/v1/changerequests/moderate', data, content_type='application/json')
+                         .status_code, 403)
+        self.client.force_login(self.mod)
+        response = self.client.post('/v1/changerequests/moderate', data, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [{'id': self.crs[1].pk, 'status': 'denied'},
+                                                      {'id': self.crs[0].pk, 'status': 'denied'}])
+        for data in ({'action': 'deny', 'ids': []}, {'action': 'deny', 'ids': ['x']}, {'action': 'x', 'ids': [1]}):
+            response = self.client.post('/v1/changerequests/moderate', data, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
@@ -0,0 +1,43 @@
+from django.http import HttpResponse
+from django.test import TestCase, RequestFactory
+
+from ..middleware import OptionCacheMiddleware
+from ..models import Option
+
+
+class OptionCacheTest(TestCase):
+    fixtures = ['option.json']
+
+    def setUp(self):
+        self.addCleanup(Option.objects.end_request)
+
+    def test_option_cache(self):
+        # Without an active request every lookup queries the database
+        with self.assertNumQueries(2):
+            self.assertFalse(Option.objects.get_bool(Option.EMERGENCY_SHUTDOWN))
+            self.assertFalse(Option.objects.get_bool(Option.EMERGENCY_SHUTDOWN))
+        Option.objects.start_request()
+        with self.assertNumQueries(2):
+            for i in range(10):
+                Option.objects.get_bool(Option.EMERGENCY_SHUTDOWN)
+                Option.objects.get_int(Option.HISTORY_THROTTLE_MAX)
+        # Saving an option takes effect immediately
+        option = Option.objects.get(code=Option.EMERGENCY_SHUTDOWN)
+        option.value = 'true'
+        option.save()
+        self.assertTrue(Option.objects.get_bool(Option.EMERGENCY_SHUTDOWN))
+        with self.assertRaises(Option.DoesNotExist):
+            Option.objects.get_value('does-not-exist')
+
+    def test_option_cache_middleware(self):
+        def get_response(request):
+            for i in range(10):
+                Option.objects.get_bool(Option.EMERGENCY_SHUTDOWN)
+            return HttpResponse()
+
+        middleware = OptionCacheMiddleware(get_response)
+        with self.assertNumQueries(1):
+            middleware(RequestFactory().get('/'))
+        # Values are not kept between requests
+        with self.assertNumQueries(1):
+            middleware(RequestFactory().get('/'))
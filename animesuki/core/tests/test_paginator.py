@@ -0,0 +1,110 @@
+import datetime
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, InvalidPage
+from django.test import TestCase
+
+from animesuki.history.models import ChangeRequest
+from animesuki.media.models import Media
+from animesuki.media.views import MediaListView
+
+from ..paginator import KeysetPaginator, estimate_count
+from ..views import HistoryKeysetPaginationMixin
+
+
+class KeysetPaginatorTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        media = []
+        for i in range(23):
+            # Duplicate titles and missing dates to test tie breaking and NULL handling
+            start_date = datetime.date(2000 + i % 5, 1, 1) if i % 4 else None
+            media.append(Media(title='Title {}'.format(i % 7), media_type=Media.Type.ANIME, start_date=start_date))
+        Media.objects.bulk_create(media)
+
+    def walk(self, paginator):
+        """Returns pks of all pages going forward, then of all pages going backward from the last page"""
+        forward, pages = [], []
+        page = paginator.page()
+        self.assertFalse(page.has_previous())
+        while True:
+            pages.append([obj.pk for obj in page])
+            forward.extend(pages[-1])
+            if not page.has_next():
+                break
+            page = paginator.page(page.next_cursor)
+        backward = [obj.pk for obj in page]
+        while page.has_previous():
+            page = paginator.page(page.previous_cursor)
+            self.assertEqual([obj.pk for obj in page], pages[-2])
+            pages.pop()
+            backward = [obj.pk for obj in page] + backward
+        return forward, backward
+
+    def test_keyset_paginator(self):
+        for ordering in (['title', 'pk'], ['-title', 'pk'], ['start_date', 'pk'], ['-start_date', 'pk'], ['-pk']):
+            queryset = Media.objects.order_by(*ordering)
+            expected = list(queryset.values_list('pk', flat=True))
+            forward, backward = self.walk(KeysetPaginator(queryset, 5))
+            self.assertEqual(forward, expected, ordering)
+            self.assertEqual(backward, expected, ordering)
+
+    def test_keyset_paginator_count(self):
+        paginator = KeysetPaginator(Media.objects.order_by('title'), 5)
+        self.assertEqual(paginator.ordering, [('title', False), ('pk', False)])
+        self.assertFalse(paginator.approximate)
+        self.assertEqual(paginator.count, 23)
+        self.assertGreater(estimate_count(Media.objects.all()), 0)
+
+    def test_keyset_paginator_invalid_cursor(self):
+        paginator = KeysetPaginator(Media.objects.order_by('title'), 5)
+        for cursor in ('x', 'nnotbase64', 'n' + 'W10', 'pWyJhIiwiYiJd'):
+            with self.assertRaises(InvalidPage):
+                paginator.page(cursor)
+
+    def test_keyset_paginator_arguments(self):
+        with self.assertRaises(ValueError):
+            KeysetPaginator(Media.objects.order_by('title'), 5, orphans=2)
+        paginator = KeysetPaginator(Media.objects.none(), 5, allow_empty_first_page=False)
+        with self.assertRaises(EmptyPage):
+            paginator.page()
+        self.assertEqual(len(KeysetPaginator(Media.objects.none(), 5).page()), 0)
+
+    @mock.patch.object(MediaListView, 'paginate_by', 5)
+    def test_keyset_paginator_view(self):
+        response = self.client.get('/anime/', {'order': '-start_date'})
+        self.assertEqual(response.status_code, 200)
+        next_cursor = response.context['page_obj'].next_cursor
+        response = self.client.get('/anime/', {'order': '-start_date', 'cursor': next_cursor})
+        self.assertEqual(response.status_code, 200)
+        view = response.context['view']
+        self.assertIn('cursor=', view.get_querystring())
+        # Changing order or status filter should return to the first page
+        self.assertNotIn('cursor=', view.get_querystring(order='title'))
+        self.assertNotIn('cursor=', view.get_querystring(status='current'))
+        self.assertEqual(self.client.get('/anime/', {'cursor': 'invalid'}).status_code, 404)
+
+
+    @mock.patch.object(HistoryKeysetPaginationMixin, 'paginate_by', 5, create=True)
+    def test_keyset_paginator_history(self):
+        user = get_user_model().objects.create_user(username='test_user', email='test@example.com')
+        media = Media.objects.all()[0]
+        ChangeRequest.objects.bulk_create([
+            ChangeRequest(object_type=ContentType.objects.get_for_model(Media), object_id=media.pk,
+                          object_str=str(media), request_type=ChangeRequest.Type.MODIFY, user=user,
+                          status=ChangeRequest.Status.APPROVED if i % 3 else ChangeRequest.Status.PENDING,
+                          data_changed={'episodes': i}, data_revert={'episodes': None})
+            for i in range(12)])
+        response = self.client.get('/history/', {'status': 'approved'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['page_obj'].paginator.count, 8)
+        next_cursor = response.context['page_obj'].next_cursor
+        response = self.client.get('/history/', {'status': 'approved', 'cursor': next_cursor})
+        self.assertEqual(len(response.context['object_list']), 3)
+        view = response.context['view']
+        self.assertIn('cursor=', view.get_querystring(cursor=response.context['page_obj'].previous_cursor))
+        self.assertNotIn('cursor=', view.get_querystring(status='pending'))
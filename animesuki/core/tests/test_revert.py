@@ -0,0 +1,113 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from animesuki.history.models import ChangeRequest
+from animesuki.media.models import Media
+
+from ..models import ChangeRequestArchive, RevertJob
+from ..utils import user_add_permission
+
+
+def revert(cr):
+    # Like ChangeRequest.revert(): puts back the "data_revert" values and saves the change request
+    Media.objects.filter(pk=cr.object_id).update(**cr.data_revert)
+    cr.status = ChangeRequest.Status.REVERTED
+    cr.save()
+
+
+class RevertJobTest(TestCase):
+
+    def setUp(self):
+        self.media = Media.objects.bulk_create([Media(title='Test 1', episodes=1), Media(title='Test 2', episodes=1)])
+        self.vandal = get_user_model().objects.create_user(username='vandal', email='vandal@example.com')
+        self.user = get_user_model().objects.create_user(username='test_user', email='test@example.com')
+        self.mod = user_add_permission(ChangeRequest, 'mod_approve', get_user_model().objects.create_user(
+            username='test_mod', email='mod@example.com'))
+        self.old = self.create_changerequest(self.media[0], self.vandal)
+        ChangeRequest.objects.filter(pk=self.old.pk).update(date_created=timezone.now() - timezone.timedelta(days=7))
+        self.since = timezone.now() - timezone.timedelta(days=1)
+        self.crs = [self.create_changerequest(self.media[i % 2], self.vandal) for i in range(5)]
+        self.pending = self.create_changerequest(self.media[0], self.vandal, status=ChangeRequest.Status.PENDING)
+        # Someone else changed the second media afterwards
+        self.create_changerequest(self.media[1], self.user)
+
+    def create_changerequest(self, media, user, status=ChangeRequest.Status.APPROVED):
+        return ChangeRequest.objects.create(object_type=ContentType.objects.get_for_model(Media), object_id=media.pk,
+                                            object_str=str(media), request_type=ChangeRequest.Type.MODIFY,
+                                            status=status, user=user, data_changed={'episodes': 1},
+                                            data_revert={'episodes': None})
+
+    @mock.patch.object(ChangeRequest, 'revert', autospec=True, side_effect=revert)
+    def test_revert_job(self, mock_revert):
+        job = RevertJob.objects.create(user=self.vandal, since=self.since, requested_by=self.mod)
+        out = StringIO()
+        call_command('revert_jobs', batch_size=2, stdout=out)
+        self.assertIn('Finished 1 revert jobs', out.getvalue())
+        job.refresh_from_db()
+        self.assertEqual(job.status, RevertJob.Status.FINISHED)
+        self.assertEqual((job.total, job.reverted, job.denied, job.progress), (5, 3, 1, 100))
+        # Newest first, skipping the media changed by someone else
+        reverted = [self.crs[4].pk, self.crs[2].pk, self.crs[0].pk]
+        self.assertEqual([c[0][0].pk for c in mock_revert.call_args_list], reverted)
+        self.assertIsNone(Media.objects.get(pk=self.media[0].pk).episodes)
+        self.assertEqual(len(job.conflicts), 1)
+        self.assertEqual(job.conflicts[0]['object_id'], self.media[1].pk)
+        self.assertEqual(sorted(job.conflicts[0]['changerequests']), [self.crs[1].pk, self.crs[3].pk])
+        self.assertEqual(ChangeRequest.objects.get(pk=self.pending.pk).status, ChangeRequest.Status.DENIED)
+        self.assertEqual(ChangeRequest.objects.get(pk=self.old.pk).status, ChangeRequest.Status.APPROVED)
+
+    @mock.patch.object(ChangeRequest, 'revert', autospec=True, side_effect=revert)
+    def test_revert_job_archived(self, mock_revert):
+        ChangeRequestArchive.archive([self.crs[4]])
+        job = RevertJob.objects.create(user=self.vandal, since=self.since, requested_by=self.mod)
+        call_command('revert_jobs', stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual((job.reverted, job.errors), (3, []))
+        self.assertIsNone(Media.objects.get(pk=self.media[0].pk).episodes)
+        # Data was moved back to the reverted change request: only stored once
+        self.assertFalse(ChangeRequestArchive.objects.exists())
+        cr = ChangeRequest.objects.values('status', 'data_changed', 'data_revert').get(pk=self.crs[4].pk)
+        self.assertEqual(cr, {'status': ChangeRequest.Status.REVERTED, 'data_changed': {'episodes': 1},
+                              'data_revert': {'episodes': None}})
+
+    @mock.patch.object(ChangeRequest, 'revert', autospec=True, side_effect=ValueError('Object was deleted'))
+    def test_revert_job_errors(self, mock_revert):
+        job = RevertJob.objects.create(user=self.vandal, since=self.since, requested_by=self.mod)
+        call_command('revert_jobs', stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, RevertJob.Status.FINISHED)
+        self.assertEqual(job.reverted, 0)
+        self.assertEqual([e['message'] for e in job.errors], ['Object was deleted'] * 3)
+
+    @mock.patch.object(ChangeRequest, 'revert', autospec=True,
+                       side_effect=lambda cr: Media.objects.filter(pk=cr.object_id).update(**cr.data_revert))
+    def test_revert_job_not_reverted(self, mock_revert):
+        job = RevertJob.objects.create(user=self.vandal, since=self.since, requested_by=self.mod)
+        call_command('revert_jobs', stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.reverted, 0)
+        self.assertEqual([e['message'] for e in job.errors], ['Change request was not reverted'] * 3)
+        # Changes made by a revert that did not finish are rolled back
+        self.assertEqual(Media.objects.get(pk=self.media[0].pk).episodes, 1)
+
+    def test_revert_job_views(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/history/revert').status_code, 302)
+        self.client.force_login(self.mod)
+        response = self.client.get('/history/revert', {'user': 'vandal'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['form'].initial['username'], 'vandal')
+        response = self.client.post('/history/revert', {'username': 'nobody', 'since': '2026-01-01 00:00'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('username', response.context['form'].errors)
+        response = self.client.post('/history/revert', {'username': 'vandal', 'since': '2026-01-01 00:00'})
+        job = RevertJob.objects.get()
+        self.assertEqual((job.user, job.requested_by, job.status), (self.vandal, self.mod, RevertJob.Status.PENDING))
+        self.assertRedirects(response, job.get_absolute_url())
+        self.assertContains(self.client.get(job.get_absolute_url()), 'Pending')
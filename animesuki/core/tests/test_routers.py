@@ -0,0 +1,80 @@
+import time
+from unittest import mock
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import HttpResponse
+from django.test import SimpleTestCase, RequestFactory, override_settings
+
+from animesuki.media.models import Media
+
+from .. import routers
+from ..middleware import ReplicaPinMiddleware
+from ..routers import PrimaryReplicaRouter
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_PIN_SECONDS=10)
+class PrimaryReplicaRouterTest(SimpleTestCase):
+
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+        routers.reset()
+        self.addCleanup(routers.reset)
+        # SimpleTestCase does not wrap tests in a transaction, but make sure of it
+        patcher = mock.patch.object(connections[DEFAULT_DB_ALIAS], 'in_atomic_block', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_router(self):
+        self.assertEqual(self.router.db_for_read(Media), 'replica')
+        self.assertEqual(self.router.db_for_write(Media), DEFAULT_DB_ALIAS)
+        # Reads after a write should go to the primary
+        self.assertEqual(self.router.db_for_read(Media), DEFAULT_DB_ALIAS)
+        routers.reset()
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(self.router.db_for_read(Media), DEFAULT_DB_ALIAS)
+        with mock.patch.object(connections[DEFAULT_DB_ALIAS], 'in_atomic_block', True):
+            self.assertEqual(self.router.db_for_read(Media), DEFAULT_DB_ALIAS)
+        self.assertTrue(self.router.allow_migrate(DEFAULT_DB_ALIAS, 'media'))
+        self.assertFalse(self.router.allow_migrate('replica', 'media'))
+
+    def test_middleware(self):
+        def read(request):
+            return HttpResponse(self.router.db_for_read(Media))
+
+        def write(request):
+            self.router.db_for_write(Media)
+            return HttpResponse(self.router.db_for_read(Media))
+
+        # Plain reads go to the replica and do not set the cookie
+        response = ReplicaPinMiddleware(read)(self.factory.get('/'))
+        self.assertEqual(response.content, b'replica')
+        self.assertNotIn(ReplicaPinMiddleware.COOKIE_NAME, response.cookies)
+        # Unsafe methods are pinned to the primary
+        self.assertEqual(ReplicaPinMiddleware(read)(self.factory.post('/')).content, DEFAULT_DB_ALIAS.encode())
+        # A write sets the cookie, which pins following requests
+        response = ReplicaPinMiddleware(write)(self.factory.post('/'))
+        cookie = response.cookies[ReplicaPinMiddleware.COOKIE_NAME]
+        self.assertEqual(cookie['max-age'], 10)
+        request = self.factory.get('/')
+        request.COOKIES[ReplicaPinMiddleware.COOKIE_NAME] = cookie.value
+        self.assertEqual(ReplicaPinMiddleware(read)(request).content, DEFAULT_DB_ALIAS.encode())
+        # Until the window has passed
+        request.COOKIES[ReplicaPinMiddleware.COOKIE_NAME] = str(int(time.time() - 1))
+        self.assertEqual(ReplicaPinMiddleware(read)(request).content, b'replica')
+        request.COOKIES[ReplicaPinMiddleware.COOKIE_NAME] = 'invalid'
+        self.assertEqual(ReplicaPinMiddleware(read)(request).content, b'replica')
+
+    @override_settings(DATABASE_REPLICAS=['replica1', 'replica2', 'replica3'])
+    def test_replica_per_request(self):
+        def read(request):
+            return HttpResponse(','.join(self.router.db_for_read(Media) for i in range(20)))
+
+        replicas = set()
+        for i in range(20):
+            used = set(ReplicaPinMiddleware(read)(self.factory.get('/')).content.decode().split(','))
+            # Every read of a request goes to the same replica
+            self.assertEqual(len(used), 1)
+            replicas.update(used)
+        # Requests are spread over the replicas
+        self.assertGreater(len(replicas), 1)
@@ -0,0 +1,158 @@
+import json
+import random
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.urls import path
+
+from animesuki.history.models import ChangeRequest
+from animesuki.media.models import Media
+
+from ..models import get_data_revert
+from ..utils import user_add_permission
+from ..views import history_urlpatterns
+from ..textdiff import DELTA_KEY, apply_delta, decode_data, encode_data, inline_diff, make_delta
+
+WORDS = ('the', 'young', 'hero', 'travels', 'across', 'a', 'kingdom', 'torn', 'by', 'war', 'and', 'meets',
+         'friends', 'who', 'help', 'him', 'uncover', 'secret', 'of', 'ancient', 'magic', 'school', 'girl', 'robot')
+
+
+def make_text(rng, paragraphs=3):
+    text = []
+    for p in range(paragraphs):
+        sentences = []
+        for s in range(rng.randint(4, 8)):
+            words = [rng.choice(WORDS) for w in range(rng.randint(8, 20))]
+            sentences.append(' '.join(words).capitalize() + '.')
+        text.append(' '.join(sentences))
+    return '\n\n'.join(text)
+
+
+def edit_text(rng, text, kind):
+    """Typical synopsis/description edits"""
+    words = text.split(' ')
+    i = rng.randrange(len(words))
+    if kind == 'typo':
+        words[i] = words[i][::-1]
+    elif kind == 'word':
+        words.insert(i, rng.choice(WORDS))
+    elif kind == 'sentence':
+        words.insert(i, 'Meanwhile the ' + ' '.join(rng.choice(WORDS) for w in range(12)) + '.')
+    elif kind == 'remove':
+        del words[i:i + 15]
+    elif kind == 'paragraph':
+        return text + '\n\n' + make_text(rng, 1)
+    elif kind == 'rewrite':
+        return make_text(rng)
+    return ' '.join(words)
+
+
+class TextDiffTest(SimpleTestCase):
+
+    def test_text_delta(self):
+        rng = random.Random(1)
+        for kind in ('typo', 'word', 'sentence', 'remove', 'paragraph', 'rewrite'):
+            for i in range(20):
+                old = make_text(rng)
+                new = edit_text(rng, old, kind)
+                self.assertEqual(apply_delta(new, make_delta(new, old)), old, kind)
+                self.assertEqual(apply_delta(old, make_delta(old, new)), new, kind)
+        self.assertEqual(apply_delta('', make_delta('', 'Text\r\n  with  spacing ')), 'Text\r\n  with  spacing ')
+        self.assertEqual(make_delta('Same text', 'Same text'), [])
+
+    def test_text_delta_corpus(self):
+        # Size of "data_revert" plus "data_changed" of modify change requests for a corpus of typical edits
+        rng = random.Random(2)
+        kinds = ['typo'] * 4 + ['word'] * 3 + ['sentence'] * 3 + ['remove'] * 2 + ['paragraph', 'rewrite']
+        size = compact_size = 0
+        for i in range(200):
+            old = {'synopsis': make_text(rng), 'episodes': 12}
+            new = {'synopsis': edit_text(rng, old['synopsis'], rng.choice(kinds)), 'episodes': 13}
+            encoded = encode_data(old, new, 500)
+            self.assertEqual(decode_data(encoded, new), old)
+            size += len(json.dumps(old)) + len(json.dumps(new))
+            compact_size += len(json.dumps(encoded)) + len(json.dumps(new))
+        # One full copy instead of two
+        self.assertLess(compact_size, size * 0.6)
+        # Short texts and texts without a counterpart are kept as they are
+        self.assertEqual(encode_data({'title': 'Old'}, {'title': 'New'}, 500), {'title': 'Old'})
+        self.assertEqual(encode_data({'synopsis': 'x' * 600}, {'synopsis': None}, 500), {'synopsis': 'x' * 600})
+
+    def test_inline_diff(self):
+        html = inline_diff('A <b>bold</b> tpyo\nhere', 'A <b>bold</b> typo\nhere')
+        self.assertEqual(html, 'A &lt;b&gt;bold&lt;/b&gt; <del class="alert-danger px-1">tpyo</del>'
+                               '<ins class="alert-success px-1">typo</ins><br>here')
+
+
+class ChangeRequestTextDeltaTest(TestCase):
+
+    def setUp(self):
+        self.media = Media.objects.bulk_create([Media(title='Test')])[0]
+        self.user = get_user_model().objects.create_user(username='test_user', email='test@example.com')
+        self.old = make_text(random.Random(3))
+        self.new = self.old.replace('.', '!', 1)
+
+    def create_changerequest(self):
+        return ChangeRequest.objects.create(object_type=ContentType.objects.get_for_model(Media),
+                                            object_id=self.media.pk, object_str=str(self.media),
+                                            request_type=ChangeRequest.Type.MODIFY, user=self.user,
+                                            data_changed={'synopsis': self.new}, data_revert={'synopsis': self.old})
+
+    def test_changerequest_text_delta(self):
+        cr = self.create_changerequest()
+        # Stored as delta, always full text on the model instance
+        self.assertEqual(cr.data_revert['synopsis'], self.old)
+        stored = ChangeRequest.objects.values_list('data_revert', flat=True).get(pk=cr.pk)
+        self.assertIn(DELTA_KEY, stored['synopsis'])
+        # Loaded as stored, rebuilt where shown
+        cr = ChangeRequest.objects.get(pk=cr.pk)
+        self.assertIn(DELTA_KEY, cr.data_revert['synopsis'])
+        self.assertEqual(get_data_revert(cr)['synopsis'], self.old)
+        template = Template('{% load animesuki %}{% history_prepare cr %}{{ cr.data_revert.synopsis }}')
+        self.assertEqual(template.render(Context({'cr': cr})), self.old)
+        # Saved as delta again
+        cr.save()
+        stored = ChangeRequest.objects.values_list('data_revert', flat=True).get(pk=cr.pk)
+        self.assertIn(DELTA_KEY, stored['synopsis'])
+        self.assertEqual(cr.data_revert['synopsis'], self.old)
+        template = Template('{% load animesuki %}{% text_diff cr.data_revert.synopsis cr.data_changed.synopsis %}')
+        self.assertIn('<ins class="alert-success px-1">', template.render(Context({'cr': cr})))
+
+    def test_changerequest_text_delta_revert(self):
+        cr = self.create_changerequest()
+        ChangeRequest.objects.filter(pk=cr.pk).update(status=ChangeRequest.Status.APPROVED)
+        stored = []
+
+        def action(request, pk):
+            # ChangeRequest.revert() uses the values as loaded
+            stored.append(ChangeRequest.objects.get(pk=pk).data_revert)
+            return None
+
+        view = history_urlpatterns([path('<int:pk>/action', action, name='action')])[0].callback
+        request = RequestFactory().post('/', {'action': 'revert'})
+        request.user = user_add_permission(ChangeRequest, 'mod_approve', self.user)
+        view(request, pk=cr.pk)
+        self.assertEqual(stored, [{'synopsis': self.old}])
+        # Stored as delta again when saved as reverted
+        cr = ChangeRequest.objects.get(pk=cr.pk)
+        cr.status = ChangeRequest.Status.REVERTED
+        cr.save()
+        stored = ChangeRequest.objects.values_list('data_revert', flat=True).get(pk=cr.pk)
+        self.assertIn(DELTA_KEY, stored['synopsis'])
+
+    def test_compact_history(self):
+        cr = self.create_changerequest()
+        ChangeRequest.objects.filter(pk=cr.pk).update(data_revert={'synopsis': self.old})
+        out = StringIO()
+        call_command('compact_history', '--dry-run', stdout=out)
+        self.assertIn('Would compact 1 of 1 change requests', out.getvalue())
+        call_command('compact_history', stdout=out)
+        stored = ChangeRequest.objects.values_list('data_revert', flat=True).get(pk=cr.pk)
+        self.assertIn(DELTA_KEY, stored['synopsis'])
+        out = StringIO()
+        call_command('compact_history', stdout=out)
+        self.assertIn('Compacted 0 of 1 change requests', out.getvalue())
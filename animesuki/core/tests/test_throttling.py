@@ -0,0 +1,78 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+
+from ..throttling import AnonTokenBucketThrottle, UserTokenBucketThrottle
+
+
+class ThrottledView(APIView):
+    permission_classes = ()
+    throttle_classes = (AnonTokenBucketThrottle, UserTokenBucketThrottle)
+
+    def get(self, request):
+        return Response('ok')
+
+
+class ScopedThrottledView(ThrottledView):
+    throttle_scope = 'scoped'
+
+
+@override_settings(REST_FRAMEWORK={
+    'DEFAULT_THROTTLE_RATES': {'anon': '3/min', 'user': '5/min', 'scoped.anon': '1/min'},
+})
+class TokenBucketThrottleTest(TestCase):
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        cache.clear()
+
+    def get(self, view, ip='10.0.0.1', user=None):
+        request = self.factory.get('/', REMOTE_ADDR=ip)
+        if user is not None:
+            force_authenticate(request, user=user)
+        return view.as_view()(request)
+
+
+    @mock.patch('animesuki.core.throttling.time.time')
+    def test_throttle_anon(self, now):
+        now.return_value = 1000.0
+        # Bucket holds 3 tokens
+        for _ in range(3):
+            self.assertEqual(self.get(ThrottledView).status_code, 200)
+        response = self.get(ThrottledView)
+        self.assertEqual(response.status_code, 429)
+        # One token refills every 20 seconds
+        self.assertEqual(response['Retry-After'], '20')
+        # Other IP addresses have their own bucket
+        self.assertEqual(self.get(ThrottledView, ip='10.0.0.2').status_code, 200)
+        # After the wait time a single token should be available again
+        now.return_value = 1020.0
+        self.assertEqual(self.get(ThrottledView).status_code, 200)
+        self.assertEqual(self.get(ThrottledView).status_code, 429)
+        # Per endpoint rate should be used when configured and is separate from the default bucket
+        now.return_value = 2000.0
+        self.assertEqual(self.get(ScopedThrottledView).status_code, 200)
+        response = self.get(ScopedThrottledView)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+        self.assertEqual(self.get(ThrottledView).status_code, 200)
+
+
+    @mock.patch('animesuki.core.throttling.time.time')
+    def test_throttle_user(self, now):
+        now.return_value = 1000.0
+        user = get_user_model().objects.create_user(username='test_user', email='test@example.com')
+        # Authenticated users are throttled per user (regardless of IP address) with the user rate
+        for i in range(5):
+            self.assertEqual(self.get(ThrottledView, ip='10.0.0.{}'.format(i), user=user).status_code, 200)
+        self.assertEqual(self.get(ThrottledView, user=user).status_code, 429)
+        # Anonymous requests from the same IP address are not affected
+        self.assertEqual(self.get(ThrottledView).status_code, 200)
+        # No per endpoint user rate configured, so the default user rate applies (and is already used up)
+        self.assertEqual(self.get(ScopedThrottledView, user=user).status_code, 429)
@@ -0,0 +1,88 @@
+"""AnimeSuki Core word level text deltas"""
+
+import difflib
+import json
+import re
+
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from django.utils.text import normalize_newlines
+
+# Words and the whitespace between them, so joining the tokens always gives back the original text
+TOKEN_RE = re.compile(r'\s+|\S+')
+# Key of the dictionary that replaces a text value by its delta
+DELTA_KEY = '__delta__'
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text)
+
+
+def get_opcodes(a, b):
+    return difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes()
+
+
+def make_delta(base, text):
+    """
+    Returns list of [start, end, replacement] operations that turn "base" into "text": tokens start:end of "base"
+    are replaced by the "replacement" string. Only the changed words are stored, so small edits give small deltas.
+    """
+    a, b = tokenize(base), tokenize(text)
+    return [[i1, i2, ''.join(b[j1:j2])] for tag, i1, i2, j1, j2 in get_opcodes(a, b) if tag != 'equal']
+
+
+def apply_delta(base, delta):
+    """Rebuilds the text a delta (from make_delta()) was made for from its base text"""
+    tokens = tokenize(base)
+    result, position = [], 0
+    for start, end, replacement in delta:
+        result.extend(tokens[position:start])
+        result.append(replacement)
+        position = end
+    result.extend(tokens[position:])
+    return ''.join(result)
+
+
+def is_delta(value):
+    return isinstance(value, dict) and DELTA_KEY in value
+
+
+def encode_data(data, base, min_length):
+    """
+    Returns copy of dictionary "data" with text values of at least "min_length" characters replaced by a delta
+    against the value of the same key in dictionary "base", when that is a text as well and the delta is smaller.
+    """
+    result = dict(data)
+    for key, value in data.items():
+        other = base.get(key)
+        if not isinstance(value, str) or not isinstance(other, str) or len(value) < min_length:
+            continue
+        delta = {DELTA_KEY: make_delta(other, value)}
+        if len(json.dumps(delta)) < len(json.dumps(value)):
+            result[key] = delta
+    return result
+
+
+def decode_data(data, base):
+    """Reverses encode_data(): returns copy of "data" with deltas replaced by the full text"""
+    return {key: apply_delta(base.get(key) or '', value[DELTA_KEY]) if is_delta(value) else value
+            for key, value in data.items()}
+
+
+def to_html(tokens):
+    return escape(normalize_newlines(''.join(tokens))).replace('\n', '<br>')
+
+
+def inline_diff(old, new):
+    """Returns HTML of "new" with words removed from and added to "old" marked with <del> and <ins>"""
+    a, b = tokenize(old), tokenize(new)
+    html = []
+    for tag, i1, i2, j1, j2 in get_opcodes(a, b):
+        if tag == 'equal':
+            html.append(to_html(a[i1:i2]))
+            continue
+        if i2 > i1:
+            html.append('<del class="alert-danger px-1">{}</del>'.format(to_html(a[i1:i2])))
+        if j2 > j1:
+            html.append('<ins class="alert-success px-1">{}</ins>'.format(to_html(b[j1:j2])))
+    return mark_safe(''.join(html))
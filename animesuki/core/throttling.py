@@ -0,0 +1,84 @@
+"""AnimeSuki API throttling"""
+
+import time
+
+from django.core.cache import cache
+
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from .utils import get_ip_from_request
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket throttle backed by the (shared) default cache, so limits hold across all worker processes.
+
+    Rates use the DRF format "<requests>/<period>" (e.g. "60/min"): the bucket holds at most <requests> tokens and
+    refills at <requests> per <period>. The rate is looked up in DEFAULT_THROTTLE_RATES under "<throttle_scope>.<scope>"
+    when the view sets "throttle_scope", falling back on "<scope>". A missing rate means no limit.
+
+    The bucket is stored as a single "theoretical arrival time" value (GCRA), so each request costs one cache read
+    and one cache write. Concurrent requests can race between the two, which at worst lets a request slip through.
+    """
+    scope = None
+    durations = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+    def __init__(self):
+        self.wait_time = None
+
+    def get_ident(self, request):
+        # Child classes should override this function; return None to skip throttling
+        raise NotImplementedError
+
+    def get_rate(self, view):
+        rates = api_settings.DEFAULT_THROTTLE_RATES
+        view_scope = getattr(view, 'throttle_scope', None)
+        if view_scope is not None and '{}.{}'.format(view_scope, self.scope) in rates:
+            return rates['{}.{}'.format(view_scope, self.scope)], view_scope
+        return rates.get(self.scope), 'default'
+
+    def parse_rate(self, rate):
+        num, period = rate.split('/')
+        return int(num), self.durations[period[0]]
+
+    def allow_request(self, request, view):
+        ident = self.get_ident(request)
+        rate, scope = self.get_rate(view)
+        if ident is None or rate is None:
+            return True
+        num, duration = self.parse_rate(rate)
+        interval = duration / num
+        key = 'throttle:{}:{}:{}'.format(self.scope, scope, ident)
+        now = time.time()
+        tat = max(cache.get(key, now), now)
+        # Bucket is empty when the theoretical arrival time is more than a full period (minus one token) ahead
+        if tat - now > duration - interval:
+            self.wait_time = tat - now - (duration - interval)
+            return False
+        tat += interval
+        cache.set(key, tat, int(tat - now) + 1)
+        return True
+
+    def wait(self):
+        return self.wait_time
+
+
+class AnonTokenBucketThrottle(TokenBucketThrottle):
+    """Throttles anonymous requests per IP address"""
+    scope = 'anon'
+
+    def get_ident(self, request):
+        if request.user and request.user.is_authenticated:
+            return None
+        return get_ip_from_request(request)
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """Throttles authenticated requests per user"""
+    scope = 'user'
+
+    def get_ident(self, request):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return None
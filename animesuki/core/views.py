@@ -1,12 +1,21 @@
 """AnimeSuki Core views"""
 
+from functools import wraps
+
 from django.core.exceptions import ObjectDoesNotExist
-from django.http import HttpResponsePermanentRedirect
+from django.core.paginator import InvalidPage
+from django.http import HttpResponsePermanentRedirect, Http404
+from django.urls import URLPattern
 from django.utils.http import urlencode
 from django.contrib.auth.mixins import PermissionRequiredMixin
 from django.contrib import messages
+from django.views.generic import CreateView, DetailView
+
+from animesuki.history.models import ChangeRequest
 
-from .forms import ArtworkActiveForm
+from .forms import ArtworkActiveForm, RevertJobForm
+from .models import RevertJob, prepare_revert
+from .paginator import KeysetPaginator
 
 
 class PermissionMessageMixin(PermissionRequiredMixin):
@@ -72,11 +81,15 @@ class CanonicalDetailViewMixin:
 class ListViewQueryStringMixin:
     ALLOWED_ORDER = []
 
-    def build_querystring(self, page=None, order=None):
+    def build_querystring(self, page=None, order=None, cursor=None):
         q = dict()
-        # Page
-        if page is not None:
+        # Page (or cursor when using keyset pagination)
+        if cursor is not None:
+            q['cursor'] = cursor
+        elif page is not None:
             q['page'] = page
+        elif self.request.GET.get('cursor', '').strip():
+            q['cursor'] = self.request.GET['cursor'].strip()
         else:
             try:
                 p = int(self.request.GET.get('page', 0))
@@ -94,6 +107,7 @@ class ListViewQueryStringMixin:
             # New sort order should reset page
             if q.get('page', None) is not None:
                 del q['page']
+            q.pop('cursor', None)
         elif o in self.ALLOWED_ORDER:
             q['order'] = o
         return q
@@ -109,4 +123,89 @@ class ListViewQueryStringMixin:
         q = self.build_querystring(order=order)
         if q['order'][0] == '-':
             return 'up'
-        return 'down'
\ No newline at end of file
+        return 'down'
+
+
+class KeysetPaginationMixin:
+    """
+    ListView mixin that replaces numbered pages by keyset pagination (see KeysetPaginator).
+
+    The queryset ordering (from get_ordering) determines the keyset, the current page is taken from the "cursor" query
+    parameter. Use with the "core/_keyset_paginator.html" template.
+    """
+    paginator_class = KeysetPaginator
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = self.get_paginator(queryset, page_size)
+        try:
+            page = paginator.page(self.request.GET.get('cursor', '').strip())
+        except InvalidPage as e:
+            raise Http404('Invalid page: {}'.format(e))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+
+class HistoryKeysetPaginationMixin(KeysetPaginationMixin):
+    """
+    KeysetPaginationMixin for the history app's list view (history:browse, see history_urlpatterns()): its
+    get_querystring() knows nothing about cursors, so the cursor for the paginator links is appended here.
+    """
+
+    def get_querystring(self, *args, cursor=None, **kwargs):
+        querystring = super().get_querystring(*args, **kwargs)
+        if cursor is None:
+            return querystring
+        return querystring + ('&' if querystring else '?') + urlencode({'cursor': cursor})
+
+
+class RevertJobCreateView(PermissionMessageMixin, CreateView):
+    """Creates a job reverting all changes by a user since a date (processed in the background, see RevertJob)"""
+    permission_required = 'history.mod_approve'
+    template_name = 'core/revertjob_form.html'
+    form_class = RevertJobForm
+
+    def get_initial(self):
+        return {'username': self.request.GET.get('user', ''), 'since': self.request.GET.get('since')}
+
+    def form_valid(self, form):
+        form.instance.requested_by = self.request.user
+        messages.success(self.request, 'Reverting changes by "{}" in the background'.format(form.instance.user))
+        return super().form_valid(form)
+
+
+class RevertJobDetailView(PermissionMessageMixin, DetailView):
+    permission_required = 'history.mod_approve'
+    template_name = 'core/revertjob_detail.html'
+    model = RevertJob
+
+
+def revert_action(view):
+    """
+    Decorates the history app's change request action view (history:action), so change requests that are about to be
+    reverted have the data ChangeRequest.revert() needs on their row (see prepare_revert()) when the view loads them.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method == 'POST' and request.POST.get('action') == 'revert' and \
+                request.user.has_perm('history.mod_approve'):
+            values = list(kwargs.values()) + list(args)
+            pk = kwargs.get('pk', values[0] if values else None)
+            cr = ChangeRequest.objects.filter(pk=pk).first() if str(pk).isdigit() else None
+            if cr is not None and cr.status == ChangeRequest.Status.APPROVED:
+                prepare_revert(cr)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def history_urlpatterns(urlpatterns):
+    """Returns the URL patterns of the history app with the views AnimeSuki extends replaced"""
+    patterns = []
+    for pattern in urlpatterns:
+        if isinstance(pattern, URLPattern) and pattern.name == 'browse':
+            view_class = pattern.callback.view_class
+            view = type(view_class.__name__, (HistoryKeysetPaginationMixin, view_class), {})
+            pattern = URLPattern(pattern.pattern, view.as_view(**pattern.callback.view_initkwargs),
+                                 pattern.default_args, pattern.name)
+        elif isinstance(pattern, URLPattern) and pattern.name == 'action':
+            pattern = URLPattern(pattern.pattern, revert_action(pattern.callback), pattern.default_args, pattern.name)
+        patterns.append(pattern)
+    return patterns
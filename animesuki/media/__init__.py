@@ -0,0 +1 @@
+default_app_config = 'animesuki.media.apps.MediaConfig'
@@ -0,0 +1,69 @@
+"""AnimeSuki recent activity feed"""
+
+import logging
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+
+from animesuki.history.models import ChangeRequest
+
+from .models import Media, MediaArtwork
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = 'activity:feed'
+
+
+def build_feed():
+    """
+    Returns the recent activity feed: a dictionary with lists of recently added media ("media"), recently approved
+    change requests ("changes") and newest artwork ("artwork"), each with at most ACTIVITY_FEED_SIZE items.
+
+    Items only hold plain values, so the feed can be cached and returned by the API as is.
+    """
+    size = settings.ACTIVITY_FEED_SIZE
+    feed = dict()
+    # Primary key order equals creation order and uses the primary key index
+    feed['media'] = [{
+        'id': media.pk,
+        'title': media.title,
+        'media_type': media.get_media_type_display(),
+        'url': media.get_absolute_url(),
+        'date': media.date_created,
+    } for media in Media.objects.only('pk', 'title', 'media_type', 'date_created').order_by('-pk')[:size]]
+    changes = ChangeRequest.objects.filter(status=ChangeRequest.Status.APPROVED).order_by('-date_modified')\
+        .select_related('user').prefetch_related('object')[:size]
+    feed['changes'] = [{
+        'id': cr.pk,
+        'request_type': cr.get_request_type_display(),
+        'object_type': str(ContentType.objects.get_for_id(cr.object_type_id)),
+        'object': str(cr.object) if cr.object is not None else cr.object_str,
+        'object_url': cr.object.get_absolute_url() if hasattr(cr.object, 'get_absolute_url') else None,
+        'url': cr.get_absolute_url(),
+        'user': cr.user.username,
+        'date': cr.date_modified,
+    } for cr in changes]
+    feed['artwork'] = [{
+        'id': artwork.pk,
+        'media': artwork.media.title,
+        'media_url': artwork.media.get_absolute_url(),
+        'image': str(artwork.get_image_url('t150')),
+    } for artwork in MediaArtwork.objects.select_related('media').order_by('-pk')[:size]]
+    return feed
+
+
+def refresh_feed():
+    """Rebuilds and caches the feed; called when change requests are approved or reverted (see signals)"""
+    feed = build_feed()
+    cache.set(CACHE_KEY, feed, None)
+    logger.debug('Activity: feed refreshed')
+    return feed
+
+
+def get_feed():
+    """Returns the cached feed, only building it when it is not in the cache (e.g. after a restart)"""
+    feed = cache.get(CACHE_KEY)
+    if feed is None:
+        feed = refresh_feed()
+    return feed
@@ -0,0 +1,109 @@
+"""AnimeSuki Media API Filters"""
+
+import datetime
+
+from django.utils.text import slugify
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from ..models import Media
+
+
+def flatten_choices(choices):
+    """Flattens (optionally grouped) choices into a list of (value, label) tuples"""
+    result = []
+    for value, label in choices:
+        if isinstance(label, (list, tuple)):
+            result.extend(label)
+        else:
+            result.append((value, label))
+    return result
+
+
+def parse_choices(name, value, choices):
+    """Converts comma separated choice values or labels (case insensitive) into a list of choice values"""
+    lookup = dict()
+    for choice, label in flatten_choices(choices):
+        lookup[str(choice)] = choice
+        lookup[slugify(label)] = choice
+    result = []
+    for item in value.split(','):
+        try:
+            result.append(lookup[slugify(item.strip())])
+        except KeyError:
+            raise ValidationError({name: 'Invalid value "{}"'.format(item.strip())})
+    return result
+
+
+def parse_date(name, value):
+    """
+    Converts a partial date (YYYY, YYYY-MM or YYYY-MM-DD) into a (first day, last day) tuple covering the period
+    """
+    formats = (('%Y-%m-%d', 'day'), ('%Y-%m', 'month'), ('%Y', 'year'))
+    for fmt, precision in formats:
+        try:
+            start = datetime.datetime.strptime(value.strip(), fmt).date()
+        except ValueError:
+            continue
+        if precision == 'year':
+            return start, start.replace(month=12, day=31)
+        elif precision == 'month':
+            end = (start.replace(day=28) + datetime.timedelta(days=4)).replace(day=1) - datetime.timedelta(days=1)
+            return start, end
+        return start, start
+    raise ValidationError({name: 'Invalid date "{}": use YYYY, YYYY-MM or YYYY-MM-DD'.format(value)})
+
+
+def parse_bool(name, value):
+    v = value.strip().lower()
+    if v in ('1', 'true', 'yes'):
+        return True
+    elif v in ('0', 'false', 'no'):
+        return False
+    raise ValidationError({name: 'Invalid value "{}": use true or false'.format(value)})
+
+
+def parse_int(name, value):
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({name: 'Invalid value "{}": expected a number'.format(value)})
+
+
+class MediaFilterBackend(BaseFilterBackend):
+    """
+    Filters Media on query parameters:
+      media_type, sub_type: one or more (comma separated) values or labels, e.g. "anime" or "tv,ova"
+      is_adult: true or false
+      status: one or more of "upcoming", "current", "finished", "on-hiatus" or "cancelled"
+      season_year, season: e.g. "2026" and "spring"
+      start_date_from, start_date_to, end_date_from, end_date_to: YYYY, YYYY-MM or YYYY-MM-DD
+
+    Date filters take date precision into account (see MediaQuerySet.date_range).
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        if params.get('media_type'):
+            queryset = queryset.filter(media_type__in=parse_choices('media_type', params['media_type'],
+                                                                    Media.Type.choices))
+        if params.get('sub_type'):
+            queryset = queryset.filter(sub_type__in=parse_choices('sub_type', params['sub_type'],
+                                                                  Media.SubType.choices))
+        if params.get('is_adult'):
+            queryset = queryset.filter(is_adult=parse_bool('is_adult', params['is_adult']))
+        if params.get('status'):
+            queryset = queryset.filter_state(*parse_choices('status', params['status'], Media.State.choices))
+        if params.get('season_year'):
+            queryset = queryset.filter(season_year=parse_int('season_year', params['season_year']))
+        if params.get('season'):
+            queryset = queryset.filter(season__in=parse_choices('season', params['season'], Media.Season.choices))
+        for field in ('start_date', 'end_date'):
+            lower = params.get(field + '_from')
+            upper = params.get(field + '_to')
+            if lower or upper:
+                queryset = queryset.date_range(field,
+                                               lower=parse_date(field + '_from', lower)[0] if lower else None,
+                                               upper=parse_date(field + '_to', upper)[1] if upper else None)
+        return queryset
@@ -2,12 +2,13 @@
 
 from rest_framework import serializers
 
+from animesuki.core.api import SparseFieldsetSerializerMixin
 from animesuki.core.utils import DatePrecision
 
 from ..models import Media, MediaArtwork
 
 
-class MediaSerializer(serializers.HyperlinkedModelSerializer):
+class MediaSerializer(SparseFieldsetSerializerMixin, serializers.HyperlinkedModelSerializer):
     site_url = serializers.CharField(source='get_absolute_url')
     media_type = serializers.CharField(source='get_media_type_display')
     sub_type = serializers.CharField(source='get_sub_type_display')
@@ -27,6 +28,15 @@ class MediaSerializer(serializers.HyperlinkedModelSerializer):
         fields = ('url', 'site_url', 'title', 'media_type', 'sub_type', 'status', 'is_adult',
                   'episodes', 'duration', 'volumes', 'chapters', 'start_date', 'end_date',
                   'season_year', 'season', 'description', 'synopsis', 'artwork_active')
+        # Model fields required by each serializer field (defaults to field of the same name)
+        source_fields = {
+            'url': (),
+            'site_url': ('media_type', 'title'),
+            'status': ('status', 'media_type', 'start_date', 'end_date'),
+            'start_date': ('start_date', 'start_precision'),
+            'end_date': ('end_date', 'end_precision'),
+            'artwork': (),
+        }
 
 
 class MediaDetailSerializer(MediaSerializer):
@@ -35,6 +45,7 @@ class MediaDetailSerializer(MediaSerializer):
     class Meta:
         model = Media
         fields = MediaSerializer.Meta.fields + ('artwork',)
+        source_fields = MediaSerializer.Meta.source_fields
 
 
 class MediaArtworkSerializer(serializers.ModelSerializer):
@@ -4,12 +4,19 @@ from django.urls import path
 
 from rest_framework.urlpatterns import format_suffix_patterns
 
-from .views import (MediaListAPIView, MediaRetrieveAPIView, MediaArtworkListAPIView, MediaArtworkRetrieveAPIView)
+from .views import (MediaListAPIView, MediaRetrieveAPIView, MediaSearchAPIView, MediaAutocompleteAPIView,
+                    MediaHistoryStateAPIView, MediaSeasonAPIView, MediaBatchAPIView, MediaArtworkListAPIView,
+                    MediaArtworkRetrieveAPIView)
 
 
 urlpatterns = [
     path('<int:pk>', MediaRetrieveAPIView.as_view(), name='media-detail'),
     path('', MediaListAPIView.as_view()),
+    path('search', MediaSearchAPIView.as_view()),
+    path('autocomplete', MediaAutocompleteAPIView.as_view()),
+    path('<int:pk>/state', MediaHistoryStateAPIView.as_view()),
+    path('season/<int:year>/<slug:season>', MediaSeasonAPIView.as_view()),
+    path('batch', MediaBatchAPIView.as_view()),
     path('artwork/<int:pk>', MediaArtworkRetrieveAPIView.as_view(), name='mediaartwork-detail'),
     path('artwork/', MediaArtworkListAPIView.as_view()),
 ]
@@ -1,24 +1,185 @@
 """AnimeSuki Media API Viewsets"""
 
+import datetime
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Prefetch
+from django.http import Http404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
 from rest_framework import generics
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from animesuki.core.api import SparseFieldsetViewMixin
+from animesuki.core.models import HistorySnapshot
 
+from ..activity import get_feed
+from ..autocomplete import get_title_index
 from ..models import Media, MediaArtwork
+from ..views import SeasonChartViewMixin
 
+from .filters import MediaFilterBackend, parse_bool, parse_choices, parse_date, parse_int
 from .serializers import MediaSerializer, MediaDetailSerializer, MediaArtworkSerializer
 
 
-class MediaListAPIView(generics.ListAPIView):
+class MediaListAPIView(SparseFieldsetViewMixin, generics.ListAPIView):
     queryset = Media.objects.all()
     serializer_class = MediaSerializer
     permission_classes = ()
+    filter_backends = (MediaFilterBackend,)
 
 
-class MediaRetrieveAPIView(generics.RetrieveAPIView):
+class MediaRetrieveAPIView(SparseFieldsetViewMixin, generics.RetrieveAPIView):
     queryset = Media.objects.all()
     serializer_class = MediaDetailSerializer
     permission_classes = ()
 
 
+class MediaSearchAPIView(SparseFieldsetViewMixin, generics.ListAPIView):
+    """
+    Searches Media by title, e.g. /v1/media/search?q=title&media_type=anime
+
+    Set "full_text" to true to also search description and synopsis. Returns the best matches first.
+    """
+    queryset = Media.objects.all()
+    serializer_class = MediaSerializer
+    permission_classes = ()
+    max_results = 50
+
+    def get_queryset(self):
+        params = self.request.query_params
+        text = params.get('q', '').strip()
+        if not text:
+            raise ValidationError({'q': 'No search query specified'})
+        queryset = super().get_queryset()
+        if params.get('media_type'):
+            queryset = queryset.filter(media_type__in=parse_choices('media_type', params['media_type'],
+                                                                    Media.Type.choices))
+        full_text = parse_bool('full_text', params['full_text']) if params.get('full_text') else False
+        return queryset.search(text, full_text=full_text)[:self.max_results]
+
+
+class MediaAutocompleteAPIView(APIView):
+    """
+    Title completions for search-as-you-type, e.g. /v1/media/autocomplete?q=fullm&limit=10&adult=false
+
+    Served from an in-memory index, so it doesn't touch the database.
+    """
+    permission_classes = ()
+    max_limit = 25
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        limit = min(parse_int('limit', params['limit']), self.max_limit) if params.get('limit') else 10
+        adult = parse_bool('adult', params['adult']) if params.get('adult') else True
+        results = get_title_index().complete(params.get('q', ''), limit=limit, adult=adult)
+        return Response([{'id': pk, 'title': title} for pk, title in results])
+
+
+class ActivityAPIView(APIView):
+    """Recent activity feed (recently added media, approved changes and new artwork), served from the cache"""
+    permission_classes = ()
+
+    def get(self, request, *args, **kwargs):
+        return Response(get_feed())
+
+
+class MediaHistoryStateAPIView(APIView):
+    """
+    State of a Media item at a point in time, reconstructed from its history, e.g. /v1/media/1/state?date=2026-01-31
+
+    "date" is an ISO 8601 date (end of that day, UTC) or date and time; defaults to now.
+    """
+    permission_classes = ()
+
+    def get_date(self):
+        value = self.request.query_params.get('date')
+        if not value:
+            return None
+        date = parse_datetime(value)
+        if date is None:
+            date = datetime.datetime.combine(parse_date('date', value)[1], datetime.time.max)
+        return date if timezone.is_aware(date) else timezone.make_aware(date, timezone.utc)
+
+    def get(self, request, pk, *args, **kwargs):
+        date = self.get_date()
+        state = HistorySnapshot.get_state(ContentType.objects.get_for_model(Media), pk, date)
+        if state is None:
+            raise Http404('No such media at that date')
+        return Response({'id': pk, 'date': date or timezone.now(), 'data': state})
+
+
+class MediaSeasonAPIView(SeasonChartViewMixin, SparseFieldsetViewMixin, generics.GenericAPIView):
+    """Season chart served from the precomputed SeasonChart, e.g. /v1/media/season/2026/spring"""
+    queryset = Media.objects.all()
+    serializer_class = MediaSerializer
+    permission_classes = ()
+
+    def get(self, request, *args, **kwargs):
+        # Season charts only exist for anime
+        self.kwargs['mediatype'] = 'anime'
+        chart = self.get_chart()
+        objects = self.get_queryset().in_bulk(chart.media)
+        results = [objects[pk] for pk in chart.media if pk in objects]
+        sub_types = dict(Media._meta.get_field('sub_type').flatchoices)
+        return Response({
+            'season_year': chart.season_year,
+            'season': chart.get_season_display(),
+            'counts': {sub_types[int(key)]: value for key, value in chart.counts.items()},
+            'results': self.get_serializer(results, many=True).data,
+        })
+
+
+class MediaBatchAPIView(SparseFieldsetViewMixin, generics.GenericAPIView):
+    """
+    Retrieves multiple Media objects in one request, e.g. /v1/media/batch?ids=1,2,3
+
+    Results are returned in the requested order; ids that do not exist get a "not found" entry instead of failing
+    the entire request. Uses a constant number of queries regardless of the number of ids.
+    """
+    queryset = Media.objects.all()
+    serializer_class = MediaDetailSerializer
+    permission_classes = ()
+    throttle_scope = 'media-batch'
+
+    def get_ids(self):
+        ids = []
+        for value in self.request.query_params.get('ids', '').split(','):
+            if not value.strip():
+                continue
+            try:
+                pk = int(value)
+            except ValueError:
+                raise ValidationError({'ids': 'Invalid id "{}"'.format(value.strip())})
+            if pk not in ids:
+                ids.append(pk)
+        if not ids:
+            raise ValidationError({'ids': 'No ids specified'})
+        if len(ids) > settings.API_BATCH_MAX_IDS:
+            raise ValidationError({'ids': 'No more than {} ids allowed'.format(settings.API_BATCH_MAX_IDS)})
+        return ids
+
+    def get(self, request, *args, **kwargs):
+        ids = self.get_ids()
+        queryset = self.get_queryset().filter(pk__in=ids)
+        if 'artwork' in self.get_sparse_fields():
+            queryset = queryset.prefetch_related(
+                Prefetch('mediaartwork_set', queryset=MediaArtwork.objects.only('pk', 'media')))
+        objects = list(queryset)
+        data = dict(zip([obj.pk for obj in objects], self.get_serializer(objects, many=True).data))
+        results = []
+        for pk in ids:
+            if pk in data:
+                results.append({'id': pk, 'status': 200, 'data': data[pk]})
+            else:
+                results.append({'id': pk, 'status': 404, 'detail': 'Not found.'})
+        return Response({'results': results})
+
+
 class MediaArtworkListAPIView(generics.ListAPIView):
     queryset = MediaArtwork.objects.all()
     serializer_class = MediaArtworkSerializer
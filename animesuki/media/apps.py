@@ -2,4 +2,8 @@ from django.apps import AppConfig
 
 
 class MediaConfig(AppConfig):
-    name = 'media'
+    name = 'animesuki.media'
+    label = 'media'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,164 @@
+"""AnimeSuki in-memory title autocomplete index"""
+
+import bisect
+import logging
+import re
+import sys
+import threading
+import time
+import unicodedata
+from array import array
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(text):
+    """Normalizes a title for matching: strips accents, case folds and collapses punctuation/whitespace"""
+    text = ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+    return ' '.join(re.findall(r'[^\W_]+', text.casefold()))
+
+
+class TitleIndex:
+    """
+    Prefix index over normalized titles, stored as a sorted list of keys with parallel compact arrays.
+
+    Every title is indexed from the start of each of its words, so "alch" completes "Fullmetal Alchemist". Matches on
+    the start of the title are returned before matches on later words. Lookups are a binary search plus a short
+    scan; updates insert into/delete from the arrays in place, which is fast enough for the rate titles change.
+    """
+    # Maximum number of index entries scanned per lookup (short prefixes can match a large part of the index)
+    MAX_SCAN = 2000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.keys = []
+        self.ids = array('l')
+        self.flags = bytearray()  # bit 0: is_adult, bit 1: key is the start of the title
+        self.titles = dict()  # id -> (title, is_adult)
+        self.built = None
+
+    @staticmethod
+    def get_keys(title):
+        words = normalize(title).split(' ')
+        return [(' '.join(words[i:]), i == 0) for i in range(len(words)) if words[i]]
+
+    def _insert(self, pk, title, is_adult):
+        for key, start in self.get_keys(title):
+            i = bisect.bisect_right(self.keys, key)
+            self.keys.insert(i, key)
+            self.ids.insert(i, pk)
+            self.flags.insert(i, int(is_adult) | (int(start) << 1))
+        self.titles[pk] = (title, is_adult)
+
+    def _remove(self, pk):
+        title, is_adult = self.titles.pop(pk)
+        for key, start in self.get_keys(title):
+            i = bisect.bisect_left(self.keys, key)
+            while i < len(self.keys) and self.keys[i] == key:
+                if self.ids[i] == pk:
+                    del self.keys[i]
+                    del self.ids[i]
+                    del self.flags[i]
+                    break
+                i += 1
+
+    def build(self, items):
+        """Builds the index from an iterable of (id, title, is_adult) tuples"""
+        entries = []
+        titles = dict()
+        for pk, title, is_adult in items:
+            titles[pk] = (title, is_adult)
+            for key, start in self.get_keys(title):
+                entries.append((key, pk, int(is_adult) | (int(start) << 1)))
+        entries.sort()
+        with self.lock:
+            self.keys = [e[0] for e in entries]
+            self.ids = array('l', (e[1] for e in entries))
+            self.flags = bytearray(e[2] for e in entries)
+            self.titles = titles
+            self.built = time.time()
+
+    def update(self, pk, title, is_adult):
+        """Adds or replaces a single title"""
+        with self.lock:
+            if pk in self.titles:
+                if self.titles[pk] == (title, is_adult):
+                    return
+                self._remove(pk)
+            self._insert(pk, title, is_adult)
+
+    def remove(self, pk):
+        with self.lock:
+            if pk in self.titles:
+                self._remove(pk)
+
+    def complete(self, prefix, limit=10, adult=True):
+        """Returns up to "limit" (id, title) tuples for titles matching prefix, optionally excluding R-18 titles"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        start, other = [], []
+        seen = set()
+        with self.lock:
+            i = bisect.bisect_left(self.keys, prefix)
+            end = min(len(self.keys), i + self.MAX_SCAN)
+            while i < end and len(start) < limit and self.keys[i].startswith(prefix):
+                pk, flags = self.ids[i], self.flags[i]
+                i += 1
+                if (flags & 1 and not adult) or pk in seen:
+                    continue
+                seen.add(pk)
+                (start if flags & 2 else other).append((pk, self.titles[pk][0]))
+        return (start + other)[:limit]
+
+    def memory_usage(self):
+        """Returns approximate memory footprint in bytes"""
+        with self.lock:
+            size = sys.getsizeof(self.keys) + sys.getsizeof(self.ids) + sys.getsizeof(self.flags)
+            size += sum(sys.getsizeof(key) for key in self.keys)
+            size += sys.getsizeof(self.titles)
+            size += sum(sys.getsizeof(value) + sys.getsizeof(value[0]) for value in self.titles.values())
+        return size
+
+    def __len__(self):
+        return len(self.titles)
+
+
+title_index = TitleIndex()
+# Held while (re)building the title index, so only one thread per process reads all titles from the database
+_build_lock = threading.Lock()
+
+
+def is_stale(index):
+    return index.built is None or time.time() - index.built > settings.AUTOCOMPLETE_MAX_AGE
+
+
+def get_title_index():
+    """
+    Returns the process-wide title index, (re)building it from the database when it is not built yet or older than
+    AUTOCOMPLETE_MAX_AGE. Changes made in this process are applied incrementally (see signals); the periodic rebuild
+    picks up changes made by other worker processes.
+
+    Only one thread rebuilds at a time. A stale index is rebuilt by the first thread that notices, while other
+    threads keep using the old index until the new one is swapped in; only the very first build makes them wait.
+    """
+    if not is_stale(title_index):
+        return title_index
+    if not _build_lock.acquire(blocking=title_index.built is None):
+        return title_index
+    try:
+        # Another thread may have finished building while this one was waiting
+        if is_stale(title_index):
+            from .models import Media
+            start = time.time()
+            title_index.build(Media.objects.values_list('pk', 'title', 'is_adult').iterator())
+            logger.info('Autocomplete: indexed {} titles in {:.2f}s using {} bytes'
+                        .format(len(title_index), time.time() - start, title_index.memory_usage()))
+    finally:
+        _build_lock.release()
+    return title_index
@@ -0,0 +1,153 @@
+"""Builds precompressed static snapshots of the complete Media catalog"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from rest_framework.utils.encoders import JSONEncoder
+
+from animesuki.media.api.serializers import MediaSerializer
+from animesuki.media.models import Media
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = ('Rebuilds the catalog snapshot (gzip and brotli precompressed JSON plus manifest) when Media data has '
+            'changed. Meant to be run from cron: rebuilds are debounced until no changes were made for '
+            'CATALOG_SNAPSHOT_DEBOUNCE seconds, but happen at least every CATALOG_SNAPSHOT_MAX_AGE seconds.')
+
+    MANIFEST = 'catalog.json'
+    CHUNK_SIZE = 1000
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild even if nothing has changed')
+
+    def handle(self, *args, **options):
+        root = Path(settings.CATALOG_SNAPSHOT_ROOT)
+        root.mkdir(parents=True, exist_ok=True)
+        state = Media.objects.aggregate(count=Count('pk'), last_modified=Max('date_modified'))
+        manifest = self.read_manifest(root)
+        if not options['force'] and not self.needs_rebuild(manifest, state):
+            self.stdout.write('Catalog snapshot not rebuilt: no changes or changes too recent')
+            return
+        manifest = self.build(root, state)
+        self.stdout.write('Catalog snapshot "{}" written with {} items'.format(manifest['file'], manifest['count']))
+
+    def read_manifest(self, root):
+        try:
+            with open(str(root / self.MANIFEST)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def needs_rebuild(self, manifest, state):
+        if manifest is None:
+            return True
+        last_modified = state['last_modified'].isoformat() if state['last_modified'] else None
+        if manifest['count'] == state['count'] and manifest['last_modified'] == last_modified:
+            return False
+        now = timezone.now()
+        # Wait for changes to settle, unless the snapshot is getting too old
+        if (now - parse_datetime(manifest['generated'])).total_seconds() >= settings.CATALOG_SNAPSHOT_MAX_AGE:
+            return True
+        if state['last_modified'] is None:
+            return True
+        return (now - state['last_modified']).total_seconds() >= settings.CATALOG_SNAPSHOT_DEBOUNCE
+
+    def serialize(self):
+        """Yields the catalog as encoded JSON fragments, serializing Media in chunks"""
+        # No request in context: hyperlinks are rendered as site-relative URLs
+        context = {'request': None}
+        encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+        chunk = []
+        first = True
+        yield b'['
+        for obj in Media.objects.order_by('pk').iterator(chunk_size=self.CHUNK_SIZE):
+            chunk.append(obj)
+            if len(chunk) < self.CHUNK_SIZE:
+                continue
+            for item in MediaSerializer(chunk, many=True, context=context).data:
+                yield (b'' if first else b',') + encoder.encode(item).encode('utf-8')
+                first = False
+            chunk = []
+        for item in MediaSerializer(chunk, many=True, context=context).data:
+            yield (b'' if first else b',') + encoder.encode(item).encode('utf-8')
+            first = False
+        yield b']'
+
+    def build(self, root, state):
+        sha256 = hashlib.sha256()
+        size = 0
+        gz_fd, gz_tmp = tempfile.mkstemp(dir=str(root), suffix='.tmp')
+        br_tmp = None
+        try:
+            with os.fdopen(gz_fd, 'wb') as gz_file, gzip.GzipFile(fileobj=gz_file, mode='wb', mtime=0) as gz:
+                br_file, compressor = None, None
+                if brotli is not None:
+                    br_fd, br_tmp = tempfile.mkstemp(dir=str(root), suffix='.tmp')
+                    br_file = os.fdopen(br_fd, 'wb')
+                    compressor = brotli.Compressor(mode=brotli.MODE_TEXT)
+                for data in self.serialize():
+                    sha256.update(data)
+                    size += len(data)
+                    gz.write(data)
+                    if compressor is not None:
+                        br_file.write(compressor.process(data))
+                if compressor is not None:
+                    br_file.write(compressor.finish())
+                    br_file.close()
+            # Content hash in filename allows the files to be cached forever
+            name = 'catalog-{}.json'.format(sha256.hexdigest()[:16])
+            encodings = ['gzip']
+            os.chmod(gz_tmp, settings.FILE_UPLOAD_PERMISSIONS)
+            os.replace(gz_tmp, str(root / (name + '.gz')))
+            if br_tmp is not None:
+                os.chmod(br_tmp, settings.FILE_UPLOAD_PERMISSIONS)
+                os.replace(br_tmp, str(root / (name + '.br')))
+                encodings.append('br')
+        except BaseException:
+            for tmp in (gz_tmp, br_tmp):
+                if tmp is not None and os.path.exists(tmp):
+                    os.remove(tmp)
+            raise
+        manifest = {
+            'file': name,
+            'sha256': sha256.hexdigest(),
+            'size': size,
+            'encodings': encodings,
+            'count': state['count'],
+            'last_modified': state['last_modified'].isoformat() if state['last_modified'] else None,
+            'generated': timezone.now().isoformat(),
+        }
+        previous = self.read_manifest(root)
+        self.write_manifest(root, manifest)
+        logger.info('Catalog snapshot: wrote "{}" ({} items, {} bytes)'.format(name, manifest['count'], size))
+        # Keep current and previous snapshot (clients may still be downloading the previous one)
+        keep = {name, previous['file'] if previous else None}
+        for path in root.glob('catalog-*.json.*'):
+            if path.name.rsplit('.', 1)[0] not in keep:
+                path.unlink()
+        return manifest
+
+    def write_manifest(self, root, manifest):
+        fd, tmp = tempfile.mkstemp(dir=str(root), suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.chmod(tmp, settings.FILE_UPLOAD_PERMISSIONS)
+        os.replace(tmp, str(root / self.MANIFEST))
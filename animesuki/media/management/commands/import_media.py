@@ -0,0 +1,170 @@
+"""Imports Media in bulk from JSON Lines or CSV files"""
+
+import csv
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.http import HttpRequest
+
+from animesuki.history.models import ChangeRequest
+from animesuki.media.activity import refresh_feed
+from animesuki.media.forms import MediaCreateForm
+from animesuki.media.models import Media, MediaCounter, SeasonChart
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = ('Imports Media from a JSON Lines (one object per line) or CSV (with header) file, using the field names '
+            'of MediaCreateForm. Rows are validated with MediaCreateForm and inserted in batches, each with an '
+            'approved "add" change request, in one transaction per batch. Progress is saved to a checkpoint file '
+            'after every batch, so an interrupted import continues where it left off when run again, also when it was '
+            'interrupted while a batch was being committed.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='File to import (.jsonl or .csv)')
+        parser.add_argument('--user', required=True, help='Username the change requests are attributed to')
+        parser.add_argument('--comment', default='Bulk import', help='Comment for rows without a "comment" value')
+        parser.add_argument('--format', choices=('jsonl', 'csv'), help='File format (default: based on extension)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per batch/transaction')
+        parser.add_argument('--checkpoint', help='Checkpoint file (default: <file>.checkpoint)')
+        parser.add_argument('--restart', action='store_true', help='Ignore checkpoint and import from the start')
+
+    def handle(self, *args, **options):
+        path = Path(options['file'])
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        if file_format not in ('jsonl', 'csv'):
+            raise CommandError('Unknown file format "{}": use --format'.format(file_format))
+        try:
+            user = get_user_model().objects.get(username=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError('User "{}" does not exist'.format(options['user']))
+        # Change requests are created the same way as through the site, which takes user (and IP) from the request
+        self.request = HttpRequest()
+        self.request.user = user
+        self.request.META['REMOTE_ADDR'] = '127.0.0.1'
+        self.comment = options['comment']
+        checkpoint = Path(options['checkpoint'] or str(path) + '.checkpoint')
+        state = {'file': str(path.resolve()), 'rows': 0, 'imported': 0, 'skipped': 0, 'finished': False}
+        if checkpoint.exists() and not options['restart']:
+            state = json.loads(checkpoint.read_text())
+            if state['file'] != str(path.resolve()):
+                raise CommandError('Checkpoint "{}" belongs to "{}": use --restart or --checkpoint'
+                                   .format(checkpoint, state['file']))
+            if state['finished']:
+                self.stdout.write('Import of "{}" already finished: use --restart to import again'.format(path))
+                return
+            self.resolve_pending(state)
+            self.stdout.write('Resuming import after row {}'.format(state['rows']))
+        self.progress = {k: state[k] for k in ('rows', 'imported', 'skipped')}
+        batch = []
+        with open(str(path), newline='', encoding='utf-8') as f:
+            for number, row in enumerate(self.read(f, file_format), start=1):
+                # Skip rows imported before the checkpoint
+                if number <= state['rows']:
+                    continue
+                obj = self.validate(number, row)
+                if obj is None:
+                    state['skipped'] += 1
+                else:
+                    batch.append(obj)
+                if len(batch) >= options['batch_size']:
+                    self.save(batch, state, number, checkpoint)
+                    batch = []
+                state['rows'] = number
+        self.save(batch, state, state['rows'], checkpoint)
+        state['finished'] = True
+        self.write_checkpoint(checkpoint, state)
+        refresh_feed()
+        self.stdout.write('Imported {} media ({} rows skipped)'.format(state['imported'], state['skipped']))
+
+    def read(self, f, file_format):
+        """Yields rows as dictionaries"""
+        if file_format == 'csv':
+            yield from csv.DictReader(f)
+            return
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                row = {'__error__': str(e)}
+            yield row if isinstance(row, dict) else {'__error__': 'Not a JSON object'}
+
+    def validate(self, number, row):
+        """Returns an unsaved Media object for a valid row, logs errors and returns None otherwise"""
+        if '__error__' in row:
+            self.stderr.write('Row {}: {}'.format(number, row['__error__']))
+            return None
+        data = {k: ('' if v is None else v) for k, v in row.items()}
+        data.setdefault('comment', self.comment)
+        form = MediaCreateForm(data=data)
+        if not form.is_valid():
+            errors = '; '.join('{}: {}'.format(field, ' '.join(e)) for field, e in form.errors.items())
+            self.stderr.write('Row {}: {}'.format(number, errors))
+            return None
+        obj = form.save(commit=False)
+        obj.comment = form.cleaned_data['comment']
+        return obj
+
+    def resolve_pending(self, state):
+        """Sets the progress of an import that was interrupted while a batch was being committed (see save())"""
+        pending = state.pop('pending', None)
+        if pending is None:
+            return
+        # The change requests are inserted in the same transaction as the media (and ids are never reused), so they
+        # only exist when the batch was committed
+        committed = ChangeRequest.objects.filter(object_type=ContentType.objects.get_for_model(Media),
+                                                 object_id__in=pending['media'],
+                                                 request_type=ChangeRequest.Type.ADD).exists()
+        if committed:
+            self.stdout.write('Batch of {} media up to row {} was imported before the interruption'
+                              .format(len(pending['media']), state['rows']))
+        else:
+            state.update(pending['progress'])
+
+    def save(self, batch, state, rows, checkpoint):
+        """Inserts Media and their change requests in a single transaction, then updates the checkpoint"""
+        if batch:
+            with transaction.atomic():
+                Media.objects.bulk_create(batch)
+                # The checkpoint can't be written in the same transaction, so a crash between the commit and updating
+                # the checkpoint would leave it unknown whether this batch was imported: write the progress including
+                # this batch now, along with the ids of its media ("pending") and the progress to go back to when those
+                # turn out not to have been committed (see resolve_pending())
+                self.write_checkpoint(checkpoint, dict(state, rows=rows, imported=state['imported'] + len(batch),
+                                                       pending={'media': [obj.pk for obj in batch],
+                                                                'progress': self.progress}))
+                changerequests = []
+                for obj in batch:
+                    obj.request = self.request
+                    cr = obj.create_changerequest()
+                    cr.object = obj
+                    cr.status = ChangeRequest.Status.APPROVED
+                    cr.mod = self.request.user
+                    changerequests.append(cr)
+                ChangeRequest.objects.bulk_create(changerequests)
+                # bulk_create() does not send signals, so do what the Media and ChangeRequest signals would do
+                MediaCounter.objects.bulk_create([MediaCounter(media=obj, changerequests=1) for obj in batch])
+                for season_year, season in {(obj.season_year, obj.season) for obj in batch}:
+                    SeasonChart.refresh(season_year, season)
+            state['imported'] += len(batch)
+            logger.info('Import: inserted {} media (total {})'.format(len(batch), state['imported']))
+        state['rows'] = rows
+        self.write_checkpoint(checkpoint, state)
+        self.progress = {k: state[k] for k in ('rows', 'imported', 'skipped')}
+
+    def write_checkpoint(self, checkpoint, state):
+        fd, tmp = tempfile.mkstemp(dir=str(checkpoint.parent), suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp, str(checkpoint))
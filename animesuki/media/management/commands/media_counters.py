@@ -0,0 +1,36 @@
+"""Verifies and repairs denormalized Media counters"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from animesuki.media.models import Media, MediaCounter
+
+
+class Command(BaseCommand):
+    help = ('Compares the denormalized Media counters (artwork, change requests) with the actual counts and repairs '
+            'any that have drifted or are missing. Also used to populate the counters initially.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report drift, do not repair it')
+
+    def handle(self, *args, **options):
+        fields = MediaCounter.COUNTERS
+        queryset = Media.objects.order_by('pk')\
+            .annotate(**{'new_' + k: v for k, v in MediaCounter.get_count_expressions().items()})\
+            .values_list('pk', *['counter__' + k for k in fields], *['new_' + k for k in fields])
+        drift = 0
+        for row in queryset.iterator():
+            pk, current, actual = row[0], row[1:len(fields) + 1], row[len(fields) + 1:]
+            if current == actual:
+                continue
+            drift += 1
+            self.stdout.write('Media #{}: {} (stored) != {} (actual)'
+                              .format(pk, dict(zip(fields, current)), dict(zip(fields, actual))))
+            if not options['dry_run']:
+                # Recompute within a transaction in case the counts changed since they were read
+                with transaction.atomic():
+                    MediaCounter.recompute(pk)
+        if options['dry_run']:
+            self.stdout.write('Found {} media with drifted counters'.format(drift))
+        else:
+            self.stdout.write('Repaired counters for {} media'.format(drift))
@@ -0,0 +1,65 @@
+"""Measures search latency on a synthetic catalog"""
+
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from animesuki.media.models import Media
+
+WORDS = ('shingeki', 'kyojin', 'fullmetal', 'alchemist', 'brotherhood', 'sword', 'art', 'online', 'cowboy', 'bebop',
+         'neon', 'genesis', 'evangelion', 'steins', 'gate', 'monogatari', 'hunter', 'magical', 'girl', 'academia',
+         'hero', 'kingdom', 'dragon', 'ball', 'spirited', 'away', 'tokyo', 'ghoul', 'death', 'note', 'school', 'days',
+         'love', 'live', 'idol', 'project', 'space', 'battleship', 'mobile', 'suit', 'gundam', 'wing', 'legend')
+
+
+class Command(BaseCommand):
+    help = ('Measures latency of MediaQuerySet.search() on a synthetic catalog of the given size. The catalog is '
+            'created in a transaction that is rolled back afterwards, so the database is left unchanged. Prints '
+            'median, 95th percentile and maximum latency per kind of query.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--media', type=int, default=100000, help='Number of synthetic media to create')
+        parser.add_argument('--queries', type=int, default=200, help='Number of queries per kind')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed (same seed gives the same catalog)')
+
+    def make_title(self, rng):
+        return ' '.join(rng.choice(WORDS) for i in range(rng.randint(1, 5))).title()
+
+    def make_typo(self, rng, word):
+        i = rng.randrange(len(word) - 1)
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            start = time.perf_counter()
+            batch = []
+            for i in range(options['media']):
+                batch.append(Media(title=self.make_title(rng), synopsis=self.make_title(rng)))
+                if len(batch) == 5000:
+                    Media.objects.bulk_create(batch)
+                    batch = []
+            Media.objects.bulk_create(batch)
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE {}'.format(Media._meta.db_table))
+            self.stdout.write('Created {} media in {:.1f}s'.format(options['media'], time.perf_counter() - start))
+            kinds = {
+                'prefix': lambda: (rng.choice(WORDS)[:4], False),
+                'words': lambda: (' '.join(rng.choice(WORDS) for i in range(2)), False),
+                'typo': lambda: (self.make_typo(rng, rng.choice(WORDS)), False),
+                'full text': lambda: (rng.choice(WORDS), True),
+            }
+            for kind, make_query in kinds.items():
+                timings = []
+                for i in range(options['queries']):
+                    text, full_text = make_query()
+                    start = time.perf_counter()
+                    list(Media.objects.search(text, full_text=full_text).values_list('pk', flat=True)[:50])
+                    timings.append((time.perf_counter() - start) * 1000)
+                timings.sort()
+                self.stdout.write('{:<10} median {:7.2f}ms  p95 {:7.2f}ms  max {:7.2f}ms'.format(
+                    kind, statistics.median(timings), timings[int(len(timings) * 0.95) - 1], timings[-1]))
+            transaction.set_rollback(True)
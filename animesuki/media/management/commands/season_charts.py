@@ -0,0 +1,14 @@
+"""Rebuilds all season charts"""
+
+from django.core.management.base import BaseCommand
+
+from animesuki.media.models import SeasonChart
+
+
+class Command(BaseCommand):
+    help = ('Rebuilds all season charts from Media data. Charts are normally kept up to date through signals, so '
+            'this is only needed initially and after changes that bypass Media.save() (such as bulk updates).')
+
+    def handle(self, *args, **options):
+        count = SeasonChart.refresh_all()
+        self.stdout.write('Refreshed {} season charts'.format(count))
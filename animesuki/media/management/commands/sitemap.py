@@ -0,0 +1,114 @@
+"""Writes gzip-compressed, sharded sitemap files for all Media"""
+
+import gzip
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, Max
+from django.utils import timezone
+
+from animesuki.media.models import Media
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = ('Writes the sitemap index and sitemap shards (by primary key range, at most SITEMAP_SHARD_SIZE URLs '
+            'each) for all Media to SITEMAP_ROOT. Only shards with changed Media are regenerated.')
+
+    MANIFEST = 'sitemap.json'
+    INDEX = 'sitemap.xml.gz'
+    SHARD = 'sitemap-media-{}.xml.gz'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate all shards')
+
+    def handle(self, *args, **options):
+        root = Path(settings.SITEMAP_ROOT)
+        root.mkdir(parents=True, exist_ok=True)
+        self.base_url = '{}://{}'.format(settings.SITEMAP_PROTOCOL, Site.objects.get_current().domain)
+        size = settings.SITEMAP_SHARD_SIZE
+        # Shard state (row count and last change per shard) comes from one aggregate query; only shards whose state
+        # differs from the manifest are written again
+        shards = dict()
+        for row in Media.objects.order_by().annotate(shard=F('pk') / size).values('shard')\
+                .annotate(count=Count('pk'), last_modified=Max('date_modified')):
+            shards[str(row['shard'])] = {'count': row['count'], 'last_modified': row['last_modified'].isoformat()}
+        manifest = self.read_manifest(root)
+        if options['force'] or manifest.get('shard_size') != size or manifest.get('base_url') != self.base_url:
+            manifest = {'shards': dict()}
+        written = 0
+        for shard, state in sorted(shards.items(), key=lambda item: int(item[0])):
+            if manifest['shards'].get(shard) != state or not (root / self.SHARD.format(shard)).exists():
+                self.write_shard(root, int(shard), size)
+                written += 1
+        removed = 0
+        for path in root.glob(self.SHARD.format('*')):
+            if path.name not in {self.SHARD.format(shard) for shard in shards}:
+                path.unlink()
+                removed += 1
+        if written or removed or not (root / self.INDEX).exists():
+            self.write_index(root, shards)
+        self.write_manifest(root, {'shard_size': size, 'base_url': self.base_url, 'shards': shards,
+                                   'generated': timezone.now().isoformat()})
+        self.stdout.write('Sitemap: {} shards, {} regenerated'.format(len(shards), written))
+
+    def read_manifest(self, root):
+        try:
+            with open(str(root / self.MANIFEST)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {'shards': dict()}
+
+    def write_manifest(self, root, manifest):
+        self.write(root, self.MANIFEST, [json.dumps(manifest, indent=2).encode('utf-8')], compress=False)
+
+    def write(self, root, name, data, compress=True):
+        """Writes (an iterable of) bytes to a temporary file which then atomically replaces the target file"""
+        fd, tmp = tempfile.mkstemp(dir=str(root), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                if compress:
+                    with gzip.GzipFile(fileobj=f, mode='wb', mtime=0) as gz:
+                        for chunk in data:
+                            gz.write(chunk)
+                else:
+                    for chunk in data:
+                        f.write(chunk)
+            os.chmod(tmp, settings.FILE_UPLOAD_PERMISSIONS)
+            os.replace(tmp, str(root / name))
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def write_shard(self, root, shard, size):
+        def urls():
+            yield b'<?xml version="1.0" encoding="UTF-8"?>\n'
+            yield b'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+            queryset = Media.objects.filter(pk__gte=shard * size, pk__lt=(shard + 1) * size).order_by('pk')\
+                .only('pk', 'title', 'media_type', 'date_modified')
+            for media in queryset.iterator(chunk_size=2000):
+                yield '<url><loc>{}</loc><lastmod>{}</lastmod></url>\n'\
+                    .format(escape(self.base_url + media.get_absolute_url()),
+                            media.date_modified.date().isoformat()).encode('utf-8')
+            yield b'</urlset>\n'
+        self.write(root, self.SHARD.format(shard), urls())
+        logger.info('Sitemap: wrote shard {}'.format(shard))
+
+    def write_index(self, root, shards):
+        def sitemaps():
+            yield b'<?xml version="1.0" encoding="UTF-8"?>\n'
+            yield b'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+            for shard, state in sorted(shards.items(), key=lambda item: int(item[0])):
+                yield '<sitemap><loc>{}</loc><lastmod>{}</lastmod></sitemap>\n'\
+                    .format(escape('{}/{}'.format(self.base_url, self.SHARD.format(shard))),
+                            state['last_modified']).encode('utf-8')
+            yield b'</sitemapindex>\n'
+        self.write(root, self.INDEX, sitemaps())
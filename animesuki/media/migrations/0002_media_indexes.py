@@ -0,0 +1,29 @@
+# Generated by Django 2.2.4 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='media',
+            index=models.Index(fields=['season_year', 'season', 'media_type', 'is_adult', 'sub_type'], name='media_season_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='media',
+            index=models.Index(fields=['media_type', 'sub_type'], name='media_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='media',
+            index=models.Index(fields=['start_date'], name='media_start_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='media',
+            index=models.Index(fields=['end_date'], name='media_end_date_idx'),
+        ),
+    ]
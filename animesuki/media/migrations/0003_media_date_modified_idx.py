@@ -0,0 +1,17 @@
+# Generated by Django 2.2.4 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media', '0002_media_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='media',
+            index=models.Index(fields=['date_modified'], name='media_date_modified_idx'),
+        ),
+    ]
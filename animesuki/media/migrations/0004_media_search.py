@@ -0,0 +1,52 @@
+# Generated by Django 2.2.4 on 2026-10-19 12:00
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media', '0003_media_date_modified_idx'),
+    ]
+
+    operations = [
+        TrigramExtension(),  # Install PostgreSQL pg_trgm extension first
+        migrations.AddField(
+            model_name='media',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        # Keep search vector up to date on every insert/update (including bulk operations)
+        migrations.RunSQL(
+            sql="""
+                CREATE FUNCTION media_search_vector_update() RETURNS trigger AS $$
+                BEGIN
+                    NEW.search_vector :=
+                        setweight(to_tsvector('simple', coalesce(NEW.title, '')), 'A') ||
+                        setweight(to_tsvector('simple', coalesce(NEW.description, '')), 'B') ||
+                        setweight(to_tsvector('simple', coalesce(NEW.synopsis, '')), 'C');
+                    RETURN NEW;
+                END
+                $$ LANGUAGE plpgsql;
+                CREATE TRIGGER media_search_vector_trigger
+                    BEFORE INSERT OR UPDATE OF title, description, synopsis ON media
+                    FOR EACH ROW EXECUTE PROCEDURE media_search_vector_update();
+                UPDATE media SET title = title;
+            """,
+            reverse_sql="""
+                DROP TRIGGER media_search_vector_trigger ON media;
+                DROP FUNCTION media_search_vector_update();
+            """,
+        ),
+        migrations.AddIndex(
+            model_name='media',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='media_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='media',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='media_title_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.4 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media', '0004_media_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='media',
+            index=models.Index(condition=models.Q(status=1), fields=['media_type', 'end_date', 'start_date'], name='media_state_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.4 on 2026-10-19 12:00
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media', '0005_media_state_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeasonChart',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('season_year', models.IntegerField(verbose_name='season year')),
+                ('season', models.PositiveSmallIntegerField(choices=[(1, 'Winter'), (2, 'Spring'), (3, 'Summer'), (4, 'Fall')], verbose_name='season')),
+                ('media', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), default=list, size=None)),
+                ('counts', django.contrib.postgres.fields.jsonb.JSONField(default=dict)),
+                ('date_modified', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'media_season_chart',
+                'ordering': ('season_year', 'season'),
+                'unique_together': {('season_year', 'season')},
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 2.2.4 on 2026-10-19 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media', '0006_seasonchart'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaCounter',
+            fields=[
+                ('media', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counter', serialize=False, to='media.Media')),
+                ('artwork', models.IntegerField(default=0, verbose_name='artwork')),
+                ('changerequests', models.IntegerField(default=0, verbose_name='change requests')),
+                ('changerequests_pending', models.IntegerField(default=0, verbose_name='pending change requests')),
+            ],
+            options={
+                'db_table': 'media_counter',
+            },
+        ),
+    ]
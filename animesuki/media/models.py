@@ -1,16 +1,109 @@
 """AnimeSuki Media models"""
 
+import calendar
+import re
+
 from django.db import models
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.fields import ArrayField, JSONField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField, TrigramSimilarity
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.text import slugify
 
-from animesuki.core.models import ArtworkModel
+from animesuki.core.models import ArtworkModel, HistoryChecksMemoMixin, LoadedValuesMixin
 from animesuki.core.utils import DatePrecision
-from animesuki.history.models import HistoryModel
+from animesuki.history.models import HistoryModel, ChangeRequest
+
+
+class MediaQuerySet(models.QuerySet):
+
+    def date_range(self, field, lower=None, upper=None):
+        """
+        Filters on "start_date" or "end_date" taking the date precision into account: a date with YEAR or MONTH
+        precision matches when any day of that year or month falls within the range.
+        """
+        precision = field.replace('_date', '_precision')
+        q = Q()
+        if lower is not None:
+            # Coarse condition first so the date index can be used for a single range scan
+            q &= Q(**{field + '__gte': lower.replace(month=1, day=1)})
+            q &= (Q(**{precision: DatePrecision.FULL, field + '__gte': lower}) |
+                  Q(**{precision: DatePrecision.MONTH, field + '__gte': lower.replace(day=1)}) |
+                  Q(**{precision: DatePrecision.YEAR}))
+        if upper is not None:
+            month_end = upper.replace(day=calendar.monthrange(upper.year, upper.month)[1])
+            q &= Q(**{field + '__lte': upper.replace(month=12, day=31)})
+            q &= (Q(**{precision: DatePrecision.FULL, field + '__lte': upper}) |
+                  Q(**{precision: DatePrecision.MONTH, field + '__lte': month_end}) |
+                  Q(**{precision: DatePrecision.YEAR}))
+        return self.filter(q)
+
+    def state_q(self, state, date=None):
+        """Returns Q object matching Media in the given State; written so it can use the "media_state_idx" index"""
+        today = date or timezone.now().date()
+        if state == self.model.State.HIATUS:
+            return Q(status=self.model.Status.HIATUS)
+        elif state == self.model.State.CANCELLED:
+            return Q(status=self.model.Status.CANCELLED)
+        q = Q(status=self.model.Status.AUTO)
+        if state == self.model.State.PAST:
+            return q & Q(end_date__lte=today)
+        q &= Q(end_date__isnull=True) | Q(end_date__gt=today)
+        if state == self.model.State.FUTURE:
+            return q & (Q(start_date__isnull=True) | Q(start_date__gt=today))
+        # State.PRESENT
+        return q & Q(start_date__lte=today)
+
+    def filter_state(self, *states, date=None):
+        """Filters on one or more State values (same result as Media.get_state(), but computed in SQL)"""
+        q = Q()
+        for state in states:
+            q |= self.state_q(state, date)
+        return self.filter(q)
+
+    def with_state(self, date=None):
+        """Annotates State value as "state" (same result as Media.get_state(), but computed in SQL)"""
+        today = date or timezone.now().date()
+        return self.annotate(state=Case(
+            When(status=self.model.Status.HIATUS, then=Value(self.model.State.HIATUS)),
+            When(status=self.model.Status.CANCELLED, then=Value(self.model.State.CANCELLED)),
+            When(end_date__lte=today, then=Value(self.model.State.PAST)),
+            When(Q(start_date__isnull=True) | Q(start_date__gt=today), then=Value(self.model.State.FUTURE)),
+            default=Value(self.model.State.PRESENT),
+            output_field=models.PositiveSmallIntegerField()
+        ))
 
+    def search(self, text, full_text=False):
+        """
+        Searches title (or also description and synopsis if full_text is True) and orders results by relevance.
 
-class Media(HistoryModel):
+        Matches on prefixes of all words using the "search_vector" column (maintained by a database trigger) or on
+        trigram similarity of the title, so titles with typos are still found. Both conditions use a GIN index.
+        """
+        terms = re.findall(r'[^\W_]+', text.lower())
+        if not terms:
+            return self.none()
+        # Title has weight A in search_vector; description B and synopsis C
+        weights = '' if full_text else 'A'
+        query = SearchQuery(' & '.join('{}:*{}'.format(t, weights) for t in terms), config='simple',
+                            search_type='raw')
+        return self.filter(Q(search_vector=query) | Q(title__trigram_similar=text))\
+            .annotate(rank=SearchRank(F('search_vector'), query), similarity=TrigramSimilarity('title', text))\
+            .order_by('-rank', '-similarity', 'title')
+
+
+class MediaManager(models.Manager.from_queryset(MediaQuerySet)):
+
+    def get_queryset(self):
+        # The search vector is only used in queries, so it never needs to be loaded
+        return super().get_queryset().defer('search_vector')
+
+
+class Media(LoadedValuesMixin, HistoryChecksMemoMixin, HistoryModel):
     class Type:
         ANIME = 1
         MANGA = 2
@@ -76,6 +169,21 @@ class Media(HistoryModel):
             (CANCELLED, 'Cancelled')
         )
 
+    class State:
+        # Computed from status and dates, see get_state()
+        FUTURE = 1
+        PRESENT = 2
+        PAST = 3
+        HIATUS = 4
+        CANCELLED = 5
+        choices = (
+            (FUTURE, 'Upcoming'),
+            (PRESENT, 'Current'),
+            (PAST, 'Finished'),
+            (HIATUS, 'On Hiatus'),
+            (CANCELLED, 'Cancelled')
+        )
+
     class Season:
         WINTER = 1
         SPRING = 2
@@ -88,6 +196,17 @@ class Media(HistoryModel):
             (FALL, 'Fall')
         )
 
+        @staticmethod
+        def from_date(value):
+            """Returns (season_year, season) tuple for a date"""
+            return value.year, (value.month - 1) // 3 + 1
+
+        @staticmethod
+        def shift(season_year, season, offset):
+            """Returns (season_year, season) tuple "offset" seasons before (negative) or after (positive)"""
+            i = season_year * 4 + season - 1 + offset
+            return i // 4, i % 4 + 1
+
     title = models.CharField('title', max_length=250, blank=True)
     media_type = models.PositiveSmallIntegerField('type', choices=Type.choices, default=Type.ANIME)
     sub_type = models.PositiveSmallIntegerField('sub Type', choices=SubType.choices, default=SubType.UNKNOWN)
@@ -109,35 +228,57 @@ class Media(HistoryModel):
     synopsis = models.TextField('synopsis', blank=True)
     artwork_active = models.ForeignKey('MediaArtwork', related_name='media_artwork', on_delete=models.SET_NULL,
                                        null=True, blank=True, default=None)
+    # Maintained by database trigger (see migration 0004)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = MediaManager()
 
     HISTORY_MODERATE_FIELDS = ('title', 'media_type', 'sub_type', 'is_adult')
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # Saving an unchanged object would only write the same row and create an empty change request
+        if self.get_changed_fields() == []:
+            # Callers check "_cr.pk" to see whether a change request was created
+            self._cr = ChangeRequest()
+            return
+        super().save(*args, **kwargs)
+
+    def get_state(self):
+        """Returns State value; uses value annotated by MediaQuerySet.with_state() when available"""
+        if hasattr(self, 'state'):
+            return self.state
+        if self.status == self.Status.HIATUS:
+            return self.State.HIATUS
+        elif self.status == self.Status.CANCELLED:
+            return self.State.CANCELLED
+        now = timezone.now().date()
+        if self.end_date and self.end_date <= now:
+            return self.State.PAST
+        elif not self.start_date or self.start_date > now:
+            return self.State.FUTURE
+        else:
+            return self.State.PRESENT
+
     def get_status(self):
         if self.status != self.Status.AUTO:
             return self.get_status_display()
         status = {
             self.Type.ANIME: {
-                'future': 'Not yet aired',
-                'present': 'Currently airing',
-                'past': 'Finished'
+                self.State.FUTURE: 'Not yet aired',
+                self.State.PRESENT: 'Currently airing',
+                self.State.PAST: 'Finished'
             },
             self.Type.MANGA: {
-                'future': 'Not yet published',
-                'present': 'Currently publishing',
-                'past': 'Finished'
+                self.State.FUTURE: 'Not yet published',
+                self.State.PRESENT: 'Currently publishing',
+                self.State.PAST: 'Finished'
             },
         }
         status[self.Type.NOVEL] = status[self.Type.MANGA]
-        now = timezone.now().date()
-        if self.end_date and self.end_date <= now:
-            return status[self.media_type]['past']
-        elif not self.start_date or self.start_date > now:
-            return status[self.media_type]['future']
-        else:
-            return status[self.media_type]['present']
+        return status[self.media_type][self.get_state()]
 
     def get_absolute_url(self, view='media:detail'):
         return reverse(view, args=[slugify(self.get_media_type_display()), self.pk, slugify(self.title)])
@@ -145,6 +286,19 @@ class Media(HistoryModel):
     class Meta:
         db_table = 'media'
         verbose_name_plural = 'media'
+        indexes = [
+            models.Index(fields=['season_year', 'season', 'media_type', 'is_adult', 'sub_type'],
+                         name='media_season_idx'),
+            models.Index(fields=['media_type', 'sub_type'], name='media_type_idx'),
+            models.Index(fields=['start_date'], name='media_start_date_idx'),
+            models.Index(fields=['end_date'], name='media_end_date_idx'),
+            models.Index(fields=['date_modified'], name='media_date_modified_idx'),
+            # Used by MediaQuerySet.state_q(); condition is status=Status.AUTO
+            models.Index(fields=['media_type', 'end_date', 'start_date'], name='media_state_idx',
+                         condition=Q(status=1)),
+            GinIndex(fields=['search_vector'], name='media_search_idx'),
+            GinIndex(fields=['title'], name='media_title_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
 
 
 class MediaArtwork(ArtworkModel):
@@ -160,3 +314,109 @@ class MediaArtwork(ArtworkModel):
 
     class Meta:
         db_table = 'media_artwork'
+
+
+class SeasonChart(models.Model):
+    """
+    Precomputed season chart: ids of the anime in a season (ordered by sub type, start date and title) and number of
+    anime per sub type. Refreshed through signals whenever a Media change affects a chart (see signals.py).
+    """
+    season_year = models.IntegerField('season year')
+    season = models.PositiveSmallIntegerField('season', choices=Media.Season.choices)
+    media = ArrayField(models.IntegerField(), default=list)
+    counts = JSONField(default=dict)
+    date_modified = models.DateTimeField(auto_now=True)
+
+    # Media fields that determine chart membership and order
+    MEDIA_FIELDS = ('season_year', 'season', 'media_type', 'sub_type', 'start_date', 'title')
+
+    def __str__(self):
+        return '{} {}'.format(self.get_season_display(), self.season_year)
+
+    @classmethod
+    def refresh(cls, season_year, season):
+        """Recomputes chart for a single season (uses the "media_season_idx" index)"""
+        if season_year is None or season is None:
+            return
+        rows = Media.objects.filter(season_year=season_year, season=season, media_type=Media.Type.ANIME)\
+            .order_by('sub_type', 'start_date', 'title', 'pk').values_list('pk', 'sub_type')
+        media, counts = [], dict()
+        for pk, sub_type in rows:
+            media.append(pk)
+            counts[str(sub_type)] = counts.get(str(sub_type), 0) + 1
+        if media:
+            cls.objects.update_or_create(season_year=season_year, season=season,
+                                         defaults={'media': media, 'counts': counts})
+        else:
+            cls.objects.filter(season_year=season_year, season=season).delete()
+
+    @classmethod
+    def refresh_all(cls):
+        seasons = Media.objects.filter(media_type=Media.Type.ANIME, season_year__isnull=False, season__isnull=False)\
+            .order_by().values_list('season_year', 'season').distinct()
+        seasons = set(seasons)
+        for season_year, season in cls.objects.values_list('season_year', 'season'):
+            if (season_year, season) not in seasons:
+                cls.objects.filter(season_year=season_year, season=season).delete()
+        for season_year, season in seasons:
+            cls.refresh(season_year, season)
+        return len(seasons)
+
+    def get_absolute_url(self):
+        return reverse('media:season', args=['anime', self.season_year, slugify(self.get_season_display())])
+
+    class Meta:
+        db_table = 'media_season_chart'
+        unique_together = ('season_year', 'season')
+        ordering = ('season_year', 'season')
+
+
+class MediaCounter(models.Model):
+    """
+    Denormalized counts for a Media item, so list pages get them through a join instead of a COUNT per item.
+
+    Kept in a separate table so the counts are not part of the Media change history (and a Media save never writes
+    stale counts back). Counts are adjusted within the same transaction as the change that affects them (see signals),
+    the "media_counters" command detects and repairs drift.
+    """
+    media = models.OneToOneField(Media, on_delete=models.CASCADE, primary_key=True, related_name='counter')
+    artwork = models.IntegerField('artwork', default=0)
+    changerequests = models.IntegerField('change requests', default=0)
+    changerequests_pending = models.IntegerField('pending change requests', default=0)
+
+    COUNTERS = ('artwork', 'changerequests', 'changerequests_pending')
+
+    def __str__(self):
+        return 'Counters for media #{}'.format(self.media_id)
+
+    @staticmethod
+    def get_count_expressions():
+        """Returns expressions computing each counter for Media (to be used with annotate())"""
+        def count(queryset, field):
+            queryset = queryset.filter(**{field: OuterRef('pk')}).order_by().values(field)
+            return Coalesce(Subquery(queryset.annotate(c=Count('pk')).values('c'), output_field=models.IntegerField()),
+                            0)
+        changerequests = ChangeRequest.objects.filter(object_type=ContentType.objects.get_for_model(Media))
+        return {
+            'artwork': count(MediaArtwork.objects.all(), 'media'),
+            'changerequests': count(changerequests, 'object_id'),
+            'changerequests_pending': count(changerequests.filter(status=ChangeRequest.Status.PENDING), 'object_id'),
+        }
+
+    @classmethod
+    def recompute(cls, media_id):
+        values = Media.objects.filter(pk=media_id).annotate(**{'new_' + k: v for k, v in
+                                                               cls.get_count_expressions().items()})\
+            .values(*['new_' + k for k in cls.COUNTERS]).first()
+        if values is not None:
+            cls.objects.update_or_create(media_id=media_id, defaults={k: values['new_' + k] for k in cls.COUNTERS})
+
+    @classmethod
+    def increment(cls, media_id, **deltas):
+        """Adjusts counters by the given (positive or negative) amounts; computes them if the row does not exist yet"""
+        deltas = {k: F(k) + v for k, v in deltas.items() if v}
+        if deltas and not cls.objects.filter(media_id=media_id).update(**deltas):
+            cls.recompute(media_id)
+
+    class Meta:
+        db_table = 'media_counter'
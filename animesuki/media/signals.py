@@ -0,0 +1,138 @@
+"""AnimeSuki Media signals"""
+
+import threading
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from animesuki.core.moderation import changerequests_denied
+from animesuki.history.models import ChangeRequest
+
+from .activity import refresh_feed
+from .autocomplete import title_index
+from .models import Media, MediaArtwork, MediaCounter, SeasonChart
+
+
+def refresh_season_charts(*keys):
+    """Refreshes season charts for the given (season_year, season) tuples once the transaction commits"""
+    for season_year, season in set(keys):
+        if season_year is not None and season is not None:
+            transaction.on_commit(lambda y=season_year, s=season: SeasonChart.refresh(y, s))
+
+
+def update_title_index(pk, title, is_adult):
+    # Only update index when it has been built (otherwise it will be built with the new data anyway)
+    if title_index.built is not None:
+        title_index.update(pk, title, is_adult)
+
+
+# Whether the activity feed needs refreshing, see refresh_feed_on_commit()
+_feed_refresh = threading.local()
+
+
+def refresh_feed_if_requested():
+    if getattr(_feed_refresh, 'requested', False):
+        _feed_refresh.requested = False
+        refresh_feed()
+
+
+def refresh_feed_on_commit():
+    """
+    Refreshes the activity feed once the transaction commits, at most once per transaction (e.g. bulk approval): the
+    first callback to run refreshes, the others find nothing requested. A flag that stays set after a rollback (which
+    drops the callbacks) only means the next transaction's callback refreshes, which it would anyway.
+    """
+    _feed_refresh.requested = True
+    transaction.on_commit(refresh_feed_if_requested)
+
+
+@receiver(pre_save, sender=Media)
+def media_saving(sender, instance, **kwargs):
+    # Remember previous values of fields that affect season charts (loaded with the instance when available)
+    instance._season_chart_values = None
+    loaded = instance.get_loaded_values()
+    if loaded is not None and all(f in loaded for f in SeasonChart.MEDIA_FIELDS):
+        instance._season_chart_values = tuple(loaded[f] for f in SeasonChart.MEDIA_FIELDS)
+    elif instance.pk is not None:
+        instance._season_chart_values = Media.objects.filter(pk=instance.pk)\
+            .values_list(*SeasonChart.MEDIA_FIELDS).first()
+
+
+@receiver(post_save, sender=Media)
+def media_saved(sender, instance, **kwargs):
+    # Title index is shared by the whole process, so it may only see committed changes
+    transaction.on_commit(lambda pk=instance.pk, title=instance.title, is_adult=instance.is_adult:
+                          update_title_index(pk, title, is_adult))
+    previous = getattr(instance, '_season_chart_values', None)
+    current = tuple(getattr(instance, f) for f in SeasonChart.MEDIA_FIELDS)
+    if previous != current:
+        keys = [current[:2]] + ([previous[:2]] if previous is not None else [])
+        refresh_season_charts(*keys)
+
+
+@receiver(post_delete, sender=Media)
+def media_deleted(sender, instance, **kwargs):
+    transaction.on_commit(lambda pk=instance.pk: title_index.remove(pk))
+    refresh_season_charts((instance.season_year, instance.season))
+
+
+@receiver(post_save, sender=MediaArtwork)
+def media_artwork_saved(sender, instance, created, **kwargs):
+    if created:
+        MediaCounter.increment(instance.media_id, artwork=1)
+
+
+@receiver(post_delete, sender=MediaArtwork)
+def media_artwork_deleted(sender, instance, **kwargs):
+    MediaCounter.increment(instance.media_id, artwork=-1)
+
+
+def get_changerequest_counts(values):
+    """Returns (media id, counter deltas) that a change request with the given (object type, object id, status) adds"""
+    if values is None:
+        return None, None
+    object_type_id, object_id, status = values
+    if object_id is None or object_type_id != ContentType.objects.get_for_model(Media).pk:
+        return None, None
+    return object_id, {'changerequests': 1, 'changerequests_pending': int(status == ChangeRequest.Status.PENDING)}
+
+
+def update_changerequest_counts(previous, current):
+    previous_id, previous_counts = get_changerequest_counts(previous)
+    current_id, current_counts = get_changerequest_counts(current)
+    if previous_id is not None and previous_id == current_id:
+        MediaCounter.increment(current_id, **{k: v - previous_counts[k] for k, v in current_counts.items()})
+        return
+    if previous_id is not None:
+        MediaCounter.increment(previous_id, **{k: -v for k, v in previous_counts.items()})
+    if current_id is not None:
+        MediaCounter.increment(current_id, **current_counts)
+
+
+@receiver(post_save, sender=ChangeRequest)
+def changerequest_saved(sender, instance, **kwargs):
+    # Previous (object type, object id, status) values, remembered by the core app when the instance was loaded
+    previous = getattr(instance, '_previous_values', None)
+    update_changerequest_counts(previous, (instance.object_type_id, instance.object_id, instance.status))
+    # Activity feed only lists approved changes, so it only changes when a change request is approved or reverted
+    previous_status = previous[2] if previous is not None else None
+    if ChangeRequest.Status.APPROVED in (previous_status, instance.status) and previous_status != instance.status:
+        refresh_feed_on_commit()
+
+
+@receiver(post_delete, sender=ChangeRequest)
+def changerequest_deleted(sender, instance, **kwargs):
+    update_changerequest_counts((instance.object_type_id, instance.object_id, instance.status), None)
+
+
+@receiver(changerequests_denied, sender=ChangeRequest)
+def changerequests_denied_in_bulk(sender, changerequests, **kwargs):
+    pending = dict()
+    for cr in changerequests:
+        media_id, counts = get_changerequest_counts((cr.object_type_id, cr.object_id, ChangeRequest.Status.PENDING))
+        if media_id is not None:
+            pending[media_id] = pending.get(media_id, 0) + 1
+    for media_id, count in pending.items():
+        MediaCounter.increment(media_id, changerequests_pending=-count)
@@ -0,0 +1,63 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.test import TestCase
+
+from animesuki.history.models import ChangeRequest
+from ..activity import get_feed
+from ..models import Media
+
+
+class ActivityFeedTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.media = Media.objects.bulk_create([Media(title='Test {}'.format(i)) for i in range(3)])
+        self.user = get_user_model().objects.create_user(username='test_user', email='test@example.com')
+
+    def create_changerequest(self, status):
+        return ChangeRequest.objects.create(object_type=ContentType.objects.get_for_model(Media),
+                                            object_id=self.media[0].pk, object_str=str(self.media[0]),
+                                            request_type=ChangeRequest.Type.MODIFY, status=status, user=self.user)
+
+    def test_activity_feed(self):
+        feed = get_feed()
+        self.assertEqual([m['title'] for m in feed['media']], ['Test 2', 'Test 1', 'Test 0'])
+        self.assertEqual(feed['changes'], [])
+        # Served from cache
+        with self.assertNumQueries(0):
+            self.assertEqual(get_feed(), feed)
+        with self.assertNumQueries(0):
+            response = self.client.get('/')
+        self.assertEqual(response.context['activity'], feed)
+        self.assertEqual(self.client.get('/v1/activity').json()['media'][0]['title'], 'Test 2')
+
+    @mock.patch('animesuki.media.signals.transaction.on_commit', side_effect=lambda func: func())
+    def test_activity_feed_refresh(self, on_commit):
+        get_feed()
+        # Pending change requests do not change the feed
+        cr = self.create_changerequest(ChangeRequest.Status.PENDING)
+        self.assertEqual(get_feed()['changes'], [])
+        cr.status = ChangeRequest.Status.APPROVED
+        cr.save()
+        changes = get_feed()['changes']
+        self.assertEqual([(c['id'], c['object'], c['user']) for c in changes], [(cr.pk, 'Test 0', 'test_user')])
+        self.assertEqual(changes[0]['object_url'], self.media[0].get_absolute_url())
+        cr.status = ChangeRequest.Status.REVERTED
+        cr.save()
+        self.assertEqual(get_feed()['changes'], [])
+
+    @mock.patch('animesuki.media.signals.refresh_feed')
+    def test_activity_feed_refresh_once(self, refresh):
+        crs = [self.create_changerequest(ChangeRequest.Status.PENDING) for i in range(3)]
+        callbacks = []
+        with mock.patch('animesuki.media.signals.transaction.on_commit', side_effect=callbacks.append):
+            for cr in crs:
+                cr.status = ChangeRequest.Status.APPROVED
+                cr.save()
+        # Refreshed once when the transaction commits, not once per change request
+        for func in callbacks:
+            func()
+        self.assertEqual(refresh.call_count, 1)
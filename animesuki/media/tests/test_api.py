@@ -0,0 +1,124 @@
+import datetime
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from animesuki.core.utils import DatePrecision
+from ..models import Media, MediaArtwork
+
+
+class MediaAPITest(TestCase):
+    """Tests for the v1 Media API"""
+
+    def setUp(self):
+        cache.clear()
+        self.media = Media.objects.bulk_create([
+            Media(title='Test A', description='Long description', synopsis='Long synopsis'),
+            Media(title='Test B', media_type=Media.Type.MANGA),
+        ])
+
+
+    def test_media_api_sparse_fieldsets(self):
+        # Without parameters all fields should be returned
+        response = self.client.get('/v1/media/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('description', response.json()[0])
+        # Only requested fields should be returned and only the columns they need should be loaded
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/v1/media/', {'fields': 'url,title'})
+        self.assertEqual(set(response.json()[0].keys()), {'url', 'title'})
+        sql = ' '.join(q['sql'] for q in queries.captured_queries)
+        self.assertNotIn('"description"', sql)
+        self.assertNotIn('"synopsis"', sql)
+        # Excluded fields should not be returned nor loaded
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/v1/media/', {'exclude': 'description,synopsis'})
+        self.assertNotIn('description', response.json()[0])
+        self.assertIn('status', response.json()[0])
+        sql = ' '.join(q['sql'] for q in queries.captured_queries)
+        self.assertNotIn('"description"', sql)
+        # Computed fields should not trigger additional queries for deferred columns
+        with self.assertNumQueries(1):
+            response = self.client.get('/v1/media/', {'fields': 'site_url,status,start_date'})
+        self.assertEqual(response.json()[0]['site_url'], self.media[0].get_absolute_url())
+        # Detail view should accept the same parameters
+        response = self.client.get('/v1/media/{}'.format(self.media[0].pk), {'fields': 'title,artwork'})
+        self.assertEqual(set(response.json().keys()), {'title', 'artwork'})
+
+
+    def test_media_api_filters(self):
+        # Set Up
+        spring = Media.objects.bulk_create([
+            Media(title='Spring TV', sub_type=Media.SubType.TV, season_year=2026, season=Media.Season.SPRING,
+                  start_date=datetime.date(2026, 4, 5)),
+            Media(title='Spring TV R-18', sub_type=Media.SubType.TV, season_year=2026, season=Media.Season.SPRING,
+                  is_adult=True, start_date=datetime.date(2026, 4, 15), start_precision=DatePrecision.MONTH),
+            Media(title='Spring Movie', sub_type=Media.SubType.MOVIE, season_year=2026, season=Media.Season.SPRING,
+                  start_date=datetime.date(2026, 1, 1), start_precision=DatePrecision.YEAR),
+        ])
+        # Season, type and adult filters (values and labels are both accepted)
+        response = self.client.get('/v1/media/', {'media_type': 'anime', 'sub_type': 'tv', 'is_adult': 'false',
+                                                  'season_year': '2026', 'season': 'spring', 'fields': 'title'})
+        self.assertEqual([m['title'] for m in response.json()], ['Spring TV'])
+        response = self.client.get('/v1/media/', {'season': '2', 'sub_type': '{},{}'.format(Media.SubType.TV,
+                                                                                             Media.SubType.MOVIE)})
+        self.assertEqual(len(response.json()), 3)
+        # Date filters should take precision into account: "April 2026" matches the full date, the date with month
+        # precision and the date with year precision
+        response = self.client.get('/v1/media/', {'start_date_from': '2026-04-10', 'start_date_to': '2026-04-30'})
+        self.assertEqual({m['title'] for m in response.json()}, {'Spring TV R-18', 'Spring Movie'})
+        response = self.client.get('/v1/media/', {'start_date_from': '2026-04', 'start_date_to': '2026-04'})
+        self.assertEqual({m['title'] for m in response.json()}, {m.title for m in spring})
+        response = self.client.get('/v1/media/', {'start_date_to': '2025'})
+        self.assertEqual(response.json(), [])
+        # Invalid values should return HTTP 400
+        self.assertEqual(self.client.get('/v1/media/', {'season': 'autumn'}).status_code, 400)
+        self.assertEqual(self.client.get('/v1/media/', {'start_date_from': '04-2026'}).status_code, 400)
+        self.assertEqual(self.client.get('/v1/media/', {'season_year': 'x'}).status_code, 400)
+
+
+    def test_media_filter_indexes(self):
+        # Disable sequential scans so the plan doesn't depend on the (tiny) size of the test table
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        # "Spring 2026 TV anime, no R-18"
+        plan = Media.objects.filter(season_year=2026, season=Media.Season.SPRING, media_type=Media.Type.ANIME,
+                                    sub_type=Media.SubType.TV, is_adult=False).explain()
+        self.assertIn('media_season_idx', plan)
+        # Type listing
+        plan = Media.objects.filter(media_type=Media.Type.MANGA, sub_type=Media.SubType.MANHWA).explain()
+        self.assertIn('media_type_idx', plan)
+        # Date ranges
+        plan = Media.objects.date_range('start_date', lower=datetime.date(2026, 4, 1),
+                                        upper=datetime.date(2026, 6, 30)).explain()
+        self.assertIn('media_start_date_idx', plan)
+        plan = Media.objects.date_range('end_date', lower=datetime.date(2026, 1, 1)).explain()
+        self.assertIn('media_end_date_idx', plan)
+
+
+    @override_settings(API_BATCH_MAX_IDS=3)
+    def test_media_api_batch(self):
+        # Set Up
+        MediaArtwork.objects.bulk_create([MediaArtwork(media=m, image='media/{}/test.jpg'.format(m.pk))
+                                          for m in self.media for _ in range(2)])
+        ids = [self.media[1].pk, 999999, self.media[0].pk]
+        # Results should be in requested order with a not found entry for the missing id
+        # Query count should be constant: one for media and one for the artwork prefetch
+        with self.assertNumQueries(2):
+            response = self.client.get('/v1/media/batch', {'ids': ','.join(str(pk) for pk in ids)})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([r['id'] for r in results], ids)
+        self.assertEqual([r['status'] for r in results], [200, 404, 200])
+        self.assertEqual(results[0]['data']['title'], 'Test B')
+        self.assertEqual(len(results[2]['data']['artwork']), 2)
+        # Sparse fieldsets should apply; without artwork there should be no prefetch
+        with self.assertNumQueries(1):
+            response = self.client.get('/v1/media/batch', {'ids': str(self.media[0].pk), 'fields': 'title'})
+        self.assertEqual(response.json()['results'][0]['data'], {'title': 'Test A'})
+        # Too many, invalid or missing ids should return HTTP 400
+        self.assertEqual(self.client.get('/v1/media/batch', {'ids': '1,2,3,4'}).status_code, 400)
+        self.assertEqual(self.client.get('/v1/media/batch', {'ids': '1,a'}).status_code, 400)
+        self.assertEqual(self.client.get('/v1/media/batch').status_code, 400)
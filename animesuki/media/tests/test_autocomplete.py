@@ -0,0 +1,100 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.test import SimpleTestCase, TestCase
+
+from .. import autocomplete
+from ..autocomplete import TitleIndex, get_title_index, normalize, title_index
+from ..models import Media
+
+
+class TitleIndexTest(SimpleTestCase):
+
+    def setUp(self):
+        self.index = TitleIndex()
+        self.index.build([
+            (1, 'Fullmetal Alchemist', False),
+            (2, 'Fullmetal Alchemist: Brotherhood', False),
+            (3, 'Pokémon', False),
+            (4, 'Alchemy (R-18)', True),
+        ])
+
+
+    def test_normalize(self):
+        self.assertEqual(normalize('  Pokémon: The  FIRST_Movie! '), 'pokemon the first movie')
+
+
+    def test_complete(self):
+        # Matches on start of the title should come first, then matches on later words
+        self.assertEqual(self.index.complete('full'), [(1, 'Fullmetal Alchemist'),
+                                                       (2, 'Fullmetal Alchemist: Brotherhood')])
+        self.assertEqual(self.index.complete('ALCH'), [(4, 'Alchemy (R-18)'), (1, 'Fullmetal Alchemist'),
+                                                       (2, 'Fullmetal Alchemist: Brotherhood')])
+        self.assertEqual(self.index.complete('alch', limit=1), [(4, 'Alchemy (R-18)')])
+        # R-18 titles can be excluded
+        self.assertEqual([pk for pk, title in self.index.complete('alch', adult=False)], [1, 2])
+        # Accents are ignored
+        self.assertEqual(self.index.complete('poke'), [(3, 'Pokémon')])
+        self.assertEqual(self.index.complete('x'), [])
+        self.assertEqual(self.index.complete(''), [])
+
+
+    def test_update(self):
+        self.index.update(3, 'Digimon', False)
+        self.assertEqual(self.index.complete('poke'), [])
+        self.assertEqual(self.index.complete('digi'), [(3, 'Digimon')])
+        self.index.update(5, 'Fullmetal Panic', False)
+        self.assertEqual([pk for pk, title in self.index.complete('fullmetal')], [1, 2, 5])
+        self.index.remove(1)
+        self.assertEqual([pk for pk, title in self.index.complete('fullmetal')], [2, 5])
+        self.assertEqual(len(self.index), 4)
+        # Index arrays should stay consistent
+        self.assertEqual(len(self.index.keys), len(self.index.ids))
+        self.assertEqual(len(self.index.keys), len(self.index.flags))
+        self.assertEqual(self.index.keys, sorted(self.index.keys))
+        self.assertGreater(self.index.memory_usage(), 0)
+
+
+class MediaAutocompleteTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        title_index.clear()
+        self.addCleanup(title_index.clear)
+        self.media = Media.objects.bulk_create([Media(title='Fullmetal Alchemist'),
+                                                Media(title='Fullmetal Panic', is_adult=True)])
+
+
+    def test_media_autocomplete_api(self):
+        # Index should be built on first use, after that no queries are needed
+        self.client.get('/v1/media/autocomplete', {'q': 'full'})
+        with self.assertNumQueries(0):
+            response = self.client.get('/v1/media/autocomplete', {'q': 'full', 'adult': 'false'})
+        self.assertEqual(response.json(), [{'id': self.media[0].pk, 'title': 'Fullmetal Alchemist'}])
+        # Saved and deleted media should update the index, once the transaction commits
+        self.media[0].title = 'Fullmetal Alchemist: Brotherhood'
+        callbacks = []
+        with mock.patch('animesuki.media.signals.transaction.on_commit', side_effect=callbacks.append):
+            post_save.send(sender=Media, instance=self.media[0], created=False)
+            post_delete.send(sender=Media, instance=self.media[1])
+        response = self.client.get('/v1/media/autocomplete', {'q': 'full', 'adult': 'false'})
+        self.assertEqual(response.json(), [{'id': self.media[0].pk, 'title': 'Fullmetal Alchemist'}])
+        for callback in callbacks:
+            callback()
+        response = self.client.get('/v1/media/autocomplete', {'q': 'full'})
+        self.assertEqual(response.json(), [{'id': self.media[0].pk, 'title': 'Fullmetal Alchemist: Brotherhood'}])
+
+
+    def test_media_autocomplete_rebuild(self):
+        get_title_index()
+        title_index.built = time.time() - 86400
+        # While another thread is rebuilding, the stale index is used without waiting or querying
+        with autocomplete._build_lock:
+            with self.assertNumQueries(0):
+                self.assertIs(get_title_index(), title_index)
+        with mock.patch.object(title_index, 'build', wraps=title_index.build) as build:
+            get_title_index()
+            get_title_index()
+        self.assertEqual(build.call_count, 1)
@@ -0,0 +1,196 @@
+import gzip
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from animesuki.history.models import ChangeRequest
+from ..models import Media, MediaCounter
+
+
+class CatalogSnapshotTest(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        Media.objects.bulk_create([Media(title='Test {}'.format(i)) for i in range(3)])
+
+
+    def test_catalog_snapshot(self):
+        root = Path(self.tmp.name)
+        with override_settings(CATALOG_SNAPSHOT_ROOT=self.tmp.name, CATALOG_SNAPSHOT_DEBOUNCE=0):
+            call_command('catalog_snapshot', stdout=StringIO())
+            manifest = json.loads((root / 'catalog.json').read_text())
+            self.assertEqual(manifest['count'], 3)
+            # Snapshot should contain MediaSerializer output for all media
+            with gzip.open(str(root / (manifest['file'] + '.gz'))) as f:
+                data = json.loads(f.read().decode('utf-8'))
+            self.assertEqual([item['title'] for item in data], ['Test 0', 'Test 1', 'Test 2'])
+            self.assertIn('site_url', data[0])
+            # Nothing changed, so nothing should be rebuilt
+            out = StringIO()
+            call_command('catalog_snapshot', stdout=out)
+            self.assertIn('not rebuilt', out.getvalue())
+            # Deleting media changes the catalog
+            Media.objects.filter(title='Test 0').delete()
+            call_command('catalog_snapshot', stdout=StringIO())
+            manifest = json.loads((root / 'catalog.json').read_text())
+            self.assertEqual(manifest['count'], 2)
+        # Changes should be debounced
+        Media.objects.bulk_create([Media(title='Test 3')])
+        with override_settings(CATALOG_SNAPSHOT_ROOT=self.tmp.name, CATALOG_SNAPSHOT_DEBOUNCE=3600):
+            out = StringIO()
+            call_command('catalog_snapshot', stdout=out)
+            self.assertIn('not rebuilt', out.getvalue())
+            self.assertEqual(json.loads((root / 'catalog.json').read_text())['count'], 2)
+
+
+class SitemapTest(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        Media.objects.bulk_create([Media(title='Test {}'.format(i)) for i in range(5)])
+
+
+    def read(self, name):
+        with gzip.open(str(Path(self.tmp.name) / name)) as f:
+            return f.read().decode('utf-8')
+
+    @override_settings(SITEMAP_SHARD_SIZE=2)
+    def test_sitemap(self):
+        with override_settings(SITEMAP_ROOT=self.tmp.name):
+            out = StringIO()
+            call_command('sitemap', stdout=out)
+            shards = sorted(Path(self.tmp.name).glob('sitemap-media-*.xml.gz'))
+            self.assertIn('{} regenerated'.format(len(shards)), out.getvalue())
+            index = self.read('sitemap.xml.gz')
+            self.assertEqual(index.count('<sitemap>'), len(shards))
+            # Every media should be in exactly one shard, with at most SITEMAP_SHARD_SIZE urls per shard
+            urls = [self.read(shard.name).count('<url>') for shard in shards]
+            self.assertEqual(sum(urls), 5)
+            self.assertTrue(all(count <= 2 for count in urls))
+            media = Media.objects.order_by('pk').first()
+            self.assertTrue(any(media.get_absolute_url() + '</loc>' in self.read(shard.name) for shard in shards))
+            # Nothing changed, so nothing should be regenerated
+            out = StringIO()
+            call_command('sitemap', stdout=out)
+            self.assertIn('0 regenerated', out.getvalue())
+            # Only the shard containing the modified media should be regenerated
+            Media.objects.filter(pk=media.pk).update(date_modified=timezone.now() + timezone.timedelta(days=1))
+            out = StringIO()
+            call_command('sitemap', stdout=out)
+            self.assertIn('1 regenerated', out.getvalue())
+            # Shards without media should be removed
+            Media.objects.all().delete()
+            call_command('sitemap', stdout=StringIO())
+            self.assertEqual(list(Path(self.tmp.name).glob('sitemap-media-*.xml.gz')), [])
+            self.assertEqual(self.read('sitemap.xml.gz').count('<sitemap>'), 0)
+
+
+class ImportMediaTest(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.user = get_user_model().objects.create_user(username='test_user', email='test@example.com')
+        rows = [
+            {'title': 'Test 1', 'media_type': Media.Type.ANIME, 'sub_type': Media.SubType.TV, 'is_adult': False,
+             'status': Media.Status.AUTO, 'start_precision': 1, 'end_precision': 1, 'season_year': 2026,
+             'season': Media.Season.SPRING},
+            {'title': 'Test 2', 'media_type': Media.Type.MANGA, 'sub_type': Media.SubType.MANGA, 'status': 1,
+             'start_date': '2020-01-01', 'start_precision': 1, 'end_precision': 1, 'comment': 'Source'},
+            {'title': 'Invalid', 'media_type': 99, 'sub_type': 0, 'status': 1, 'start_precision': 1,
+             'end_precision': 1},
+            {'title': 'Test 3', 'media_type': Media.Type.ANIME, 'sub_type': Media.SubType.MOVIE, 'status': 1,
+             'start_precision': 1, 'end_precision': 1, 'season_year': 2026, 'season': Media.Season.SPRING},
+        ]
+        self.path = Path(self.tmp.name, 'media.jsonl')
+        self.path.write_text('\n'.join(json.dumps(row) for row in rows) + '\nnot json\n')
+
+
+    def test_import_media(self):
+        err = StringIO()
+        call_command('import_media', str(self.path), user='test_user', batch_size=2, stdout=StringIO(), stderr=err)
+        self.assertIn('Row 3: media_type', err.getvalue())
+        self.assertIn('Row 5:', err.getvalue())
+        self.assertEqual(sorted(Media.objects.values_list('title', flat=True)), ['Test 1', 'Test 2', 'Test 3'])
+        # Every media should have an approved change request
+        for media in Media.objects.all():
+            cr = ChangeRequest.objects.get(object_type=ContentType.objects.get_for_model(Media), object_id=media.pk)
+            self.assertEqual(cr.request_type, ChangeRequest.Type.ADD)
+            self.assertEqual(cr.status, ChangeRequest.Status.APPROVED)
+            self.assertEqual(cr.user, self.user)
+            self.assertEqual(cr.comment, 'Source' if media.title == 'Test 2' else 'Bulk import')
+            self.assertEqual(MediaCounter.objects.get(media=media).changerequests, 1)
+        # Season chart should be updated
+        response = self.client.get('/v1/media/season/2026/spring', {'fields': 'title'})
+        self.assertEqual(len(response.json()['results']), 2)
+        # Finished import should not be imported again
+        out = StringIO()
+        call_command('import_media', str(self.path), user='test_user', stdout=out)
+        self.assertIn('already finished', out.getvalue())
+        self.assertEqual(Media.objects.count(), 3)
+
+
+    def test_import_media_resume(self):
+        # Checkpoint after the first two rows
+        checkpoint = Path(str(self.path) + '.checkpoint')
+        checkpoint.write_text(json.dumps({'file': str(self.path.resolve()), 'rows': 2, 'imported': 2,
+                                          'skipped': 0, 'finished': False}))
+        out = StringIO()
+        call_command('import_media', str(self.path), user='test_user', stdout=out, stderr=StringIO())
+        self.assertIn('Resuming import after row 2', out.getvalue())
+        self.assertEqual(list(Media.objects.values_list('title', flat=True)), ['Test 3'])
+        self.assertTrue(json.loads(checkpoint.read_text())['finished'])
+
+
+    def test_import_media_resume_pending(self):
+        # Interrupted after the batch with the first two rows was committed, but before the checkpoint was updated
+        call_command('import_media', str(self.path), user='test_user', batch_size=2, stdout=StringIO(),
+                     stderr=StringIO())
+        Media.objects.filter(title='Test 3').delete()
+        pks = list(Media.objects.order_by('pk').values_list('pk', flat=True))
+        checkpoint = Path(str(self.path) + '.checkpoint')
+        checkpoint.write_text(json.dumps({'file': str(self.path.resolve()), 'rows': 2, 'imported': 2, 'skipped': 0,
+                                          'finished': False, 'pending': {'media': pks, 'progress': {
+                                              'rows': 0, 'imported': 0, 'skipped': 0}}}))
+        out = StringIO()
+        call_command('import_media', str(self.path), user='test_user', stdout=out, stderr=StringIO())
+        self.assertIn('Batch of 2 media up to row 2 was imported before the interruption', out.getvalue())
+        self.assertEqual(sorted(Media.objects.values_list('title', flat=True)), ['Test 1', 'Test 2', 'Test 3'])
+        state = json.loads(checkpoint.read_text())
+        self.assertEqual((state['imported'], state['skipped']), (3, 2))
+        self.assertNotIn('pending', state)
+
+
+    def test_import_media_resume_rolled_back(self):
+        # Interrupted before the batch with the first two rows was committed: media with the same title that existed
+        # before the import should not be taken for imported rows
+        Media.objects.bulk_create([Media(title='Test 1', media_type=Media.Type.ANIME)])
+        checkpoint = Path(str(self.path) + '.checkpoint')
+        checkpoint.write_text(json.dumps({'file': str(self.path.resolve()), 'rows': 2, 'imported': 2, 'skipped': 0,
+                                          'finished': False, 'pending': {'media': [0, -1], 'progress': {
+                                              'rows': 0, 'imported': 0, 'skipped': 0}}}))
+        out = StringIO()
+        call_command('import_media', str(self.path), user='test_user', stdout=out, stderr=StringIO())
+        self.assertIn('Resuming import after row 0', out.getvalue())
+        self.assertEqual(sorted(Media.objects.values_list('title', flat=True)),
+                         ['Test 1', 'Test 1', 'Test 2', 'Test 3'])
+        self.assertEqual(json.loads(checkpoint.read_text())['imported'], 3)
+
+
+    def test_import_media_csv(self):
+        path = Path(self.tmp.name, 'media.csv')
+        path.write_text('title,media_type,sub_type,status,is_adult,start_precision,end_precision,episodes\n'
+                        'CSV Test,1,1,1,false,1,1,12\n'
+                        'CSV Test 2,1,1,1,true,1,1,\n')
+        call_command('import_media', str(path), user='test_user', stdout=StringIO())
+        self.assertEqual(list(Media.objects.order_by('title').values_list('title', 'is_adult', 'episodes')),
+                         [('CSV Test', False, 12), ('CSV Test 2', True, None)])
@@ -1,5 +1,11 @@
-from django.test import TestCase, RequestFactory
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
@@ -8,7 +14,11 @@ from django.contrib.contenttypes.models import ContentType
 from animesuki.core.models import Option
 from animesuki.core.utils import user_add_permission
 from animesuki.history.models import ChangeRequest
-from ..models import Media
+from ..models import Media, MediaArtwork
+
+# Smallest valid GIF image (1x1 pixel)
+GIF = (b'GIF89a\x01\x00\x01\x00\x80\x00\x00\xff\xff\xff\x00\x00\x00!\xf9\x04\x01\x00\x00\x00\x00,'
+       b'\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;')
 
 
 class HistoryModelTest(TestCase):
@@ -145,3 +155,60 @@ class HistoryModelTest(TestCase):
         # As that is not the case here, it should raise ValueError
         obj.request = request
         self.assertRaises(ValueError, obj.create_changerequest)
+
+
+    def test_historymodel_checks_memo(self):
+        request = self.factory.get('/')
+        request.user = get_user_model().objects.create_user(username='test_user', email='test@example.com')
+        objects = [Media(title='Test {}'.format(i)) for i in range(10)]
+        for obj in objects:
+            obj.request = request
+            obj._cr = obj.create_changerequest()
+        self.assertFalse(objects[0].self_approve)
+        # Checked once per request user, not once per object
+        with self.assertNumQueries(0):
+            for obj in objects[1:]:
+                self.assertFalse(obj.self_approve)
+        # Another request (user object) checks again
+        request.user = user_add_permission(ChangeRequest, 'self_approve', request.user)
+        obj = Media(title='Test')
+        obj.request = request
+        obj._cr = obj.create_changerequest()
+        self.assertTrue(obj.self_approve)
+        # Sanity checks (which include the throttle count) still run for each object
+        self.assertTrue(objects[0].sanity_checks)
+        o = Option.objects.get(code='emergency-shutdown')
+        o.value = 'true'
+        o.save()
+        with self.assertRaises(ValidationError) as cm:
+            objects[1].sanity_checks
+        self.assertEqual(cm.exception.code, 'emergency-shutdown')
+
+
+    @mock.patch('animesuki.core.models.subprocess.run')
+    def test_historymodel_formset_queries(self, run):
+        user = get_user_model().objects.create_user(username='test_user', email='test@example.com')
+        user = user_add_permission(MediaArtwork, 'change_mediaartwork', user)
+        self.client.force_login(user)
+        tables = (Option._meta.db_table, 'auth_permission')
+        counts = []
+        for size in (1, 10):
+            media = Media.objects.bulk_create([Media(title='Test {}'.format(size))])[0]
+            url = media.get_absolute_url('media:artwork')
+            response = self.client.get(url)
+            formset, comment_form = response.context['form'], response.context['comment_form']
+            data = {formset.management_form.add_prefix(name): value
+                    for name, value in (('TOTAL_FORMS', size), ('INITIAL_FORMS', 0), ('MAX_NUM_FORMS', 1000))}
+            data.update({comment_form.add_prefix(name): 'Test' for name in comment_form.fields})
+            for i in range(size):
+                data['{}-{}-image'.format(formset.prefix, i)] = SimpleUploadedFile('test{}.gif'.format(i), GIF)
+            with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+                with CaptureQueriesContext(connection) as context:
+                    response = self.client.post(url, data)
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(MediaArtwork.objects.filter(media=media).count(), size)
+            # Options and permissions (the throttle count is checked for each object)
+            counts.append(len([q for q in context.captured_queries if q['sql'].startswith('SELECT') and
+                               any('"{}"'.format(table) in q['sql'] for table in tables)]))
+        # 10 images cost the same checks as one
+        self.assertEqual(counts[0], counts[1])
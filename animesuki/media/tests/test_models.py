@@ -0,0 +1,236 @@
+import datetime
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from animesuki.history.models import ChangeRequest
+from ..models import Media, MediaArtwork, MediaCounter, SeasonChart
+
+
+class MediaStateTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        today = timezone.now().date()
+        past, future = today - datetime.timedelta(days=30), today + datetime.timedelta(days=30)
+        dates = [(None, None), (past, None), (future, None), (past, past), (past, today), (past, future),
+                 (today, None), (future, future), (None, past), (None, future)]
+        media = []
+        for media_type in (Media.Type.ANIME, Media.Type.MANGA):
+            for status in (Media.Status.AUTO, Media.Status.HIATUS, Media.Status.CANCELLED):
+                for start_date, end_date in dates:
+                    media.append(Media(title='{} {} {} {}'.format(media_type, status, start_date, end_date),
+                                       media_type=media_type, status=status, start_date=start_date,
+                                       end_date=end_date))
+        Media.objects.bulk_create(media)
+
+
+    def test_media_state(self):
+        # State computed in SQL should match state computed in Python
+        for media in Media.objects.with_state():
+            self.assertEqual(media.state, Media.objects.get(pk=media.pk).get_state(), media.title)
+            # get_status() should use annotated value
+            self.assertEqual(media.get_status(), Media.objects.get(pk=media.pk).get_status())
+        # Filtering should match annotation
+        for value, label in Media.State.choices:
+            self.assertEqual(set(Media.objects.filter_state(value).values_list('pk', flat=True)),
+                             set(Media.objects.with_state().filter(state=value).values_list('pk', flat=True)),
+                             label)
+        self.assertEqual(Media.objects.filter_state(Media.State.HIATUS, Media.State.CANCELLED).count(), 40)
+
+
+    def test_media_state_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        # "All currently airing anime"
+        plan = Media.objects.filter(media_type=Media.Type.ANIME).filter_state(Media.State.PRESENT).explain()
+        self.assertIn('media_state_idx', plan)
+
+
+    def test_media_state_views(self):
+        response = self.client.get('/v1/media/', {'status': 'current', 'media_type': 'anime', 'fields': 'status'})
+        self.assertEqual(len(response.json()), 3)
+        self.assertTrue(all(m['status'] == 'Currently airing' for m in response.json()))
+        self.assertEqual(self.client.get('/v1/media/', {'status': 'airing'}).status_code, 400)
+        response = self.client.get('/anime/', {'status': 'current'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['object_list']), 3)
+        # Status filter should be kept when changing order
+        self.assertIn('status=current', response.context['view'].get_querystring(order='title'))
+
+
+class SeasonChartTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        Media.objects.bulk_create([
+            Media(title='B Movie', media_type=Media.Type.ANIME, sub_type=Media.SubType.MOVIE,
+                  season_year=2026, season=Media.Season.SPRING),
+            Media(title='B Series', media_type=Media.Type.ANIME, sub_type=Media.SubType.TV,
+                  season_year=2026, season=Media.Season.SPRING, start_date=datetime.date(2026, 4, 10)),
+            Media(title='A Series', media_type=Media.Type.ANIME, sub_type=Media.SubType.TV,
+                  season_year=2026, season=Media.Season.SPRING, start_date=datetime.date(2026, 4, 3)),
+            Media(title='Manga', media_type=Media.Type.MANGA, sub_type=Media.SubType.MANGA,
+                  season_year=2026, season=Media.Season.SPRING),
+            Media(title='Old Series', media_type=Media.Type.ANIME, sub_type=Media.SubType.TV,
+                  season_year=2025, season=Media.Season.FALL),
+        ])
+
+    def test_season_chart_refresh(self):
+        self.assertEqual(SeasonChart.refresh_all(), 2)
+        chart = SeasonChart.objects.get(season_year=2026, season=Media.Season.SPRING)
+        titles = [Media.objects.get(pk=pk).title for pk in chart.media]
+        self.assertEqual(titles, ['A Series', 'B Series', 'B Movie'])
+        self.assertEqual(chart.counts, {str(Media.SubType.TV): 2, str(Media.SubType.MOVIE): 1})
+        # Chart is removed once the season no longer has any anime
+        Media.objects.filter(season_year=2025).update(season_year=2024)
+        SeasonChart.refresh(2025, Media.Season.FALL)
+        self.assertFalse(SeasonChart.objects.filter(season_year=2025).exists())
+        SeasonChart.refresh_all()
+        self.assertTrue(SeasonChart.objects.filter(season_year=2024).exists())
+
+    def test_season_chart_views(self):
+        SeasonChart.refresh_all()
+        response = self.client.get('/anime/season/2026/spring')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(label, len(items)) for label, items in response.context['groups']],
+                         [('TV', 2), ('Movie', 1)])
+        self.assertEqual(response.context['previous_url'], '/anime/season/2026/winter')
+        self.assertEqual(self.client.get('/anime/season/2030/summer').status_code, 200)
+        self.assertEqual(self.client.get('/manga/season/2026/spring').status_code, 404)
+        self.assertEqual(self.client.get('/anime/season/2026/monsoon').status_code, 404)
+        response = self.client.get('/v1/media/season/2026/spring', {'fields': 'title'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['counts'], {'TV': 2, 'Movie': 1})
+        self.assertEqual([m['title'] for m in response.json()['results']], ['A Series', 'B Series', 'B Movie'])
+
+
+class MediaCounterTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.media = Media.objects.bulk_create([Media(title='Test 1'), Media(title='Test 2')])
+        self.user = get_user_model().objects.create_user(username='test_user', email='test@example.com')
+
+    def create_changerequest(self, media, status=ChangeRequest.Status.PENDING):
+        return ChangeRequest.objects.create(object_type=ContentType.objects.get_for_model(Media), object_id=media.pk,
+                                            object_str=str(media), request_type=ChangeRequest.Type.MODIFY,
+                                            status=status, user=self.user)
+
+    def get_counts(self, media):
+        counter = MediaCounter.objects.get(media=media)
+        return counter.artwork, counter.changerequests, counter.changerequests_pending
+
+    def test_media_counter(self):
+        media = self.media[0]
+        # Saving without ImageMagick processing; signals are still sent
+        MediaArtwork(media=media, image='media/{}/test.jpg'.format(media.pk)).save_base()
+        cr1 = self.create_changerequest(media)
+        cr2 = self.create_changerequest(media)
+        self.assertEqual(self.get_counts(media), (1, 2, 2))
+        # Previous status is remembered when the change request is loaded, not read again when it is saved
+        cr1 = ChangeRequest.objects.get(pk=cr1.pk)
+        cr1.status = ChangeRequest.Status.APPROVED
+        with CaptureQueriesContext(connection) as queries:
+            cr1.save()
+        columns = ', '.join('"{}"."{}"'.format(ChangeRequest._meta.db_table, c)
+                            for c in ('object_type_id', 'object_id', 'status'))
+        self.assertFalse([q for q in queries.captured_queries if q['sql'].startswith('SELECT ' + columns + ' FROM')])
+        self.assertEqual(self.get_counts(media), (1, 2, 1))
+        cr2.delete()
+        MediaArtwork.objects.filter(media=media).delete()
+        self.assertEqual(self.get_counts(media), (0, 1, 0))
+        # Moving a change request to another object should update both
+        cr1.object_id = self.media[1].pk
+        cr1.save()
+        self.assertEqual(self.get_counts(media), (0, 0, 0))
+        self.assertEqual(self.get_counts(self.media[1]), (0, 1, 0))
+
+    def test_media_counter_command(self):
+        self.create_changerequest(self.media[0])
+        MediaCounter.objects.filter(media=self.media[0]).update(changerequests=5)
+        out = StringIO()
+        call_command('media_counters', '--dry-run', stdout=out)
+        self.assertIn('Found 2 media with drifted counters', out.getvalue())
+        self.assertEqual(self.get_counts(self.media[0]), (0, 5, 1))
+        call_command('media_counters', stdout=out)
+        self.assertEqual(self.get_counts(self.media[0]), (0, 1, 1))
+        self.assertEqual(self.get_counts(self.media[1]), (0, 0, 0))
+        out = StringIO()
+        call_command('media_counters', '--dry-run', stdout=out)
+        self.assertIn('Found 0 media', out.getvalue())
+
+    def test_media_counter_list(self):
+        self.create_changerequest(self.media[0])
+        # Counters are joined into the list query
+        response = self.client.get('/anime/')
+        with self.assertNumQueries(0):
+            counts = [m.counter.changerequests_pending for m in response.context['object_list'] if m == self.media[0]]
+        self.assertEqual(counts, [1])
+
+
+class LoadedValuesTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        media = Media.objects.bulk_create([Media(title='Test', media_type=Media.Type.ANIME,
+                                                 season_year=2026, season=Media.Season.SPRING)])[0]
+        MediaArtwork(media=media, image='media/{}/test.jpg'.format(media.pk)).save_base()
+
+    def test_loaded_values_modify(self):
+        media = Media.objects.get(title='Test')
+        self.assertEqual(media.get_changed_fields(), [])
+        media.title = 'New Title'
+        media.season = Media.Season.SUMMER
+        self.assertEqual(sorted(media.get_changed_fields()), ['season', 'title'])
+        # Previous season chart values come from the loaded values: only the UPDATE itself
+        with self.assertNumQueries(1):
+            media.save_base()
+        self.assertEqual(media._season_chart_values[:2], (2026, Media.Season.SPRING))
+        self.assertEqual(media.get_changed_fields(), [])
+        # Not loaded from the database, so changes are unknown
+        self.assertIsNone(Media(title='New').get_changed_fields())
+
+    def test_loaded_values_no_op(self):
+        media = Media.objects.get(title='Test')
+        # No write and no change request (HistoryModel.save() is never called)
+        with self.assertNumQueries(0):
+            media.save()
+        self.assertIsNone(media._cr.pk)
+        media = Media.objects.only('title').get(title='Test')
+        with self.assertNumQueries(0):
+            media.save()
+        self.assertEqual(ChangeRequest.objects.count(), 0)
+
+    def test_loaded_values_deferred(self):
+        media = Media.objects.only('title').get(title='Test')
+        self.assertEqual(media.get_changed_fields(), [])
+        # Assigned while deferred: nothing to compare with, so changed
+        media.season_year = 2026
+        self.assertEqual(media.get_changed_fields(), ['season_year'])
+        # Loaded on access: compared with the loaded value from then on
+        media = Media.objects.only('title').get(title='Test')
+        self.assertEqual(media.season, Media.Season.SPRING)
+        self.assertEqual(media.get_changed_fields(), [])
+        media.season = Media.Season.SUMMER
+        self.assertEqual(media.get_changed_fields(), ['season'])
+
+    @mock.patch('animesuki.core.models.subprocess.run')
+    def test_loaded_values_related(self, run):
+        artwork = MediaArtwork.objects.get(media__title='Test')
+        with self.assertNumQueries(0):
+            artwork.save()
+        # Image is only processed again when it changed
+        artwork.media = Media.objects.bulk_create([Media(title='Other')])[0]
+        with self.assertNumQueries(1):
+            artwork.save()
+        run.assert_not_called()
+        self.assertEqual(artwork.get_changed_fields(), [])
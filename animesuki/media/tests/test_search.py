@@ -0,0 +1,68 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from ..models import Media
+
+
+class MediaSearchTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        Media.objects.bulk_create([
+            Media(title='Fullmetal Alchemist', description='Two brothers search for the philosopher stone'),
+            Media(title='Fullmetal Alchemist: Brotherhood'),
+            Media(title='Fullmetal Alchemist', media_type=Media.Type.MANGA),
+            Media(title='Stone Ocean', synopsis='Alchemist'),
+        ])
+
+
+    def test_media_search(self):
+        # Prefix matching on all words
+        self.assertEqual(Media.objects.search('fullmetal alch').count(), 3)
+        # Exact title match should rank above longer titles
+        self.assertEqual(Media.objects.search('Fullmetal Alchemist')[0].title, 'Fullmetal Alchemist')
+        # Typos should still be found through trigram similarity
+        self.assertEqual(Media.objects.search('Fulmetal Alchemst').count(), 3)
+        # Description and synopsis are only searched with full_text
+        self.assertFalse(Media.objects.search('philosopher').exists())
+        self.assertEqual(Media.objects.search('philosopher', full_text=True).get().title, 'Fullmetal Alchemist')
+        self.assertEqual(Media.objects.search('alchemist', full_text=True).count(), 4)
+        # Empty search should return nothing
+        self.assertFalse(Media.objects.search(' !? ').exists())
+        # Search vector should be kept up to date by the database trigger
+        Media.objects.filter(title='Stone Ocean').update(title='Golden Wind')
+        self.assertEqual(Media.objects.search('golden').get().title, 'Golden Wind')
+
+
+    def test_media_search_views(self):
+        # Media type in the URL limits results
+        response = self.client.get('/anime/search', {'q': 'fullmetal'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['object_list']), 2)
+        response = self.client.get('/media/search', {'q': 'fullmetal'})
+        self.assertEqual(len(response.context['object_list']), 3)
+        # API
+        response = self.client.get('/v1/media/search', {'q': 'fullmetal', 'media_type': 'manga', 'fields': 'title'})
+        self.assertEqual(response.json(), [{'title': 'Fullmetal Alchemist'}])
+        self.assertEqual(self.client.get('/v1/media/search').status_code, 400)
+
+
+    def test_media_search_indexes(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = Media.objects.search('fullmetal').explain()
+        self.assertIn('media_search_idx', plan)
+        self.assertIn('media_title_trgm_idx', plan)
+
+
+    def test_search_benchmark(self):
+        out = StringIO()
+        call_command('search_benchmark', media=100, queries=5, stdout=out)
+        self.assertIn('Created 100 media', out.getvalue())
+        self.assertIn('full text', out.getvalue())
+        # Synthetic catalog is rolled back
+        self.assertEqual(Media.objects.count(), 4)
@@ -2,7 +2,8 @@
 
 from django.urls import path
 
-from .views import (MediaDetailView, MediaCreateView, MediaUpdateView, MediaArtworkView)
+from .views import (MediaDetailView, MediaCreateView, MediaUpdateView, MediaArtworkView, MediaListView,
+                    MediaSearchView, SeasonChartView, CurrentSeasonRedirectView)
 
 
 app_name = 'media'
@@ -11,4 +12,8 @@ urlpatterns = [
     path('<int:pk>/<slug:slug>/edit', MediaUpdateView.as_view(), name='update'),
     path('<int:pk>/<slug:slug>/artwork', MediaArtworkView.as_view(), name='artwork'),
     path('create', MediaCreateView.as_view(), name='create'),
+    path('search', MediaSearchView.as_view(), name='search'),
+    path('season/<int:year>/<slug:season>', SeasonChartView.as_view(), name='season'),
+    path('season', CurrentSeasonRedirectView.as_view(), name='season_current'),
+    path('', MediaListView.as_view(), name='list'),
 ]
@@ -1,11 +1,17 @@
 """AnimeSuki Media views"""
 
-from django.views.generic import DetailView, CreateView, UpdateView
+from django.http import Http404
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.text import slugify
+from django.views.generic import DetailView, CreateView, UpdateView, ListView, TemplateView, RedirectView
 
-from animesuki.core.views import PermissionMessageMixin, ArtworkActiveViewMixin, CanonicalDetailViewMixin
+from animesuki.core.views import (PermissionMessageMixin, ArtworkActiveViewMixin, CanonicalDetailViewMixin,
+                                  ListViewQueryStringMixin, KeysetPaginationMixin)
 from animesuki.history.views import HistoryFormViewMixin, HistoryFormsetViewMixin
 
-from .models import Media
+from .activity import get_feed
+from .models import Media, SeasonChart
 from .forms import MediaCreateForm, MediaUpdateForm, MediaArtworkForm, MediaArtworkFormset
 
 
@@ -44,3 +50,150 @@ class MediaArtworkView(PermissionMessageMixin, ArtworkActiveViewMixin, HistoryFo
 
     def get_success_url(self):
         return self.object.get_absolute_url('media:artwork')
+
+
+class MediaTypeViewMixin:
+    """Limits queryset to the media type in the URL ("media" means all types)"""
+
+    def get_media_type(self):
+        types = {slugify(label): value for value, label in Media.Type.choices}
+        return types.get(self.kwargs.get('mediatype'))
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        media_type = self.get_media_type()
+        if media_type is not None:
+            queryset = queryset.filter(media_type=media_type)
+        return queryset
+
+
+class MediaListView(MediaTypeViewMixin, KeysetPaginationMixin, ListViewQueryStringMixin, ListView):
+    template_name = 'media/list.html'
+    model = Media
+    paginate_by = 50
+    ALLOWED_ORDER = ['title', '-title', 'start_date', '-start_date']
+    STATES = {slugify(label): value for value, label in Media.State.choices}
+
+    def get_state(self):
+        state = self.request.GET.get('status', '').lower().strip()
+        return state if state in self.STATES else 'all'
+
+    def get_queryset(self):
+        queryset = super().get_queryset().with_state().select_related('counter')
+        state = self.get_state()
+        if state != 'all':
+            queryset = queryset.filter_state(self.STATES[state])
+        return queryset
+
+    def get_ordering(self):
+        order = self.request.GET.get('order', '').lower().strip()
+        if order in self.ALLOWED_ORDER:
+            return [order, 'pk']
+        return ['title', 'pk']
+
+    def get_url(self):
+        return self.request.path
+
+    def build_querystring(self, *args, status=None, **kwargs):
+        q = super().build_querystring(*args, **kwargs)
+        if status is not None:
+            # New status filter should reset page
+            q.pop('page', None)
+            q.pop('cursor', None)
+        else:
+            status = self.get_state()
+        if status != 'all':
+            q['status'] = status
+        return q
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['status'] = self.get_state()
+        context['states'] = [(slugify(label), label) for value, label in Media.State.choices]
+        return context
+
+
+class MediaSearchView(MediaTypeViewMixin, ListViewQueryStringMixin, ListView):
+    template_name = 'media/search.html'
+    model = Media
+    paginate_by = 50
+
+    def get_search_query(self):
+        return self.request.GET.get('q', '').strip()
+
+    def get_queryset(self):
+        return super().get_queryset().search(self.get_search_query())
+
+    def get_url(self):
+        return self.request.path
+
+    def build_querystring(self, *args, **kwargs):
+        q = super().build_querystring(*args, **kwargs)
+        q['q'] = self.get_search_query()
+        return q
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['search_query'] = self.get_search_query()
+        return context
+
+
+def get_season_url(season_year, season):
+    return reverse('media:season', args=['anime', season_year, slugify(dict(Media.Season.choices)[season])])
+
+
+class SeasonChartViewMixin:
+    """Looks up season chart for the year and season in the URL (only exists for anime)"""
+    SEASONS = {slugify(label): value for value, label in Media.Season.choices}
+
+    def get_season(self):
+        if self.kwargs.get('mediatype') != 'anime' or self.kwargs['season'] not in self.SEASONS:
+            raise Http404('Season charts are only available for anime')
+        return self.kwargs['year'], self.SEASONS[self.kwargs['season']]
+
+    def get_chart(self):
+        season_year, season = self.get_season()
+        chart = SeasonChart.objects.filter(season_year=season_year, season=season).first()
+        return chart if chart is not None else SeasonChart(season_year=season_year, season=season)
+
+
+class SeasonChartView(SeasonChartViewMixin, TemplateView):
+    template_name = 'media/season.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        chart = self.get_chart()
+        objects = Media.objects.only('pk', 'title', 'media_type', 'sub_type', 'status', 'is_adult', 'episodes',
+                                     'start_date', 'start_precision', 'end_date').in_bulk(chart.media)
+        # Group media by sub type (chart is already in order)
+        groups = []
+        for pk in chart.media:
+            obj = objects.get(pk)
+            if obj is None:
+                continue
+            if not groups or groups[-1][0] != obj.get_sub_type_display():
+                groups.append((obj.get_sub_type_display(), []))
+            groups[-1][1].append(obj)
+        context['chart'] = chart
+        context['groups'] = groups
+        context['previous_url'] = get_season_url(*Media.Season.shift(chart.season_year, chart.season, -1))
+        context['next_url'] = get_season_url(*Media.Season.shift(chart.season_year, chart.season, 1))
+        context['seasons'] = [(str(SeasonChart(season_year=y, season=s)), get_season_url(y, s))
+                              for y, s in SeasonChart.objects.values_list('season_year', 'season')]
+        return context
+
+
+class CurrentSeasonRedirectView(RedirectView):
+
+    def get_redirect_url(self, *args, **kwargs):
+        return get_season_url(*Media.Season.from_date(timezone.now().date()))
+
+
+class FrontpageView(TemplateView):
+    template_name = 'frontpage.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Precomputed feed: no queries unless the cache is empty
+        context['activity'] = get_feed()
+        return context
@@ -3,14 +3,22 @@
 from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from django.views.generic.base import RedirectView, TemplateView
+from django.views.generic.base import RedirectView
 from django.contrib import admin
 
 from allauth.account import views as account
 
+from animesuki.core.api import ChangeRequestModerateAPIView
+from animesuki.core.views import RevertJobCreateView, RevertJobDetailView, history_urlpatterns
+from animesuki.history import urls as history_urls
+from animesuki.media.api.views import ActivityAPIView
+from animesuki.media.views import FrontpageView
+
 
 api_v1_patterns = [
     re_path(r'media/', include('animesuki.media.api.urls')),
+    path('activity', ActivityAPIView.as_view()),
+    path('changerequests/moderate', ChangeRequestModerateAPIView.as_view()),
 ]
 
 # URLs for django-allauth/account have been redefined here to remove the ending slash
@@ -37,11 +45,13 @@ account_patterns = [
 
 urlpatterns = [
     re_path(r'^(?P<mediatype>media|anime|manga|novel)/', include('animesuki.media.urls')),
-    path('history/', include('animesuki.history.urls')),
+    path('history/revert', RevertJobCreateView.as_view(), name='revertjob-create'),
+    path('history/revert/<int:pk>', RevertJobDetailView.as_view(), name='revertjob-detail'),
+    path('history/', include((history_urlpatterns(history_urls.urlpatterns), history_urls.app_name))),
     path('v1/', include(api_v1_patterns), name='api_v1'),
     path('admin/', admin.site.urls),
     path('account/', include(account_patterns)),
-    path('', TemplateView.as_view(template_name='frontpage.html'), name='frontpage')
+    path('', FrontpageView.as_view(), name='frontpage')
 ]
 
 if settings.DEBUG:
@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "animesuki.settings")
 
 application = get_wsgi_application()
+
+# Build in-memory indexes at worker startup rather than on the first request that needs them
+from django.db import DatabaseError
+from animesuki.media.autocomplete import get_title_index
+try:
+    get_title_index()
+except DatabaseError:
+    pass  # Database not available (or migrated) yet: index is built on first use instead
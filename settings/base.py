@@ -32,6 +32,16 @@ MEDIA_ROOT = os.path.join(FILE_DIR, 'artwork')
 FILE_UPLOAD_DIRECTORY_PERMISSIONS = 0o775
 FILE_UPLOAD_PERMISSIONS = 0o664
 
+# Catalog snapshot (served directly by the web server), see: manage.py catalog_snapshot
+CATALOG_SNAPSHOT_ROOT = os.path.join(FILE_DIR, 'catalog')
+CATALOG_SNAPSHOT_DEBOUNCE = 300  # seconds without changes before rebuilding
+CATALOG_SNAPSHOT_MAX_AGE = 3600  # seconds before rebuilding regardless of ongoing changes
+
+# Sitemap files (served directly by the web server), see: manage.py sitemap
+SITEMAP_ROOT = os.path.join(FILE_DIR, 'sitemap')
+SITEMAP_SHARD_SIZE = 50000  # maximum number of URLs per sitemap file (protocol limit is 50000)
+SITEMAP_PROTOCOL = 'https'  # files are expected to be served from the site root
+
 INSTALLED_APPS = [
     'django.contrib.admin',
     'django.contrib.auth',
@@ -40,6 +50,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.sites',  # Required by django-allauth
+    'django.contrib.postgres',
     'allauth',
     'allauth.account',
     'rest_framework',
@@ -50,6 +61,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'animesuki.core.middleware.ReplicaPinMiddleware',
+    'animesuki.core.middleware.OptionCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -101,6 +114,22 @@ DATABASES = {
         'PASSWORD': secrets['database_password']
     }
 }
+# Optional read replicas: "database_replicas" in secrets.json maps an alias to settings overriding those of "default",
+# e.g. {"replica1": {"HOST": "10.0.0.2"}}. Tests use the default database for replicas (TEST MIRROR).
+for alias, replica in secrets.get('database_replicas', {}).items():
+    DATABASES[alias] = dict(DATABASES['default'], TEST={'MIRROR': 'default'}, **replica)
+DATABASE_REPLICAS = list(secrets.get('database_replicas', {}))
+DATABASE_ROUTERS = ['animesuki.core.routers.PrimaryReplicaRouter']
+# Seconds after a write during which a user's reads go to the primary database (should exceed replication lag)
+REPLICA_PIN_SECONDS = 10
+
+# Cache is shared by all worker processes (API throttling depends on this)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': '127.0.0.1:11211',
+    }
+}
 
 # Log file must be writable by Django server process
 LOGFILE = os.path.join(FILE_DIR, 'log', 'animesuki.log')
@@ -207,4 +236,32 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAdminUser',
     ),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'animesuki.core.throttling.AnonTokenBucketThrottle',
+        'animesuki.core.throttling.UserTokenBucketThrottle',
+    ),
+    # Per endpoint rates use "<throttle_scope>.<anon|user>" as key
+    'DEFAULT_THROTTLE_RATES': {
+        'anon': '120/min',
+        'user': '600/min',
+        'media-batch.anon': '20/min',
+        'media-batch.user': '120/min',
+    },
 }
+# Maximum number of ids accepted by batch retrieve endpoints
+API_BATCH_MAX_IDS = 100
+# Maximum number of change requests that can be approved or denied in one bulk moderation request
+MODERATION_MAX_IDS = 1000
+
+# Seconds after which each worker rebuilds its in-memory autocomplete index (to pick up changes made elsewhere)
+AUTOCOMPLETE_MAX_AGE = 900
+
+# Number of items in each list of the (cached) recent activity feed on the frontpage
+ACTIVITY_FEED_SIZE = 10
+
+# Days after which settled change requests are moved to the compressed archive, see: manage.py archive_history
+HISTORY_ARCHIVE_DAYS = 365
+# Approved changes per object between snapshots used to reconstruct historical states
+HISTORY_SNAPSHOT_INTERVAL = 25
+# Texts of at least this many characters are stored as deltas in the "data_revert" of change requests
+HISTORY_TEXT_DELTA_MIN_LENGTH = 500
@@ -7,6 +7,12 @@ ALLOWED_HOSTS = ['localhost', '127.0.0.1']
 
 EMAIL_BACKEND = 'django.core.mail.backends.dummy.EmailBackend'
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
 # Django Debug Toolbar
 INSTALLED_APPS += ('debug_toolbar',)
 MIDDLEWARE += ['debug_toolbar.middleware.DebugToolbarMiddleware', ]